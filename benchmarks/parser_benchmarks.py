@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from itertools import cycle, islice
+
+import pandas as pd
+from benchmarks.run_benchmarks import environment
+from evaluation.results_writer import RESULT_FORMATS, default_format, write_table
+from scripts.model_registry import OFFLINE_ENV
+from scripts.orchestrator import DEFAULT_VENV_ROOT, PARSERS, ROOT, interpreter, parser_environment
+from scripts.parser_runner import BENCHMARK_STARTED_ENV, DEFAULT_INPUT, STREAM, read_input_sentences
+
+
+DEFAULT_BATCH_SIZES = (1, 8, 32)
+DEFAULT_THREADS = (1, 4)
+DEFAULT_SENTENCES = 200
+
+# Variables that keep the Hugging Face and Transformers libraries off the network
+OFFLINE_VARIABLES = ("HF_HUB_OFFLINE", "TRANSFORMERS_OFFLINE", "HF_DATASETS_OFFLINE")
+
+# Accuracy metrics joined to the throughput records, by metric family
+ACCURACY_METRICS = {"dependency": ("Micro UAS", "Micro LAS"), "pos_upos": ("UPOS Accuracy", "POS Accuracy")}
+
+
+def write_benchmark_corpus(input_file, n_sentences, output_path):
+    """
+    Writes the corpus every parser is benchmarked on.
+
+    Args:
+        input_file (str): Input file, one sentence per line.
+        n_sentences (int): Sentences to write; the input is repeated when it is shorter.
+        output_path (str): Corpus file.
+
+    Returns:
+        int: Number of sentences written.
+    """
+    sentences = list(read_input_sentences(input_file))
+    if not sentences:
+        raise ValueError(f"{input_file} holds no sentences")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.writelines(f"{sentence}\n" for sentence in islice(cycle(sentences), n_sentences))
+    return n_sentences
+
+
+def benchmark_environment(threads, offline=False):
+    """
+    Environment of a benchmarked parser process: the orchestrator's, with its thread cap.
+
+    Args:
+        threads (int): Thread cap of the numeric libraries (and of the CoreNLP worker).
+        offline (bool): Disable model downloads and Hugging Face network access.
+
+    Returns:
+        dict: Environment variables.
+    """
+    env = parser_environment(threads)
+    if offline:
+        env[OFFLINE_ENV] = "1"
+        env.update({variable: "1" for variable in OFFLINE_VARIABLES})
+    return env
+
+
+def run_benchmark_process(key, spec, corpus, batch_sizes, threads, venv_root=DEFAULT_VENV_ROOT, offline=False,
+                          timeout=None, extra_args=()):
+    """
+    Benchmarks one parser at one thread count in a fresh process of its own environment.
+
+    A fresh process per thread count makes the cold start real: interpreter start,
+    imports and model loading are all inside it. The parser script runs with
+    `--benchmark` and writes one JSON record per batch size to stdout.
+
+    Args:
+        key (str): Parser key in `scripts.orchestrator.PARSERS`.
+        spec (dict): Parser entry of PARSERS.
+        corpus (str): Benchmark corpus, one sentence per line.
+        batch_sizes (iterable): Batch sizes to measure.
+        threads (int): Thread cap of the process.
+        venv_root (str): Directory holding the environments.
+        offline (bool): Disable model downloads.
+        timeout (float): Seconds before the process is killed (default: no limit).
+        extra_args (tuple): Further command-line options for the script.
+
+    Returns:
+        list: Benchmark records, or one record with an 'error' if the run failed.
+    """
+    base = {"parser": spec["name"], "key": key, "threads": threads}
+    try:
+        command = [interpreter(spec, venv_root), "-m", spec["module"], "--input", corpus, "--output", STREAM,
+                   "--benchmark", *(str(size) for size in batch_sizes), *extra_args]
+        env = benchmark_environment(threads, offline)
+        env[BENCHMARK_STARTED_ENV] = repr(time.time())
+        completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as error:
+        return [{**base, "error": str(error)}]
+
+    if completed.returncode != 0:
+        stderr = completed.stderr.strip().splitlines()
+        return [{**base, "error": stderr[-1] if stderr else f"exit code {completed.returncode}"}]
+    return [{**json.loads(line), **base} for line in completed.stdout.splitlines() if line.startswith("{")]
+
+
+def run_parser_benchmarks(parsers, input_file=DEFAULT_INPUT, n_sentences=DEFAULT_SENTENCES,
+                          batch_sizes=DEFAULT_BATCH_SIZES, threads=DEFAULT_THREADS, venv_root=DEFAULT_VENV_ROOT,
+                          offline=False, timeout=None, work_dir="benchmarks/data"):
+    """
+    Benchmarks every parser over the same corpus at every thread count and batch size.
+
+    Args:
+        parsers (dict): Parser key to entry, see `scripts.orchestrator.PARSERS`.
+        input_file (str): Sentences to benchmark on.
+        n_sentences (int): Corpus size; the input is repeated when it is shorter.
+        batch_sizes (iterable): Batch sizes to measure.
+        threads (iterable): Thread caps to measure, one process each.
+        venv_root (str): Directory holding the environments.
+        offline (bool): Disable model downloads, e.g. in CI with locally cached models.
+        timeout (float): Seconds allowed per parser process.
+        work_dir (str): Directory of the benchmark corpus.
+
+    Returns:
+        dict: 'environment', 'parameters' and the 'records' of all runs.
+    """
+    corpus = os.path.abspath(os.path.join(work_dir, f"parser_benchmark_{n_sentences}.txt"))
+    write_benchmark_corpus(input_file, n_sentences, corpus)
+
+    records = []
+    for key, spec in parsers.items():
+        for thread_count in threads:
+            runs = run_benchmark_process(key, spec, corpus, batch_sizes, thread_count, venv_root, offline, timeout)
+            for record in runs:
+                if "error" in record:
+                    print(f"{spec['name']:>10} {thread_count:>3} threads  failed: {record['error']}", file=sys.stderr)
+                else:
+                    print(f"{spec['name']:>10} {thread_count:>3} threads  batch {record['batch_size']:>4}  "
+                          f"{record['sentences_per_second']:9.1f} sentences/s  p95 {record['latency_p95']:.3f}s",
+                          file=sys.stderr)
+            records.extend(runs)
+
+    parameters = {"input": input_file, "sentences": n_sentences, "batch_sizes": list(batch_sizes),
+                  "threads": list(threads), "offline": offline}
+    return {"environment": environment(), "parameters": parameters, "records": records}
+
+
+def speed_accuracy_table(records, summaries):
+    """
+    Joins the throughput records with the accuracy summaries, for a speed/accuracy plot.
+
+    Args:
+        records (list): Benchmark records from `run_parser_benchmarks`.
+        summaries (dict): Parser name to metric family to summary, as saved by
+            `evaluation/evaluate.py` (parsers without one get no accuracy columns).
+
+    Returns:
+        pd.DataFrame: One row per successful (parser, threads, batch size) run.
+    """
+    rows = []
+    for record in records:
+        if "error" in record:
+            continue
+        row = {key: value for key, value in record.items() if not isinstance(value, dict)}
+        row["model_load_seconds"] = sum(record.get("model_load_seconds", {}).values())
+        for family, metrics in ACCURACY_METRICS.items():
+            summary = summaries.get(record["parser"], {}).get(family, {})
+            row.update({metric: summary.get(metric) for metric in metrics})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Benchmark parser throughput, latency and memory over a "
+                                                     "common corpus.")
+    arg_parser.add_argument("--parsers", nargs="+", choices=PARSERS, default=list(PARSERS))
+    arg_parser.add_argument("--input", default=DEFAULT_INPUT)
+    arg_parser.add_argument("--sentences", type=int, default=DEFAULT_SENTENCES,
+                            help="Corpus size; the input is repeated when it is shorter")
+    arg_parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(DEFAULT_BATCH_SIZES))
+    arg_parser.add_argument("--threads", type=int, nargs="+", default=list(DEFAULT_THREADS))
+    arg_parser.add_argument("--venv-root", default=DEFAULT_VENV_ROOT)
+    arg_parser.add_argument("--offline", action="store_true", help="Only use locally cached models")
+    arg_parser.add_argument("--timeout", type=float, default=None, help="Seconds allowed per parser process")
+    arg_parser.add_argument("--summary", default="results/evaluation_summary.json",
+                            help="Accuracy summaries of evaluation/evaluate.py to join")
+    arg_parser.add_argument("--output", default="results/parser_benchmarks.json")
+    arg_parser.add_argument("--format", choices=RESULT_FORMATS, default=default_format())
+    args = arg_parser.parse_args()
+
+    results = run_parser_benchmarks({key: PARSERS[key] for key in args.parsers}, args.input, args.sentences,
+                                    args.batch_sizes, args.threads, args.venv_root, args.offline, args.timeout)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Benchmark results saved to: {args.output}")
+
+    summaries = {}
+    if os.path.isfile(args.summary):
+        with open(args.summary, encoding="utf-8") as f:
+            summaries = json.load(f)
+    table = speed_accuracy_table(results["records"], summaries)
+    if not table.empty:
+        path = write_table(os.path.join(os.path.dirname(args.output) or ".", "speed_accuracy"), table, args.format)
+        print(f"Speed/accuracy table saved to: {path}")
+    failed = sum("error" in record for record in results["records"])
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,247 @@
+import argparse
+import contextlib
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from benchmarks.synthetic_corpus import write_synthetic_pair
+from evaluation.constituency_eval import constituency_counts, summarize_constituency_counts
+from evaluation.dependency_eval import evaluate_dependency_parses
+from evaluation.evalb_pre.evalb_prepare import save_constituency_parses_to_txt
+from evaluation.pos_upos_eval import compare_parsers_pos_upos
+from scripts.corpus_store import load_corpus
+from scripts.data_preprocess import load_sentences
+
+
+# Bump when the stages or the generator change, so that older result files are not compared
+BENCHMARK_VERSION = 1
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+STAGES = ("load", "load_columnar", "load_cached", "pos_upos", "dependency", "constituency_prep", "constituency")
+
+
+def stage_functions(gold_path, pred_path, work_dir):
+    """
+    Builds the benchmarked stages for one synthetic corpus pair.
+
+    Each stage is a zero-argument callable. Stages that score parses get their
+    inputs from the columnar cache, which is built once outside the timed region.
+
+    Args:
+        gold_path (str): Synthetic gold file.
+        pred_path (str): Synthetic prediction file.
+        work_dir (str): Directory for the corpus cache and prepared trees.
+
+    Returns:
+        dict: Stage name to callable.
+    """
+    cache_dir = os.path.join(work_dir, ".corpus_cache")
+    gold = load_corpus(gold_path, cache_dir=cache_dir)
+    pred = load_corpus(pred_path, cache_dir=cache_dir)
+    gold_trees = [gold.tree(i) for i in range(len(gold))]
+    pred_trees = [pred.tree(i) for i in range(len(pred))]
+
+    def constituency_prep():
+        # The prepare script reports every file it writes; keep the benchmark output clean
+        with contextlib.redirect_stdout(io.StringIO()):
+            save_constituency_parses_to_txt(pred_path, os.path.join(work_dir, "pred_constituency.txt"))
+
+    return {
+        "load": lambda: load_sentences(gold_path),
+        "load_columnar": lambda: load_corpus(gold_path, cache_dir=False),
+        "load_cached": lambda: load_corpus(gold_path, cache_dir=cache_dir),
+        "pos_upos": lambda: compare_parsers_pos_upos(gold, [pred], ["Synthetic"]),
+        "dependency": lambda: evaluate_dependency_parses(gold, pred),
+        "constituency_prep": constituency_prep,
+        "constituency": lambda: summarize_constituency_counts(constituency_counts(gold_trees, pred_trees)),
+    }
+
+
+def measure(function, repeats=3, memory=True):
+    """
+    Times a stage and measures its peak traced memory.
+
+    Args:
+        function (callable): The stage.
+        repeats (int): Timed runs; the fastest is reported.
+        memory (bool): Also run the stage once under tracemalloc, untimed.
+
+    Returns:
+        dict: 'seconds' (best wall time), 'cpu_seconds' (CPU time of that run)
+            and 'peak_bytes' (None without memory measurement).
+    """
+    best = None
+    for _ in range(repeats):
+        gc.collect()
+        wall, cpu = time.perf_counter(), time.process_time()
+        function()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        if best is None or wall < best[0]:
+            best = (wall, cpu)
+
+    peak = None
+    if memory:
+        # Traced separately, since tracemalloc slows down allocation-heavy code
+        gc.collect()
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {"seconds": best[0], "cpu_seconds": best[1], "peak_bytes": peak}
+
+
+def environment():
+    """
+    Describes the code and machine a result file was produced with.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "benchmark_version": BENCHMARK_VERSION,
+        "commit": commit,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, stages=STAGES, mean_length=20, max_depth=6, error_rate=0.1,
+                   seed=0, repeats=3, memory=True, data_dir="benchmarks/data"):
+    """
+    Generates synthetic corpora of increasing size and benchmarks every stage on them.
+
+    Generated files are named after their parameters and reused by later runs.
+
+    Args:
+        sizes (iterable): Corpus sizes in sentences.
+        stages (iterable): Stages to run, see STAGES.
+        mean_length (int): Mean sentence length in tokens.
+        max_depth (int): Maximum tree depth.
+        error_rate (float): Perturbation rate of the predictions.
+        seed (int): Generator seed.
+        repeats (int): Timed runs per stage.
+        memory (bool): Measure peak memory with tracemalloc.
+        data_dir (str): Directory of the generated corpora.
+
+    Returns:
+        dict: 'environment', 'parameters' and one record per (size, stage).
+    """
+    parameters = {"mean_length": mean_length, "max_depth": max_depth, "error_rate": error_rate,
+                  "seed": seed, "repeats": repeats}
+    records = []
+
+    for size in sizes:
+        work_dir = os.path.join(data_dir, f"n{size}-len{mean_length}-depth{max_depth}-err{error_rate}-seed{seed}")
+        gold_path = os.path.join(work_dir, "gold.txt")
+        pred_path = os.path.join(work_dir, "pred.txt")
+        if not (os.path.exists(gold_path) and os.path.exists(pred_path)):
+            write_synthetic_pair(gold_path, pred_path, size, mean_length, max_depth, error_rate, seed)
+
+        functions = stage_functions(gold_path, pred_path, work_dir)
+        tokens = int(functions["load_cached"]().tag_offsets[-1])
+
+        for stage in stages:
+            result = measure(functions[stage], repeats, memory)
+            records.append({
+                "stage": stage,
+                "sentences": size,
+                "tokens": tokens,
+                **result,
+                "sentences_per_second": size / result["seconds"] if result["seconds"] > 0 else None,
+                "tokens_per_second": tokens / result["seconds"] if result["seconds"] > 0 else None,
+            })
+            peak = f"{result['peak_bytes'] / 2 ** 20:9.1f} MiB" if result["peak_bytes"] is not None else ""
+            print(f"{stage:>18} {size:>9} sentences {result['seconds']:9.3f}s {peak}", file=sys.stderr)
+
+    return {"environment": environment(), "parameters": parameters, "records": records}
+
+
+def compare_results(baseline, current, threshold=0.2):
+    """
+    Finds stages that got slower between two result files.
+
+    Args:
+        baseline (dict): Results of the reference commit.
+        current (dict): Results to check.
+        threshold (float): Relative slowdown that counts as a regression.
+
+    Returns:
+        list: (stage, sentences, baseline seconds, current seconds, ratio) per regression.
+    """
+    if baseline["environment"]["benchmark_version"] != current["environment"]["benchmark_version"]:
+        raise ValueError("Result files come from different benchmark versions")
+    if baseline["parameters"] != current["parameters"]:
+        raise ValueError("Result files were produced with different generator parameters")
+
+    reference = {(record["stage"], record["sentences"]): record["seconds"] for record in baseline["records"]}
+    regressions = []
+    for record in current["records"]:
+        key = (record["stage"], record["sentences"])
+        if key in reference and reference[key] > 0:
+            ratio = record["seconds"] / reference[key]
+            if ratio > 1 + threshold:
+                regressions.append((*key, reference[key], record["seconds"], ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Benchmark the loader and evaluators on synthetic corpora.")
+    subparsers = arg_parser.add_subparsers(dest="command")
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                            help="Corpus sizes in sentences (e.g. 1000 10000 100000 1000000)")
+    run_parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    run_parser.add_argument("--mean-length", type=int, default=20)
+    run_parser.add_argument("--max-depth", type=int, default=6)
+    run_parser.add_argument("--error-rate", type=float, default=0.1)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeats", type=int, default=3)
+    run_parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    run_parser.add_argument("--data-dir", default="benchmarks/data")
+    run_parser.add_argument("--output", default="results/benchmarks.json")
+
+    compare_parser = subparsers.add_parser("compare", help="Report regressions between two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+    args = arg_parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+
+        regressions = compare_results(baseline, current, args.threshold)
+        for stage, sentences, before, after, ratio in regressions:
+            print(f"{stage} at {sentences} sentences: {before:.3f}s -> {after:.3f}s ({ratio:.2f}x)")
+        if not regressions:
+            print("No regressions")
+        sys.exit(1 if regressions else 0)
+
+    if args.command != "run":
+        arg_parser.print_help()
+        sys.exit(2)
+
+    results = run_benchmarks(args.sizes, args.stages, args.mean_length, args.max_depth, args.error_rate,
+                             args.seed, args.repeats, not args.no_memory, args.data_dir)
+
+    # Save the results for comparison across commits
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Benchmark results saved to: {args.output}")
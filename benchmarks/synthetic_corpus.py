@@ -0,0 +1,195 @@
+import argparse
+import os
+import random
+
+
+# Small tagged lexicon: (form, lemma, UPOS, XPOS)
+LEXICON = [
+    ("the", "the", "DET", "DT"), ("a", "a", "DET", "DT"), ("her", "her", "PRON", "PRP$"),
+    ("she", "she", "PRON", "PRP"), ("they", "they", "PRON", "PRP"), ("it", "it", "PRON", "PRP"),
+    ("road", "road", "NOUN", "NN"), ("rain", "rain", "NOUN", "NN"), ("glass", "glass", "NOUN", "NN"),
+    ("words", "word", "NOUN", "NNS"), ("directions", "direction", "NOUN", "NNS"),
+    ("walked", "walk", "VERB", "VBD"), ("wiped", "wipe", "VERB", "VBD"), ("spoke", "speak", "VERB", "VBD"),
+    ("open", "open", "VERB", "VB"), ("was", "be", "AUX", "VBD"), ("would", "would", "AUX", "MD"),
+    ("busy", "busy", "ADJ", "JJ"), ("heavy", "heavy", "ADJ", "JJ"), ("social", "social", "ADJ", "JJ"),
+    ("at", "at", "ADP", "IN"), ("with", "with", "ADP", "IN"), ("from", "from", "ADP", "IN"),
+    ("and", "and", "CCONJ", "CC"), ("hardly", "hardly", "ADV", "RB"), ("to", "to", "PART", "TO"),
+    (",", ",", "PUNCT", ","),
+]
+
+# Phrase labels of the generated trees and dependency relations of the generated arcs
+PHRASE_LABELS = ["NP", "VP", "PP", "ADJP", "ADVP", "SBAR"]
+RELATIONS = ["nsubj", "obj", "det", "amod", "advmod", "prep", "pobj", "aux", "cc", "conj", "punct", "xcomp"]
+
+
+def generate_sentence(rng, length, max_depth):
+    """
+    Generates the annotations of one random sentence.
+
+    Args:
+        rng (random.Random): Random number generator.
+        length (int): Number of tokens before the final full stop.
+        max_depth (int): Maximum nesting depth of the constituency tree.
+
+    Returns:
+        dict: 'tokens' tag tuples, nested 'tree' (label, children) with token indices
+            as leaves, and 'dependencies' as (index, relation, head) rows.
+    """
+    tokens = [rng.choice(LEXICON) for _ in range(length)] + [(".", ".", "PUNCT", ".")]
+
+    def build(start, end, depth):
+        # Splits [start, end) into children until single tokens or the depth limit
+        if end - start <= 2 or depth >= max_depth:
+            return list(range(start, end))
+        cuts = sorted(rng.sample(range(start + 1, end), min(rng.randint(1, 3), end - start - 1)))
+        children = []
+        for left, right in zip([start] + cuts, cuts + [end]):
+            if right - left == 1:
+                children.append(left)
+            else:
+                children.append((rng.choice(PHRASE_LABELS), build(left, right, depth + 1)))
+        return children
+
+    tree = ("S", build(0, len(tokens) - 1, 1) + [len(tokens) - 1])
+
+    # Random dependency tree: every token attaches to the root or an earlier-placed token
+    order = list(range(1, len(tokens) + 1))
+    rng.shuffle(order)
+    heads = {order[0]: 0}
+    for k, index in enumerate(order[1:], 1):
+        heads[index] = order[rng.randrange(k)]
+    dependencies = [(i, "ROOT" if heads[i] == 0 else rng.choice(RELATIONS), heads[i]) for i in range(1, len(tokens) + 1)]
+
+    return {"tokens": tokens, "tree": tree, "dependencies": dependencies}
+
+
+def corrupt_sentence(rng, sentence, error_rate):
+    """
+    Copies a sentence, perturbing tags, arcs, labels and brackets at the given rate.
+
+    Args:
+        rng (random.Random): Random number generator.
+        sentence (dict): Sentence from `generate_sentence`.
+        error_rate (float): Probability of changing each tag, head, relation and phrase label.
+
+    Returns:
+        dict: The perturbed sentence, with the same tokens.
+    """
+    n = len(sentence["tokens"])
+    tokens = [
+        (form, lemma, rng.choice(LEXICON)[2] if rng.random() < error_rate else upos,
+         rng.choice(LEXICON)[3] if rng.random() < error_rate else xpos)
+        for form, lemma, upos, xpos in sentence["tokens"]
+    ]
+
+    dependencies = []
+    for index, relation, head in sentence["dependencies"]:
+        if rng.random() < error_rate:
+            head = rng.choice([h for h in range(n + 1) if h != index])
+        if rng.random() < error_rate:
+            relation = rng.choice(RELATIONS)
+        dependencies.append((index, "ROOT" if head == 0 else relation, head))
+
+    def perturb(node):
+        if isinstance(node, int):
+            return node
+        label, children = node
+        if rng.random() < error_rate:
+            label = rng.choice(PHRASE_LABELS)
+        return label, [perturb(child) for child in children]
+
+    return {"tokens": tokens, "tree": perturb(sentence["tree"]), "dependencies": dependencies}
+
+
+def format_tree(node, tokens, preterminals):
+    """
+    Serialises a nested tree on one line.
+
+    Args:
+        node (tuple): (label, children) with token indices as leaves.
+        tokens (list): Token tag tuples.
+        preterminals (bool): Wrap words in (XPOS word) as the parsers do; otherwise
+            words are bare leaves as in the gold standard.
+
+    Returns:
+        str: The bracketed tree.
+    """
+    label, children = node
+    parts = []
+    for child in children:
+        if isinstance(child, int):
+            form, _, _, xpos = tokens[child]
+            parts.append(f"({xpos} {form})" if preterminals else form)
+        else:
+            parts.append(format_tree(child, tokens, preterminals))
+    return f"({label} {' '.join(parts)})"
+
+
+def format_sentence_block(number, sentence, preterminals=False):
+    """
+    Formats a generated sentence in the block format of data/gold_standard.txt.
+
+    Args:
+        number (int): Sentence number.
+        sentence (dict): Sentence from `generate_sentence` or `corrupt_sentence`.
+        preterminals (bool): Tree style, see `format_tree`.
+
+    Returns:
+        str: The block, followed by a blank line.
+    """
+    tokens = sentence["tokens"]
+    text = " ".join(form for form, _, _, _ in tokens)
+    block = f"{number}. {text}\n"
+    block += "\t".join("\\".join(token) for token in tokens) + "\n"
+    block += format_tree(sentence["tree"], tokens, preterminals) + "\n"
+    block += "".join(f"{index}\t{tokens[index - 1][0]}\t{relation}\t{head}\n"
+                     for index, relation, head in sentence["dependencies"])
+    return block + "\n"
+
+
+def write_synthetic_pair(gold_path, pred_path, n_sentences, mean_length=20, max_depth=6,
+                         error_rate=0.1, seed=0):
+    """
+    Writes a synthetic gold standard and a perturbed prediction file sentence by sentence.
+
+    Args:
+        gold_path (str): Output gold file (gold tree style).
+        pred_path (str): Output prediction file (parser tree style).
+        n_sentences (int): Number of sentences.
+        mean_length (int): Mean sentence length in tokens; lengths are uniform in [mean/2, 3*mean/2].
+        max_depth (int): Maximum tree depth.
+        error_rate (float): Perturbation rate of the predictions.
+        seed (int): Random seed; the same arguments always produce the same files.
+
+    Returns:
+        int: Number of tokens written per file.
+    """
+    rng = random.Random(seed)
+    n_tokens = 0
+    for path in (gold_path, pred_path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    with open(gold_path, "w", encoding="utf-8") as gold_file, open(pred_path, "w", encoding="utf-8") as pred_file:
+        for number in range(1, n_sentences + 1):
+            length = rng.randint(max(1, mean_length // 2), max(1, mean_length * 3 // 2))
+            sentence = generate_sentence(rng, length, max_depth)
+            gold_file.write(format_sentence_block(number, sentence))
+            pred_file.write(format_sentence_block(number, corrupt_sentence(rng, sentence, error_rate), preterminals=True))
+            n_tokens += len(sentence["tokens"])
+    return n_tokens
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Generate a synthetic gold standard and parser output.")
+    arg_parser.add_argument("--gold", default="benchmarks/data/synthetic_gold.txt")
+    arg_parser.add_argument("--pred", default="benchmarks/data/synthetic_pred.txt")
+    arg_parser.add_argument("--sentences", type=int, default=1000)
+    arg_parser.add_argument("--mean-length", type=int, default=20)
+    arg_parser.add_argument("--max-depth", type=int, default=6)
+    arg_parser.add_argument("--error-rate", type=float, default=0.1)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    tokens = write_synthetic_pair(args.gold, args.pred, args.sentences, args.mean_length,
+                                  args.max_depth, args.error_rate, args.seed)
+    print(f"Wrote {args.sentences} sentences ({tokens} tokens) to {args.gold} and {args.pred}")
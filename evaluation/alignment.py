@@ -0,0 +1,263 @@
+import argparse
+
+import numpy as np
+from evaluation.dependency_eval import dependency_arrays, segment_sum
+from evaluation.pos_upos_eval import TAG_COLUMNS
+from scripts.corpus_store import as_corpus, load_corpus
+from scripts.instrumentation import tracer
+
+
+# Penn Treebank escapes mapped back to the characters they stand for before measuring token lengths
+PTB_ESCAPES = {
+    "-LRB-": "(", "-RRB-": ")", "-LSB-": "[", "-RSB-": "]", "-LCB-": "{", "-RCB-": "}",
+    "``": '"', "''": '"',
+}
+
+# Per-sentence count columns produced by score_aligned
+ALIGNED_COUNT_KEYS = ("gold_words", "pred_words", "aligned_words", "uas", "las",
+                      "gold_tags", "pred_tags", "aligned_tags", *TAG_COLUMNS)
+
+
+def form_lengths(corpus, column):
+    """
+    Character length of every token of a form column, ignoring whitespace.
+
+    Args:
+        corpus (ColumnarCorpus): The corpus.
+        column (str): 'tag_form' or 'dep_form'.
+
+    Returns:
+        np.ndarray: One length per token.
+    """
+    lengths = np.array(
+        [len("".join(PTB_ESCAPES.get(form, form).split())) for form in corpus.vocabularies["forms"]],
+        dtype=np.int64,
+    )
+    ids = np.asarray(corpus.columns[column], dtype=np.int64)
+    return lengths[ids] if len(lengths) else np.zeros(len(ids), dtype=np.int64)
+
+
+def token_spans(offsets, lengths):
+    """
+    Character spans of tokens within their sentence, from their lengths alone.
+
+    Whitespace is not part of any token, so two tokenisations of the same sentence
+    cover the same character positions and a token boundary is just a running sum.
+
+    Args:
+        offsets (np.ndarray): Sentence offsets into the token arrays.
+        lengths (np.ndarray): Token lengths from `form_lengths`.
+
+    Returns:
+        dict: Per-token 'sentence', 'start' and 'end' arrays.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    sentence = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    ends = np.cumsum(lengths)
+
+    # Characters of all earlier sentences, subtracted so spans restart at each sentence
+    base = np.concatenate([[0], ends])[offsets[:-1]]
+    end = ends - base[sentence]
+    return {"sentence": sentence, "start": end - lengths, "end": end}
+
+
+def align_tokens(gold_spans, pred_spans):
+    """
+    Aligns the tokens of two tokenisations that have exactly the same character span.
+
+    Spans are encoded as one sorted integer key per token, so the alignment is a
+    single vectorised lookup instead of an edit-distance alignment.
+
+    Args:
+        gold_spans (dict): Gold spans from `token_spans`.
+        pred_spans (dict): Predicted spans, over the same sentences.
+
+    Returns:
+        tuple: Aligned gold token rows and the matching predicted token rows.
+    """
+    width = int(max(gold_spans["end"].max(initial=0), pred_spans["end"].max(initial=0))) + 1
+
+    def keys(spans):
+        return (spans["sentence"] * width + spans["start"]) * width + spans["end"]
+
+    gold_keys, pred_keys = keys(gold_spans), keys(pred_spans)
+
+    # Empty tokens have no span to align on
+    gold_rows = np.flatnonzero(gold_spans["end"] > gold_spans["start"])
+    order = np.argsort(pred_keys, kind="stable")
+    sorted_keys = pred_keys[order]
+    found = np.minimum(np.searchsorted(sorted_keys, gold_keys[gold_rows]), max(len(sorted_keys) - 1, 0))
+    matched = sorted_keys[found] == gold_keys[gold_rows] if len(sorted_keys) else np.zeros(len(gold_rows), dtype=bool)
+    return gold_rows[matched], order[found[matched]]
+
+
+def _row_lookup(arrays, sentence):
+    # Maps (sentence, dependent index) to the dependency row, as a sorted key table
+    stride = int(arrays["index"].max(initial=0)) + 1
+    keys = sentence * stride + arrays["index"]
+    order = np.argsort(keys, kind="stable")
+    return keys[order], order, stride
+
+
+def score_aligned(gold, pred, label_ids=None):
+    """
+    Scores a parser with its own tokenisation against the gold corpus, CoNLL 2018 style.
+
+    Words (dependency rows) and tagged tokens are aligned separately through their
+    character spans. An aligned word has a correct head when its predicted head,
+    mapped through the alignment, is the gold head (0 stays the root); LAS also
+    needs the same relation label. Tags are compared on aligned tokens.
+
+    Args:
+        gold (ColumnarCorpus): Gold standard corpus.
+        pred (ColumnarCorpus): Parser corpus; sentence i is compared with gold sentence i.
+        label_ids (dict): Shared label to id mapping (default: a fresh mapping).
+
+    Returns:
+        dict: Per-sentence integer counts for every key in ALIGNED_COUNT_KEYS.
+    """
+    n_sentences = len(gold)
+    if len(pred) < n_sentences:
+        raise ValueError(f"Prediction has {len(pred)} sentences, gold standard has {n_sentences}")
+    pred = pred.slice(0, n_sentences)
+    label_ids = {} if label_ids is None else label_ids
+
+    with tracer.stage("aligned") as stage:
+        # Dependency rows: align, then map predicted heads into gold indices
+        gold_deps = dependency_arrays(gold, label_ids)
+        pred_deps = dependency_arrays(pred, label_ids)
+        gold_spans = token_spans(gold_deps["offsets"], form_lengths(gold, "dep_form"))
+        pred_spans = token_spans(pred_deps["offsets"], form_lengths(pred, "dep_form"))
+        gold_rows, pred_rows = align_tokens(gold_spans, pred_spans)
+
+        # Gold index of every aligned predicted row, -1 for unaligned rows
+        pred_to_gold = np.full(len(pred_deps["index"]) + 1, -1, dtype=np.int64)
+        pred_to_gold[pred_rows] = gold_deps["index"][gold_rows]
+
+        # Row of each predicted head within its sentence; the root maps to 0
+        sorted_keys, order, stride = _row_lookup(pred_deps, pred_spans["sentence"])
+        head_keys = pred_spans["sentence"][pred_rows] * stride + pred_deps["heads"][pred_rows]
+        position = np.minimum(np.searchsorted(sorted_keys, head_keys), max(len(sorted_keys) - 1, 0))
+        head_found = (sorted_keys[position] == head_keys) if len(sorted_keys) else np.zeros(len(pred_rows), bool)
+        head_row = np.where(head_found, order[position] if len(order) else -1, -1)
+        mapped_heads = np.where(pred_deps["heads"][pred_rows] == 0, 0, pred_to_gold[head_row])
+
+        head_correct = mapped_heads == gold_deps["heads"][gold_rows]
+        label_correct = head_correct & (pred_deps["labels"][pred_rows] == gold_deps["labels"][gold_rows])
+
+        # Tags: aligned separately, since the tag line may be tokenised unlike the rows
+        gold_tag_spans = token_spans(gold.tag_offsets, form_lengths(gold, "tag_form"))
+        pred_tag_spans = token_spans(pred.tag_offsets, form_lengths(pred, "tag_form"))
+        gold_tag_rows, pred_tag_rows = align_tokens(gold_tag_spans, pred_tag_spans)
+        # Tag types read the same fields as in `evaluation.pos_upos_eval`: 'upos' the fourth
+        # field (PTB tags) and 'pos' the third (UD tags)
+        tag_names = {}
+        gold_tags = {tag_type: _shared_tags(gold, column, tag_names)[gold_tag_rows]
+                     for tag_type, column in TAG_COLUMNS.items()}
+        pred_tags = {tag_type: _shared_tags(pred, column, tag_names)[pred_tag_rows]
+                     for tag_type, column in TAG_COLUMNS.items()}
+
+        def per_sentence(mask, sentences):
+            return np.bincount(sentences[mask], minlength=n_sentences).astype(np.int64)
+
+        aligned = np.zeros(len(gold_deps["index"]), dtype=bool)
+        aligned[gold_rows] = True
+        word_sentence = gold_spans["sentence"][gold_rows]
+        tag_sentence = gold_tag_spans["sentence"][gold_tag_rows]
+        counts = {
+            "gold_words": np.diff(gold_deps["offsets"]),
+            "pred_words": np.diff(pred_deps["offsets"]),
+            "aligned_words": segment_sum(aligned, gold_deps["offsets"]),
+            "uas": per_sentence(head_correct, word_sentence),
+            "las": per_sentence(label_correct, word_sentence),
+            "gold_tags": np.diff(np.asarray(gold.tag_offsets, dtype=np.int64)),
+            "pred_tags": np.diff(np.asarray(pred.tag_offsets, dtype=np.int64)),
+            "aligned_tags": np.bincount(tag_sentence, minlength=n_sentences).astype(np.int64),
+            **{tag_type: per_sentence(gold_tags[tag_type] == pred_tags[tag_type], tag_sentence)
+               for tag_type in TAG_COLUMNS},
+        }
+        stage.count(sentences=n_sentences, tokens=int(counts["gold_words"].sum()))
+    return counts
+
+
+def _shared_tags(corpus, column, tag_ids):
+    # Tag column translated into a shared id space
+    translation = np.array([tag_ids.setdefault(tag, len(tag_ids)) for tag in corpus.vocabularies["tags"]],
+                           dtype=np.int64)
+    ids = np.asarray(corpus.columns[column][:corpus.tag_offsets[-1]], dtype=np.int64)
+    return translation[ids] if len(translation) else np.zeros(len(ids), dtype=np.int64)
+
+
+def summarize_aligned_counts(counts):
+    """
+    Derives CoNLL 2018 style scores from per-sentence aligned counts.
+
+    Precision divides by the parser's words, recall by the gold words, and the
+    aligned accuracy by the aligned words only.
+
+    Args:
+        counts (dict): Per-sentence counts from `score_aligned`.
+
+    Returns:
+        dict: Precision, recall, F1 (and aligned accuracy) for Words, UAS, LAS,
+              Tokens (tag line), UPOS and POS; the tag scores follow the tag types of
+              `evaluation.pos_upos_eval`, which compare the fourth and third tag fields.
+    """
+    totals = {key: int(np.sum(value)) for key, value in counts.items()}
+
+    def scores(correct, gold, pred, aligned=None):
+        precision = correct / pred if pred else 0.0
+        recall = correct / gold if gold else 0.0
+        result = {
+            "Precision": precision,
+            "Recall": recall,
+            "F1": 2 * correct / (gold + pred) if gold + pred else 0.0,
+        }
+        if aligned is not None:
+            result["Aligned Accuracy"] = correct / aligned if aligned else 0.0
+        return result
+
+    words = (totals["gold_words"], totals["pred_words"])
+    tags = (totals["gold_tags"], totals["pred_tags"])
+    return {
+        "Words": scores(totals["aligned_words"], *words),
+        "UAS": scores(totals["uas"], *words, totals["aligned_words"]),
+        "LAS": scores(totals["las"], *words, totals["aligned_words"]),
+        "Tokens": scores(totals["aligned_tags"], *tags),
+        "UPOS": scores(totals["upos"], *tags, totals["aligned_tags"]),
+        "POS": scores(totals["pos"], *tags, totals["aligned_tags"]),
+    }
+
+
+def evaluate_aligned(gold, pred):
+    """
+    Scores a parser against the gold standard on aligned tokens.
+
+    Args:
+        gold (list or ColumnarCorpus): Gold standard sentences.
+        pred (list or ColumnarCorpus): Parser sentences, in their own tokenisation.
+
+    Returns:
+        dict: Per-sentence counts.
+        dict: CoNLL 2018 style summary.
+    """
+    counts = score_aligned(as_corpus(gold), as_corpus(pred))
+    return counts, summarize_aligned_counts(counts)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Score parsers on tokens aligned through character offsets.")
+    arg_parser.add_argument("--gold", default="data/gold_standard.txt")
+    arg_parser.add_argument("parsers", nargs="*", default=["data/berkeley_neural_output.txt",
+                                                         "data/corenlp_output.txt", "data/allen_output.txt"])
+    args = arg_parser.parse_args()
+
+    gold_standard = load_corpus(args.gold)
+    for path in args.parsers:
+        _, summary = evaluate_aligned(gold_standard, load_corpus(path))
+        print(f"\n{path}:")
+        print(f"  {'Metric':<8} {'Precision':>10} {'Recall':>10} {'F1':>10} {'AligndAcc':>10}")
+        for metric, values in summary.items():
+            aligned = f"{100 * values['Aligned Accuracy']:10.2f}" if "Aligned Accuracy" in values else ""
+            print(f"  {metric:<8} {100 * values['Precision']:10.2f} {100 * values['Recall']:10.2f} "
+                  f"{100 * values['F1']:10.2f} {aligned}")
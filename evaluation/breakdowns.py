@@ -0,0 +1,274 @@
+import numpy as np
+import pandas as pd
+
+
+# Lower bounds of the sentence-length buckets, in gold dependency rows
+LENGTH_BUCKETS = (1, 11, 21, 31, 41, 51)
+
+# Lower bounds of the gold arc length buckets, |head - dependent|
+DISTANCE_BUCKETS = (1, 2, 3, 4, 7, 11)
+
+# Lower bounds of the word frequency bands, in occurrences of the form in the gold standard
+FREQUENCY_BANDS = (1, 2, 11, 101, 1001)
+
+# Counter columns of each kind of table
+ATTACHMENT_COUNTERS = ("tokens", "uas", "las")
+RELATION_COUNTERS = ("gold", "pred", "uas", "las")
+TAGGING_COUNTERS = ("tokens", "correct")
+
+# Group of dependency rows whose gold UPOS is unknown (tag line and rows not aligned)
+UNKNOWN = "_"
+
+# Frequency table filled from each corpus tag column: the third tag field holds UD UPOS
+# tags and the fourth PTB tags, which `evaluation.pos_upos_eval` scores as 'pos' and 'upos'
+FREQUENCY_TABLES = {"tag_upos": "upos_frequency", "tag_pos": "xpos_frequency"}
+
+
+def bucket_names(lower_bounds):
+    """
+    Names buckets from their lower bounds: (1, 2, 4) gives "1", "2-3" and "4+".
+    """
+    names = []
+    for low, high in zip(lower_bounds, (*lower_bounds[1:], None)):
+        if high is None:
+            names.append(f"{low}+")
+        else:
+            names.append(str(low) if high == low + 1 else f"{low}-{high - 1}")
+    return names
+
+
+def bucket_of(values, lower_bounds):
+    """
+    Bucket index of every non-negative value; values below the first bound go to the first bucket.
+    """
+    # A lookup over 0..last bound is a gather instead of a binary search per value
+    last = lower_bounds[-1]
+    lookup = np.maximum(np.searchsorted(np.asarray(lower_bounds), np.arange(last + 1), side="right") - 1, 0)
+    return lookup[np.minimum(values, last)]
+
+
+def arc_groups():
+    """
+    Names the gold arc groups: the root, then arcs whose head is left of the dependent,
+    then arcs whose head is right of it, each by DISTANCE_BUCKETS.
+    """
+    names = bucket_names(DISTANCE_BUCKETS)
+    return ["root", *(f"left {name}" for name in names), *(f"right {name}" for name in names)]
+
+
+def word_frequencies(corpus):
+    """
+    Counts every form of a corpus' vocabulary over its tag lines.
+
+    Args:
+        corpus (ColumnarCorpus): Usually the whole gold standard.
+
+    Returns:
+        np.ndarray: Occurrences of every form id.
+    """
+    forms = np.asarray(corpus.columns["tag_form"][:corpus.tag_offsets[-1]], dtype=np.int64)
+    return np.bincount(forms, minlength=len(corpus.vocabularies["forms"]))
+
+
+def _scatter(table, groups, outcome, levels):
+    # Adds nested counters in one integer bincount: an outcome of k counts in the first
+    # k + 1 of `levels` columns (e.g. 0 a token, 1 also a right head, 2 also a right label)
+    counts = np.bincount(groups * levels + outcome, minlength=len(table) * levels).reshape(len(table), levels)
+    table[:, :levels] += counts[:, ::-1].cumsum(axis=1)[:, ::-1]
+
+
+class Breakdowns:
+    """
+    Grouped count tables filled in place while a parser is scored.
+
+    Every table is an int64 array with one row per group and one column per
+    counter, allocated once: the group sets are the fixed buckets above and the
+    shared relation and tag vocabularies. Scoring adds to them with one integer
+    bincount per table, as the counters are nested (a labelled match is also an
+    unlabelled one). Tables of shards merge by addition, and every rate is derived
+    from the summed counts.
+
+    Tables and counters:
+        length: ATTACHMENT_COUNTERS by LENGTH_BUCKETS of the gold sentence.
+        arc: ATTACHMENT_COUNTERS by `arc_groups` of the gold arc.
+        upos: ATTACHMENT_COUNTERS by gold UPOS (the third tag field, e.g. NOUN), UNKNOWN last.
+        relation: RELATION_COUNTERS by dependency relation; 'gold' counts gold rows
+            with the relation, 'pred' predicted rows, 'uas' and 'las' gold rows with the
+            right head, and with the right head and relation.
+        upos_frequency, xpos_frequency: TAGGING_COUNTERS by FREQUENCY_BANDS of the
+            gold form, for the UPOS (third) and PTB (fourth) tag fields, see FREQUENCY_TABLES.
+
+    Args:
+        labels (list): Shared relation vocabulary.
+        tags (list): Shared tag vocabulary.
+        form_counts (np.ndarray): Gold occurrences of every gold form id, see
+            `word_frequencies` (default: counted on the gold corpus being scored).
+        tables (dict): Tables to start from (default: zeros).
+    """
+
+    def __init__(self, labels, tags, form_counts=None, tables=None):
+        self.labels = list(labels)
+        self.tags = list(tags)
+        self.form_counts = form_counts
+        self.tables = tables if tables is not None else {
+            name: np.zeros((len(groups), len(counters)), dtype=np.int64)
+            for name, (groups, counters) in self.layout().items()
+        }
+
+    @classmethod
+    def for_corpora(cls, gold, parsers, root_label="ROOT"):
+        """
+        Empty tables sized for a gold corpus and the parser corpora scored against it.
+
+        Args:
+            gold (ColumnarCorpus): Gold standard corpus; its word frequencies set the bands.
+            parsers (iterable): Parser corpora.
+            root_label (str): Relation label that marks the root row.
+
+        Returns:
+            Breakdowns: Zero tables over the relations and tags of all corpora.
+        """
+        label_ids, tag_ids = {root_label: 0}, {}
+        for corpus in [gold, *parsers]:
+            for label in corpus.vocabularies["labels"]:
+                label_ids.setdefault(label, len(label_ids))
+            for tag in corpus.vocabularies["tags"]:
+                tag_ids.setdefault(tag, len(tag_ids))
+        return cls(label_ids, tag_ids, word_frequencies(gold))
+
+    def layout(self):
+        """
+        Returns table name to (group names, counter names).
+        """
+        return {
+            "length": (bucket_names(LENGTH_BUCKETS), ATTACHMENT_COUNTERS),
+            "arc": (arc_groups(), ATTACHMENT_COUNTERS),
+            "upos": ([*self.tags, UNKNOWN], ATTACHMENT_COUNTERS),
+            "relation": (self.labels, RELATION_COUNTERS),
+            **{name: (bucket_names(FREQUENCY_BANDS), TAGGING_COUNTERS) for name in FREQUENCY_TABLES.values()},
+        }
+
+    def empty(self):
+        """
+        Returns zero tables with the same groups, e.g. for one shard.
+        """
+        return Breakdowns(self.labels, self.tags, self.form_counts)
+
+    def __iadd__(self, other):
+        for name, table in other.tables.items():
+            self.tables[name] += table
+        return self
+
+    def add_dependency(self, gold, pred, pred_heads, pred_labels, gold_upos):
+        """
+        Adds the attachment and relation counts of scored dependency rows.
+
+        Args:
+            gold (dict): Gold dependency arrays, labels in the ids of `self.labels`.
+            pred (dict): Predicted arrays cut to the gold sentences, from `match_predicted_rows`.
+            pred_heads (np.ndarray): Predicted head of every gold row, -1 where missing.
+            pred_labels (np.ndarray): Predicted label of every gold row, -1 where missing.
+            gold_upos (np.ndarray): Gold UPOS id of every gold row, len(self.tags) where unknown.
+        """
+        head_correct = pred_heads == gold["heads"]
+        outcome = head_correct.astype(np.int64) + (head_correct & (pred_labels == gold["labels"]))
+
+        lengths = np.diff(gold["offsets"])
+        length_group = np.repeat(bucket_of(lengths, LENGTH_BUCKETS), lengths)
+        _scatter(self.tables["length"], length_group, outcome, 3)
+
+        # Root rows first, then left and right arcs by distance bucket
+        distance = gold["heads"] - gold["index"]
+        arc_group = bucket_of(np.abs(distance), DISTANCE_BUCKETS) + 1
+        arc_group = np.where(distance > 0, arc_group + len(DISTANCE_BUCKETS), arc_group)
+        _scatter(self.tables["arc"], np.where(gold["heads"] == 0, 0, arc_group), outcome, 3)
+
+        _scatter(self.tables["upos"], gold_upos, outcome, 3)
+
+        # Gold, right-head and right-label rows per gold relation go to columns 0, 2 and 3
+        relation = self.tables["relation"]
+        counts = np.zeros((len(relation), 3), dtype=np.int64)
+        _scatter(counts, gold["labels"], outcome, 3)
+        relation[:, [0, 2, 3]] += counts
+        relation[:, 1] += np.bincount(pred["labels"], minlength=len(relation))
+
+    def add_tagging(self, column, correct, gold_forms, gold):
+        """
+        Adds the tag accuracy counts of scored tokens by word frequency band.
+
+        Args:
+            column (str): Corpus tag column that was scored, a key of FREQUENCY_TABLES.
+            correct (np.ndarray): Whether every gold token got its tag.
+            gold_forms (np.ndarray): Gold form id of every token.
+            gold (ColumnarCorpus): Gold corpus, counted when no form counts were given.
+        """
+        if self.form_counts is None:
+            self.form_counts = word_frequencies(gold)
+        band = bucket_of(self.form_counts[gold_forms], FREQUENCY_BANDS)
+        _scatter(self.tables[FREQUENCY_TABLES[column]], band, np.asarray(correct, dtype=np.int64), 2)
+
+    def frames(self):
+        """
+        Turns every non-empty table into a DataFrame with its counts and rates.
+
+        Returns:
+            dict: Table name to a DataFrame with one row per group that has counts.
+        """
+        frames = {}
+        for name, (groups, counters) in self.layout().items():
+            table = self.tables[name]
+            df = pd.DataFrame(table, columns=list(counters))
+            df.insert(0, "group", groups)
+            df = df[table.any(axis=1)].reset_index(drop=True)
+            if df.empty:
+                continue
+
+            if counters == RELATION_COUNTERS:
+                # Labelled precision and recall per relation
+                df["precision"] = np.where(df["pred"] > 0, df["las"] / np.maximum(df["pred"], 1), 0.0)
+                df["recall"] = np.where(df["gold"] > 0, df["las"] / np.maximum(df["gold"], 1), 0.0)
+                total = df["precision"] + df["recall"]
+                df["f1"] = np.where(total > 0, 2 * df["precision"] * df["recall"] / np.where(total > 0, total, 1), 0.0)
+            else:
+                for counter in counters[1:]:
+                    rate = "accuracy" if counter == "correct" else counter.upper()
+                    df[rate] = df[counter] / np.maximum(df["tokens"], 1)
+            frames[name] = df
+        return frames
+
+    def table(self):
+        """
+        Returns all non-empty tables stacked into one long DataFrame with a 'table' column.
+        """
+        frames = [df.assign(table=name) for name, df in self.frames().items()]
+        if not frames:
+            return pd.DataFrame(columns=["table", "group"])
+        df = pd.concat(frames, ignore_index=True)
+        return df[["table", *(column for column in df.columns if column != "table")]]
+
+
+def gold_upos_of_rows(gold_corpus, gold, tag_ids):
+    """
+    Looks up the gold UPOS (third tag field) of every gold dependency row through its dependent index.
+
+    Args:
+        gold_corpus (ColumnarCorpus): Gold corpus.
+        gold (dict): Its dependency arrays.
+        tag_ids (dict): Tag to id mapping of the tables.
+
+    Returns:
+        np.ndarray: Tag id of every row; len(tag_ids) where the sentence's tag line and
+                    rows differ in length or the index is out of range.
+    """
+    unknown = len(tag_ids)
+    tag_offsets = np.asarray(gold_corpus.tag_offsets, dtype=np.int64)
+    translation = np.array([tag_ids.get(tag, unknown) for tag in gold_corpus.vocabularies["tags"]], dtype=np.int64)
+    local = np.asarray(gold_corpus.columns["tag_upos"][:tag_offsets[-1]], dtype=np.int64)
+    tags = np.append(translation[local] if len(translation) else local, unknown)
+
+    lengths = np.diff(tag_offsets)
+    rows = np.diff(gold["offsets"])
+    sentence = np.repeat(np.arange(len(rows)), rows)
+    index = gold["index"]
+    valid = (lengths == rows)[sentence] & (index >= 1) & (index <= lengths[sentence])
+    return tags[np.where(valid, tag_offsets[sentence] + index - 1, len(tags) - 1)]
@@ -0,0 +1,421 @@
+import argparse
+import os
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from evaluation.results_writer import (RESULT_FORMATS, ResultsWriter, default_format, print_summary, summary_frame,
+                                       write_table)
+from scripts.constituency_tree import scan_tree
+from scripts.data_preprocess import load_sentences
+from scripts.instrumentation import tracer
+
+
+# Parameters of EVALB's standard COLLINS.prm
+EVALB_DEFAULTS = {
+    "LABELED": 1,
+    "CUTOFF_LEN": 40,
+    "MAX_ERROR": 10,
+    "DELETE_LABEL": ["TOP", "-NONE-", ",", ":", "``", "''", "."],
+    "DELETE_LABEL_FOR_LENGTH": ["-NONE-"],
+    "EQ_LABEL": [["ADVP", "PRT"]],
+    "EQ_WORD": [],
+}
+
+
+def load_evalb_params(file_path):
+    """
+    Reads an EVALB parameter file (e.g. COLLINS.prm) on top of the defaults.
+
+    Repeated keys such as DELETE_LABEL accumulate, EQ_LABEL and EQ_WORD lines
+    each define one equivalence group.
+
+    Args:
+        file_path (str): The path to the parameter file.
+
+    Returns:
+        dict: EVALB parameters.
+    """
+    params = {key: value for key, value in EVALB_DEFAULTS.items() if not isinstance(value, list)}
+    params.update({key: [] for key, value in EVALB_DEFAULTS.items() if isinstance(value, list)})
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0] not in EVALB_DEFAULTS:
+                continue
+            key, values = fields[0], fields[1:]
+            if key in ("EQ_LABEL", "EQ_WORD"):
+                params[key].append(values)
+            elif isinstance(EVALB_DEFAULTS[key], list):
+                params[key].extend(values)
+            elif values:
+                params[key] = int(values[0])
+    return params
+
+
+def parse_brackets(tree):
+    """
+    Extracts terminals and labelled spans from a bracketed tree without recursion.
+
+    A bracket holding exactly one word is read as a POS tag, as EVALB does. Trees
+    that mix bare words with sub-brackets inside one node (the style of the raw
+    gold standard) have no POS layer, so there every bracket is a constituent.
+
+    Args:
+        tree (str): Bracketed constituency parse.
+
+    Returns:
+        list: (word, tag) terminals, tag None for untagged words.
+        list: (label, start, end) constituents over terminal positions, end exclusive.
+    """
+    ids = {"labels": {}, "words": {}}
+    parents, label_ids, starts, ends, leaves = scan_tree(tree, ids)
+    labels, words = list(ids["labels"]), list(ids["words"])
+
+    # Child brackets and the words they cover, per bracket
+    n_brackets = [0] * len(parents)
+    covered = [0] * len(parents)
+    for node, parent in enumerate(parents):
+        if parent >= 0:
+            n_brackets[parent] += 1
+            covered[parent] += ends[node] - starts[node]
+    mixed = any(n and end - start > cover for n, start, end, cover in zip(n_brackets, starts, ends, covered))
+
+    tags = [None] * len(leaves)
+    constituents = []
+    for label_id, start, end, n in zip(label_ids, starts, ends, n_brackets):
+        label = labels[label_id]
+        if n == 0 and end - start == 1 and not mixed:
+            tags[start] = label
+        elif label:
+            constituents.append((label, start, end))
+
+    return [(words[i], tag) for i, tag in zip(leaves, tags)], constituents
+
+
+def _normalize_label(label, label_map):
+    # Strip function tags and indices ("NP-SBJ=2" -> "NP") as EVALB does
+    if not label.startswith("-"):
+        label = re.split(r"[-=]", label, maxsplit=1)[0]
+    return label_map.get(label, label)
+
+
+def _equivalence_map(groups):
+    # Every member of a group maps to the group's first entry
+    return {member: group[0] for group in groups for member in group[1:]}
+
+
+def _drop_terminals(terminals, brackets, keep):
+    # Remove terminals and re-index spans over the remaining ones; emptied spans go
+    position = np.concatenate(([0], np.cumsum(keep, dtype=np.int64)))
+    remaining = [terminal for terminal, k in zip(terminals, keep) if k]
+    spans = [(label, int(position[start]), int(position[end])) for label, start, end in brackets]
+    return remaining, [span for span in spans if span[2] > span[1]]
+
+
+def score_tree_pair(gold_tree, test_tree, params=None):
+    """
+    Computes EVALB bracketing and tagging counts for one sentence.
+
+    Args:
+        gold_tree (str): Gold bracketed parse.
+        test_tree (str): Parser bracketed parse.
+        params (dict): EVALB parameters (default: EVALB_DEFAULTS).
+
+    Returns:
+        dict: 'length', 'status' (0 valid, 1 error), 'matched', 'gold', 'test',
+              'crossing', 'words', 'tagged' and 'correct_tags' counts.
+    """
+    params = params or EVALB_DEFAULTS
+    delete_labels = set(params["DELETE_LABEL"])
+    length_labels = set(params["DELETE_LABEL_FOR_LENGTH"])
+    label_map = _equivalence_map(params["EQ_LABEL"])
+    word_map = _equivalence_map(params["EQ_WORD"])
+
+    counts = {"length": 0, "status": 1, "matched": 0, "gold": 0, "test": 0,
+              "crossing": 0, "words": 0, "tagged": 0, "correct_tags": 0}
+    try:
+        gold_terminals, gold_brackets = parse_brackets(gold_tree)
+        test_terminals, test_brackets = parse_brackets(test_tree)
+    except ValueError:
+        return counts  # Unbalanced brackets
+
+    # Words tagged with DELETE_LABEL_FOR_LENGTH do not count towards the length
+    gold_terminals, gold_brackets = _drop_terminals(
+        gold_terminals, gold_brackets, [tag not in length_labels for _, tag in gold_terminals])
+    test_terminals, test_brackets = _drop_terminals(
+        test_terminals, test_brackets, [tag not in length_labels for _, tag in test_terminals])
+    counts["length"] = len(gold_terminals)
+
+    if len(gold_terminals) != len(test_terminals):
+        return counts  # Length unmatch
+    if any(word_map.get(g, g) != word_map.get(t, t) for (g, _), (t, _) in zip(gold_terminals, test_terminals)):
+        return counts  # Words unmatch
+
+    # Deletion follows the gold tag, or the word itself where neither tree has a POS layer
+    kept = [
+        (gold_tag if gold_tag is not None else (test_tag if test_tag is not None else word)) not in delete_labels
+        for (word, gold_tag), (_, test_tag) in zip(gold_terminals, test_terminals)
+    ]
+    gold_terminals, gold_brackets = _drop_terminals(gold_terminals, gold_brackets, kept)
+    test_terminals, test_brackets = _drop_terminals(test_terminals, test_brackets, kept)
+
+    def spans(brackets):
+        # Normalise labels and drop deleted brackets
+        return [
+            (label if params["LABELED"] else "", start, end)
+            for label, start, end in ((_normalize_label(b[0], label_map), b[1], b[2]) for b in brackets)
+            if label not in delete_labels
+        ]
+
+    gold_spans = spans(gold_brackets)
+    test_spans = spans(test_brackets)
+    matched = Counter(gold_spans) & Counter(test_spans)
+
+    # A test bracket crosses when it partially overlaps any gold bracket
+    crossing = 0
+    if gold_spans and test_spans:
+        gs, ge = np.array([s[1:] for s in gold_spans]).T[:, :, None]
+        ts, te = np.array([s[1:] for s in test_spans]).T[:, None, :]
+        crosses = ((gs < ts) & (ts < ge) & (ge < te)) | ((ts < gs) & (gs < te) & (te < ge))
+        crossing = int(crosses.any(axis=0).sum())
+
+    # Tagging accuracy only covers words tagged in both trees
+    tagged = [
+        (g_tag, t_tag) for (_, g_tag), (_, t_tag) in zip(gold_terminals, test_terminals)
+        if g_tag is not None and t_tag is not None
+    ]
+
+    counts.update({
+        "status": 0,
+        "matched": sum(matched.values()),
+        "gold": len(gold_spans),
+        "test": len(test_spans),
+        "crossing": crossing,
+        "words": len(gold_terminals),
+        "tagged": len(tagged),
+        "correct_tags": sum(1 for g_tag, t_tag in tagged if label_map.get(g_tag, g_tag) == label_map.get(t_tag, t_tag)),
+    })
+    return counts
+
+
+def constituency_totals(df, cutoff_len=None):
+    """
+    Sums the per-sentence counts that the EVALB summary is built from.
+
+    Totals of disjoint sets of sentences add up key by key, so a corpus can be
+    summarised from the totals of its parts without keeping the per-sentence table.
+
+    Args:
+        df (pd.DataFrame): Per-sentence counts from `constituency_counts`.
+        cutoff_len (int): Only count sentences up to this length (default: all).
+
+    Returns:
+        dict: Integer sentence, bracket, crossing and tag totals.
+    """
+    if cutoff_len is not None:
+        df = df[df["length"] <= cutoff_len]
+    valid = df[df["status"] == 0]
+    return {
+        "sentences": len(df),
+        "errors": int((df["status"] == 1).sum()),
+        "valid": len(valid),
+        "matched": int(valid["matched"].sum()),
+        "gold": int(valid["gold"].sum()),
+        "test": int(valid["test"].sum()),
+        "complete": int(((valid["matched"] == valid["gold"]) & (valid["matched"] == valid["test"])).sum()),
+        "crossing": int(valid["crossing"].sum()),
+        "no_crossing": int((valid["crossing"] == 0).sum()),
+        "two_or_less_crossing": int((valid["crossing"] <= 2).sum()),
+        "tagged": int(valid["tagged"].sum()),
+        "correct_tags": int(valid["correct_tags"].sum()),
+    }
+
+
+def summarize_constituency_totals(totals):
+    """
+    Builds the EVALB summary from corpus totals.
+
+    Args:
+        totals (dict): Totals from `constituency_totals`, possibly summed over several parts.
+
+    Returns:
+        dict: EVALB summary metrics (precision, recall and percentages in %).
+    """
+    matched, gold, test = totals["matched"], totals["gold"], totals["test"]
+    recall = 100.0 * matched / gold if gold > 0 else 0.0
+    precision = 100.0 * matched / test if test > 0 else 0.0
+    n_valid = totals["valid"]
+
+    return {
+        "Number of sentence": totals["sentences"],
+        "Number of Error sentence": totals["errors"],
+        "Number of Valid sentence": n_valid,
+        "Bracketing Recall": recall,
+        "Bracketing Precision": precision,
+        "Bracketing FMeasure": 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0,
+        "Complete match": 100.0 * totals["complete"] / n_valid if n_valid else 0.0,
+        "Average crossing": totals["crossing"] / n_valid if n_valid else 0.0,
+        "No crossing": 100.0 * totals["no_crossing"] / n_valid if n_valid else 0.0,
+        "2 or less crossing": 100.0 * totals["two_or_less_crossing"] / n_valid if n_valid else 0.0,
+        "Tagging accuracy": 100.0 * totals["correct_tags"] / totals["tagged"] if totals["tagged"] > 0 else float("nan"),
+    }
+
+
+def summarize_constituency_counts(df, cutoff_len=None):
+    """
+    Builds the EVALB summary from per-sentence counts.
+
+    Args:
+        df (pd.DataFrame): Per-sentence counts from `evaluate_constituency_parses`.
+        cutoff_len (int): Only summarise sentences up to this length (default: all).
+
+    Returns:
+        dict: EVALB summary metrics (precision, recall and percentages in %).
+    """
+    return summarize_constituency_totals(constituency_totals(df, cutoff_len))
+
+
+def with_cutoff_summary(summary, cutoff_summary, cutoff_len):
+    """
+    Joins EVALB's two summaries into one: all sentences, then the "len<=CUTOFF_LEN" ones.
+
+    Args:
+        summary (dict): Summary of all sentences.
+        cutoff_summary (dict): Summary of the sentences of at most cutoff_len words.
+        cutoff_len (int): EVALB's CUTOFF_LEN.
+
+    Returns:
+        dict: The summary of all sentences, followed by the cutoff metrics with
+              " (len<=N)" appended to their names.
+    """
+    return {**summary, **{f"{key} (len<={cutoff_len})": value for key, value in cutoff_summary.items()}}
+
+
+def evalb_summary(df, cutoff_len=EVALB_DEFAULTS["CUTOFF_LEN"]):
+    """
+    Builds EVALB's "All" and "len<=CUTOFF_LEN" summaries from per-sentence counts.
+
+    Args:
+        df (pd.DataFrame): Per-sentence counts from `constituency_counts`.
+        cutoff_len (int): EVALB's CUTOFF_LEN.
+
+    Returns:
+        dict: See `with_cutoff_summary`.
+    """
+    return with_cutoff_summary(summarize_constituency_counts(df), summarize_constituency_counts(df, cutoff_len),
+                               cutoff_len)
+
+
+def constituency_counts(gold_trees, test_trees, params=None):
+    """
+    Scores pairs of trees and collects the per-sentence EVALB counts.
+
+    Args:
+        gold_trees (list): Gold bracketed parses, one string per sentence.
+        test_trees (list): Parser bracketed parses, one string per sentence.
+        params (dict): EVALB parameters (default: EVALB_DEFAULTS).
+
+    Returns:
+        pd.DataFrame: Sentence-level counts and bracketing scores.
+    """
+    if len(gold_trees) != len(test_trees):
+        raise ValueError(f"Gold has {len(gold_trees)} trees but the parser has {len(test_trees)}")
+
+    with tracer.stage("constituency") as stage:
+        rows = [score_tree_pair(gold, test, params) for gold, test in zip(gold_trees, test_trees)]
+        stage.count(sentences=len(rows), tokens=sum(row["length"] for row in rows))
+
+    with tracer.stage("constituency_table"):
+        df = pd.DataFrame(rows, columns=["length", "status", "matched", "gold", "test",
+                                         "crossing", "words", "tagged", "correct_tags"])
+        df.insert(0, "ID", range(1, len(df) + 1))
+        df["Recall"] = np.where(df["gold"] > 0, 100.0 * df["matched"] / df["gold"].clip(lower=1), 0.0)
+        df["Precision"] = np.where(df["test"] > 0, 100.0 * df["matched"] / df["test"].clip(lower=1), 0.0)
+    return df
+
+
+def evaluate_constituency_parses(gold_trees, test_trees, params=None):
+    """
+    Evaluate constituency parses against the gold standard, EVALB style.
+
+    Args:
+        gold_trees (list): Gold bracketed parses, one string per sentence.
+        test_trees (list): Parser bracketed parses, one string per sentence.
+        params (dict): EVALB parameters (default: EVALB_DEFAULTS).
+
+    Returns:
+        pd.DataFrame: Sentence-level counts and bracketing scores.
+        dict: Overall evaluation summary, over all sentences and over those of at most
+              CUTOFF_LEN words, see `evalb_summary`.
+    """
+    params = params or EVALB_DEFAULTS
+    df = constituency_counts(gold_trees, test_trees, params)
+
+    if (df["status"] == 1).sum() > params["MAX_ERROR"]:
+        raise ValueError(f"Too many errors: {(df['status'] == 1).sum()} sentences do not match the gold standard")
+
+    summary = evalb_summary(df, params["CUTOFF_LEN"])
+    return df, summary
+
+
+def iter_trees(file_path):
+    """
+    Reads a file with one bracketed tree per line (the EVALB input format), one tree at a time.
+
+    Args:
+        file_path (str): The path to the tree file.
+
+    Yields:
+        str: Tree strings, skipping blank lines.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield line.strip()
+
+
+def load_trees(file_path):
+    """
+    Reads a file with one bracketed tree per line (the EVALB input format).
+
+    Args:
+        file_path (str): The path to the tree file.
+
+    Returns:
+        list: Tree strings.
+    """
+    return list(iter_trees(file_path))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Score constituency parses against the gold trees, EVALB style.")
+    arg_parser.add_argument("--format", choices=RESULT_FORMATS, default=default_format(),
+                            help="Results file format (default: parquet if pyarrow is installed, else csv)")
+    arg_parser.add_argument("--output-dir", default="results")
+    args = arg_parser.parse_args()
+
+    # Load the gold trees and the cleaned parser trees
+    gold_trees = load_trees("evaluation/evalb_pre/gold_standard_improved_tree.txt")
+    parsers = {
+        "Berkeley": "data/berkeley_neural_output.txt",
+        "CoreNLP": "data/corenlp_output.txt",
+        "Allen": "data/allen_output.txt",
+    }
+
+    # Per-sentence rows are streamed as one row group per parser; the console shows summaries only
+    summaries = {}
+    with ResultsWriter(os.path.join(args.output_dir, "constituency_sentences"), args.format) as writer:
+        for name, path in parsers.items():
+            test_trees = [sentence["constituency_parse"] for sentence in load_sentences(path)]
+            results, summaries[name] = evaluate_constituency_parses(gold_trees, test_trees)
+            results.insert(0, "Parser", name)
+            writer.write(results)
+            print_summary(f"{name} Parser Summary", summaries[name])
+
+    summary_path = write_table(os.path.join(args.output_dir, "constituency_summary"),
+                               summary_frame(summaries), args.format)
+    print(f"\nSentence results saved to: {writer.path}")
+    print(f"Summary saved to: {summary_path}")
@@ -1,61 +1,279 @@
+import argparse
+import os
+
+import numpy as np
 import pandas as pd
-from scripts.data_preprocess import load_sentences
+from evaluation.breakdowns import Breakdowns, gold_upos_of_rows
+from evaluation.results_writer import (RESULT_FORMATS, ResultsWriter, default_format, print_summary, summary_frame,
+                                       write_table)
+from scripts.corpus_store import as_corpus, load_corpus
+from scripts.instrumentation import tracer
+
+
+# Per-sentence count columns produced by score_dependency_arrays
+DEPENDENCY_COUNT_KEYS = ("tokens", "pred_tokens", "uas", "las", "root", "complete")
 
 
-def evaluate_dependency_parses(gold, predictions):
+def segment_sum(values, offsets):
     """
-    Evaluate dependency parses against the gold standard.
+    Sums a flat per-token array over sentence boundaries with np.add.reduceat.
 
     Args:
-        gold (list): Gold standard dependency parses.
-        predictions (list): Parser-generated dependency parses.
+        values (np.ndarray): Flat per-token values.
+        offsets (np.ndarray): Sentence offsets into `values` (length n_sentences + 1).
+
+    Returns:
+        np.ndarray: One sum per sentence (0 for empty sentences).
+    """
+    starts = np.asarray(offsets[:-1], dtype=np.int64)
+    if len(starts) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # The trailing zero keeps reduceat in bounds for empty sentences at the end
+    padded = np.append(np.asarray(values, dtype=np.int64), 0)
+    sums = np.add.reduceat(padded, starts)
+
+    # reduceat returns the element at the start index for empty segments
+    sums[starts == np.asarray(offsets[1:])] = 0
+    return sums
+
+
+def dependency_arrays(corpus, label_ids):
+    """
+    Extracts the dependency columns of a corpus with labels in a shared id space.
+
+    Args:
+        corpus (ColumnarCorpus): The corpus to extract from.
+        label_ids (dict): Shared label to id mapping; new labels are added in place.
+
+    Returns:
+        dict: 'offsets', 'index', 'heads' and 'labels' arrays.
+    """
+    # Translate the corpus-local label ids into the shared vocabulary
+    translation = np.array(
+        [label_ids.setdefault(label, len(label_ids)) for label in corpus.vocabularies["labels"]],
+        dtype=np.int64,
+    )
+    labels = translation[corpus.labels] if len(translation) else np.zeros(0, dtype=np.int64)
+
+    return {
+        "offsets": np.asarray(corpus.dep_offsets, dtype=np.int64),
+        "index": np.asarray(corpus.columns["dep_index"], dtype=np.int64),
+        "heads": np.asarray(corpus.heads, dtype=np.int64),
+        "labels": labels,
+    }
+
+
+def first_root_index(arrays, root_label_id):
+    """
+    Finds the dependent index of the first root row of every sentence.
+
+    Args:
+        arrays (dict): Dependency arrays from `dependency_arrays`.
+        root_label_id (int): Shared id of the root label.
+
+    Returns:
+        np.ndarray: Dependent index of the first root row, or -1 if there is none.
+    """
+    offsets = arrays["offsets"]
+    n_rows = len(arrays["labels"])
+
+    # Rows that are not roots point past the end, so the minimum is the first root
+    positions = np.where(arrays["labels"] == root_label_id, np.arange(n_rows), n_rows)
+    padded = np.append(positions, n_rows)
+    first = np.minimum.reduceat(padded, offsets[:-1]) if len(offsets) > 1 else np.zeros(0, dtype=np.int64)
+    first[offsets[:-1] == offsets[1:]] = n_rows
+
+    index = np.append(arrays["index"], -1)
+    return index[first]
+
+
+def match_predicted_rows(gold, pred):
+    """
+    Looks up the predicted head and label of every gold dependency row.
+
+    Predicted rows are matched to gold rows by (sentence, dependent index); if a
+    prediction repeats a dependent index the last row wins. Sentence i of the
+    prediction is compared with sentence i of the gold standard.
+
+    Args:
+        gold (dict): Gold dependency arrays from `dependency_arrays`.
+        pred (dict): Predicted dependency arrays, labels in the same id space.
+
+    Returns:
+        dict: Predicted arrays cut to the gold sentences.
+        np.ndarray: Predicted head of every gold row, -1 where the row is missing.
+        np.ndarray: Predicted label of every gold row, -1 where the row is missing.
+    """
+    n_sentences = len(gold["offsets"]) - 1
+    if len(pred["offsets"]) - 1 < n_sentences:
+        raise ValueError(
+            f"Prediction has {len(pred['offsets']) - 1} sentences, gold standard has {n_sentences}"
+        )
+
+    # Drop predicted sentences beyond the end of the gold standard
+    pred_end = pred["offsets"][n_sentences]
+    pred = {
+        "offsets": pred["offsets"][:n_sentences + 1],
+        "index": pred["index"][:pred_end],
+        "heads": pred["heads"][:pred_end],
+        "labels": pred["labels"][:pred_end],
+    }
+
+    gold_sentence = np.repeat(np.arange(n_sentences), np.diff(gold["offsets"]))
+    pred_sentence = np.repeat(np.arange(n_sentences), np.diff(pred["offsets"]))
+
+    # One integer key per (sentence, dependent index)
+    stride = int(max(gold["index"].max(initial=0), pred["index"].max(initial=0))) + 1
+    gold_keys = gold_sentence * stride + gold["index"]
+    pred_keys = pred_sentence * stride + pred["index"]
+
+    # Look up the predicted row of every gold row
+    order = np.argsort(pred_keys, kind="stable")
+    sorted_keys = pred_keys[order]
+    found = np.searchsorted(sorted_keys, gold_keys, side="right") - 1
+    matched = found >= 0
+    matched[matched] = sorted_keys[found[matched]] == gold_keys[matched]
+
+    # Unmatched gold rows point at a trailing sentinel row that never agrees with gold
+    pred_row = np.where(matched, np.append(order, -1)[found], -1)
+    pred_heads = np.append(pred["heads"], -1)
+    pred_labels = np.append(pred["labels"], -1)
+
+    return pred, pred_heads[pred_row], pred_labels[pred_row]
+
+
+def score_dependency_arrays(gold, pred, root_label_id, breakdowns=None, gold_upos=None):
+    """
+    Scores a whole corpus of dependency parses in a few array operations.
+
+    Predicted rows are matched to gold rows with `match_predicted_rows`.
+
+    Args:
+        gold (dict): Gold dependency arrays from `dependency_arrays`.
+        pred (dict): Predicted dependency arrays, labels in the same id space.
+        root_label_id (int): Shared id of the root label.
+        breakdowns (Breakdowns): Grouped tables to add the rows to, labels in their id space.
+        gold_upos (np.ndarray): Gold UPOS id of every gold row, needed with `breakdowns`.
+
+    Returns:
+        dict: Per-sentence integer counts for every key in DEPENDENCY_COUNT_KEYS.
+    """
+    pred, pred_heads, pred_labels = match_predicted_rows(gold, pred)
+    if breakdowns is not None:
+        breakdowns.add_dependency(gold, pred, pred_heads, pred_labels, gold_upos)
+    head_correct = pred_heads == gold["heads"]
+    label_correct = head_correct & (pred_labels == gold["labels"])
+
+    tokens = np.diff(gold["offsets"])
+    pred_tokens = np.diff(pred["offsets"])
+    las = segment_sum(label_correct, gold["offsets"])
+
+    gold_root = first_root_index(gold, root_label_id)
+    pred_root = first_root_index(pred, root_label_id)
+
+    return {
+        "tokens": tokens,
+        "pred_tokens": pred_tokens,
+        "uas": segment_sum(head_correct, gold["offsets"]),
+        "las": las,
+        "root": (gold_root == pred_root).astype(np.int64),
+        "complete": ((las == tokens) & (pred_tokens == tokens)).astype(np.int64),
+    }
+
+
+def summarize_dependency_counts(counts):
+    """
+    Derives corpus-level scores from per-sentence dependency counts.
+
+    Macro averages are means of the per-sentence ratios, micro averages divide the
+    summed counts.
+
+    Args:
+        counts (dict): Per-sentence counts from `score_dependency_arrays`.
 
     Returns:
-        pd.DataFrame: Sentence-level evaluation results.
         dict: Overall evaluation summary.
     """
-    results = []
+    tokens = counts["tokens"]
+    total = tokens.sum()
+    denominator = np.maximum(tokens, 1)
 
-    for i, gold_sentence in enumerate(gold):
-        pred_sentence = predictions[i]
+    return {
+        "Average UAS": np.mean(counts["uas"] / denominator) if len(tokens) else 0.0,
+        "Average LAS": np.mean(counts["las"] / denominator) if len(tokens) else 0.0,
+        "Micro UAS": counts["uas"].sum() / total if total > 0 else 0.0,
+        "Micro LAS": counts["las"].sum() / total if total > 0 else 0.0,
+        "Root Accuracy": np.mean(counts["root"]) if len(tokens) else 0.0,
+        "Complete Match Rate": np.mean(counts["complete"]) if len(tokens) else 0.0,
+    }
 
-        # Extract gold and predicted dependencies
-        try:
-            gold_deps = {(int(dep[0]), int(dep[3])): dep[2] for dep in gold_sentence["dependency_parse"]}
-            pred_deps = {(int(dep[0]), int(dep[3])): dep[2] for dep in pred_sentence["dependency_parse"]}
-        except ValueError as e:
-            print(f"Error in sentence {i + 1}: {gold_sentence['text']}")
-            print(f"Dependency parse: {gold_sentence['dependency_parse']}")
-            raise e
 
-        # Total dependencies
-        total = len(gold_deps)
+def evaluate_dependency_corpus(gold, predictions, root_label="ROOT", breakdowns=None):
+    """
+    Scores a predicted corpus against the gold corpus with the batch engine.
 
-        # Calculate UAS (Unlabeled Attachment Score)
-        uas = sum(1 for dep in gold_deps if dep in pred_deps)
+    Args:
+        gold (ColumnarCorpus): Gold standard corpus.
+        predictions (ColumnarCorpus): Parser-generated corpus.
+        root_label (str): Relation label that marks the root row.
+        breakdowns (Breakdowns): Grouped tables filled in place during scoring, sized for
+            both corpora (see `Breakdowns.for_corpora`).
 
-        # Calculate LAS (Labeled Attachment Score)
-        las = sum(1 for dep in gold_deps if dep in pred_deps and gold_deps[dep] == pred_deps[dep])
+    Returns:
+        dict: Per-sentence counts.
+        dict: Overall evaluation summary with macro and micro averages.
+    """
+    with tracer.stage("dependency") as stage:
+        if breakdowns is None:
+            label_ids, gold_upos = {root_label: 0}, None
+        else:
+            # Labels in the id space of the tables, which must already hold every label
+            label_ids = {label: i for i, label in enumerate(breakdowns.labels)}
+            label_ids.setdefault(root_label, len(label_ids))
+        gold_arrays = dependency_arrays(gold, label_ids)
+        pred_arrays = dependency_arrays(predictions, label_ids)
+        if breakdowns is not None:
+            if len(label_ids) > len(breakdowns.labels):
+                missing = list(label_ids)[len(breakdowns.labels):]
+                raise ValueError(f"Relations {missing} are not in the breakdown tables")
+            gold_upos = gold_upos_of_rows(gold, gold_arrays, {tag: i for i, tag in enumerate(breakdowns.tags)})
 
-        # Calculate Root Accuracy
-        gold_root = next((dep[0] for dep in gold_sentence["dependency_parse"] if dep[2] == "ROOT"), None)
-        pred_root = next((dep[0] for dep in pred_sentence["dependency_parse"] if dep[2] == "ROOT"), None)
-        root_acc = 1 if gold_root == pred_root else 0
+        counts = score_dependency_arrays(gold_arrays, pred_arrays, label_ids[root_label], breakdowns, gold_upos)
+        stage.count(sentences=len(counts["tokens"]), tokens=int(counts["tokens"].sum()))
+    return counts, summarize_dependency_counts(counts)
 
-        # Calculate Complete Match
-        complete_match = 1 if gold_deps == pred_deps else 0
 
-        # Append results for the current sentence
-        results.append({
-            "sentence": gold_sentence["text"],
-            "UAS": uas / total if total > 0 else 0,
-            "LAS": las / total if total > 0 else 0,
-            "Root Accuracy": root_acc,
-            "Complete Match": complete_match,
-        })
+def evaluate_dependency_parses(gold, predictions, breakdowns=None):
+    """
+    Evaluate dependency parses against the gold standard.
+
+    Args:
+        gold (list or ColumnarCorpus): Gold standard dependency parses.
+        predictions (list or ColumnarCorpus): Parser-generated dependency parses.
+        breakdowns (Breakdowns): Grouped tables filled in place during scoring (default: none).
+
+    Returns:
+        pd.DataFrame: Sentence-level evaluation results.
+        dict: Overall evaluation summary.
+    """
+    gold = as_corpus(gold)
+    predictions = as_corpus(predictions)
+
+    counts, _ = evaluate_dependency_corpus(gold, predictions, breakdowns=breakdowns)
+    tokens = counts["tokens"]
+    denominator = np.maximum(tokens, 1)
 
     # Convert results to a DataFrame
-    df = pd.DataFrame(results)
+    with tracer.stage("dependency_table") as stage:
+        df = pd.DataFrame({
+            "sentence": [gold.text(i) for i in range(len(gold))],
+            "UAS": np.where(tokens > 0, counts["uas"] / denominator, 0),
+            "LAS": np.where(tokens > 0, counts["las"] / denominator, 0),
+            "Root Accuracy": counts["root"],
+            "Complete Match": counts["complete"],
+        })
+        stage.count(sentences=len(df))
 
     # Summary of metrics
     summary = {
@@ -69,54 +287,42 @@ def evaluate_dependency_parses(gold, predictions):
 
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Evaluate dependency parses against the gold standard.")
+    arg_parser.add_argument("--format", choices=RESULT_FORMATS, default=default_format(),
+                            help="Results file format (default: parquet if pyarrow is installed, else csv)")
+    arg_parser.add_argument("--output-dir", default="results")
+    arg_parser.add_argument("--breakdowns", action="store_true",
+                            help="Also save UAS/LAS by sentence length, arc, relation and gold UPOS "
+                                 "(the third tag field, e.g. NOUN)")
+    args = arg_parser.parse_args()
+
     # Load gold standard and parser outputs
-    gold_standard = load_sentences('data/gold_standard.txt')
-    berkeley = load_sentences('data/berkeley_neural_output.txt')
-    corenlp = load_sentences('data/corenlp_output.txt')
-    allen = load_sentences('data/allen_output.txt')
-
-    # Evaluate Berkeley parser
-    berkeley_results, berkeley_summary = evaluate_dependency_parses(gold_standard, berkeley)
-    print("Berkeley Parser Results:")
-    print(berkeley_results)
-    print("\nSummary:")
-    print(berkeley_summary)
-
-    # Save Berkeley results to a txt file
-    with open("results/berkeley_dependency_results.txt", "w", encoding="utf-8") as f:
-        f.write("Berkeley Parser Results:\n")
-        f.write(berkeley_results.to_string(index=False))  # Save DataFrame as string
-        f.write("\n\nSummary:\n")
-        for key, value in berkeley_summary.items():
-            f.write(f"{key}: {value}\n")
-
-    # Evaluate CoreNLP parser
-    corenlp_results, corenlp_summary = evaluate_dependency_parses(gold_standard, corenlp)
-    print("\nCoreNLP Parser Results:")
-    print(corenlp_results)
-    print("\nSummary:")
-    print(corenlp_summary)
-
-    # Save CoreNLP results to a txt file
-    with open("results/corenlp_dependency_results.txt", "w", encoding="utf-8") as f:
-        f.write("CoreNLP Parser Results:\n")
-        f.write(corenlp_results.to_string(index=False))
-        f.write("\n\nSummary:\n")
-        for key, value in corenlp_summary.items():
-            f.write(f"{key}: {value}\n")
-
-    # Evaluate Allen parser
-    allen_results, allen_summary = evaluate_dependency_parses(gold_standard, allen)
-    print("\nAllen Parser Results:")
-    print(allen_results)
-    print("\nSummary:")
-    print(allen_summary)
-
-    # Save Allen results to a txt file
-    with open("results/allen_dependency_results.txt", "w", encoding="utf-8") as f:
-        f.write("Allen Parser Results:\n")
-        f.write(allen_results.to_string(index=False))
-        f.write("\n\nSummary:\n")
-        for key, value in allen_summary.items():
-            f.write(f"{key}: {value}\n")
+    gold_standard = load_corpus('data/gold_standard.txt')
+    parsers = {
+        "Berkeley": 'data/berkeley_neural_output.txt',
+        "CoreNLP": 'data/corenlp_output.txt',
+        "Allen": 'data/allen_output.txt',
+    }
+
+    # Per-sentence rows are streamed as one row group per parser; the console shows summaries only
+    summaries, tables = {}, {}
+    with ResultsWriter(os.path.join(args.output_dir, "dependency_sentences"), args.format) as writer:
+        for name, path in parsers.items():
+            predictions = load_corpus(path)
+            breakdowns = Breakdowns.for_corpora(gold_standard, [predictions]) if args.breakdowns else None
+            results, summaries[name] = evaluate_dependency_parses(gold_standard, predictions, breakdowns)
+            if breakdowns is not None:
+                tables[name] = breakdowns.table()
+            results.insert(0, "Parser", name)
+            results.insert(1, "ID", range(1, len(results) + 1))
+            writer.write(results)
+            print_summary(f"{name} Parser Summary", summaries[name])
 
+    summary_path = write_table(os.path.join(args.output_dir, "dependency_summary"),
+                               summary_frame(summaries), args.format)
+    print(f"\nSentence results saved to: {writer.path}")
+    print(f"Summary saved to: {summary_path}")
+    if tables:
+        breakdowns_path = write_table(os.path.join(args.output_dir, "dependency_breakdowns"),
+                                      pd.concat(tables, names=["Parser"]).reset_index(0), args.format)
+        print(f"Breakdowns saved to: {breakdowns_path}")
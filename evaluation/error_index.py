@@ -0,0 +1,440 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from evaluation.dependency_eval import dependency_arrays, match_predicted_rows
+from evaluation.pos_upos_eval import TAG_COLUMNS
+
+
+# Kinds of errors recorded per token: wrong head, right head with a wrong relation, and a
+# wrong tag of each tag type of `evaluation.pos_upos_eval`, comparing the same fields
+# ('upos' the fourth tag field, which holds PTB tags, and 'pos' the third, UD tags)
+ERROR_TYPES = ("head", "label", *TAG_COLUMNS)
+
+# Columns of an error record; sentence and token are 0-based and 1-based positions
+RECORD_COLUMNS = ("parser", "error", "sentence", "token", "gold", "pred", "distance", "pos", "head_pos",
+                  "gold_head", "pred_head")
+
+# Columns with an inverted index, i.e. the keys a query can filter on
+INDEXED_COLUMNS = ("parser", "error", "gold", "pred", "distance", "pos", "head_pos")
+
+# Columns holding ids into the shared symbol vocabulary (labels and tags)
+SYMBOL_COLUMNS = ("gold", "pred", "pos", "head_pos")
+
+# Context symbols: unknown (missing row, or tags not aligned with the rows) and the root
+UNKNOWN = "_"
+ROOT = "<ROOT>"
+
+# Distance of tokens whose dependency row is unknown
+NO_DISTANCE = np.iinfo(np.int32).min
+
+
+def symbol_vocabulary(corpora):
+    """
+    Builds the shared label and tag vocabulary of several corpora.
+
+    Args:
+        corpora (iterable): ColumnarCorpus objects (gold and parsers).
+
+    Returns:
+        dict: Symbol to id, starting with UNKNOWN and ROOT.
+    """
+    symbol_ids = {UNKNOWN: 0, ROOT: 1}
+    for corpus in corpora:
+        for symbol in [*corpus.vocabularies["labels"], *corpus.vocabularies["tags"]]:
+            symbol_ids.setdefault(symbol, len(symbol_ids))
+    return symbol_ids
+
+
+def _tags(corpus, column, symbol_ids):
+    # Tag column translated into the shared symbol ids
+    translation = np.array([symbol_ids.setdefault(tag, len(symbol_ids)) for tag in corpus.vocabularies["tags"]],
+                           dtype=np.int64)
+    ids = np.asarray(corpus.columns[column][:corpus.tag_offsets[-1]], dtype=np.int64)
+    return translation[ids] if len(translation) else np.zeros(len(ids), dtype=np.int64)
+
+
+def error_records(gold, pred, symbol_ids):
+    """
+    Collects every dependency and tagging error of a parser in one vectorised pass.
+
+    Dependency rows are matched by dependent index as in the dependency evaluator;
+    a row with a wrong head is a 'head' error, a row with the right head but a wrong
+    relation a 'label' error. Tags are compared by position in sentences whose tag
+    lines have the same length, as in the tagging evaluator. Every error carries the
+    gold and predicted label (or tag), the signed gold head distance and the gold
+    PTB tag (fourth tag field) of the token and of its gold head. The context is
+    UNKNOWN where the tag line and the dependency rows of a gold sentence are not
+    aligned.
+
+    Args:
+        gold (ColumnarCorpus): Gold standard corpus.
+        pred (ColumnarCorpus): Parser corpus; sentence i is compared with gold sentence i.
+        symbol_ids (dict): Shared symbol vocabulary from `symbol_vocabulary`.
+
+    Returns:
+        dict: Error record columns (RECORD_COLUMNS without 'parser'), sentences 0-based.
+    """
+    n_sentences = len(gold)
+    pred = pred.slice(0, min(len(pred), n_sentences))
+    unknown, root = symbol_ids[UNKNOWN], symbol_ids[ROOT]
+
+    gold_deps = dependency_arrays(gold, symbol_ids)
+    _, pred_heads, pred_labels = match_predicted_rows(gold_deps, dependency_arrays(pred, symbol_ids))
+
+    # Gold PTB tag of token i of a sentence, where tags and rows are aligned
+    tag_offsets = np.asarray(gold.tag_offsets, dtype=np.int64)
+    dep_offsets = gold_deps["offsets"]
+    aligned = np.diff(tag_offsets) == np.diff(dep_offsets)
+    gold_context = np.append(_tags(gold, "tag_pos", symbol_ids), unknown)
+
+    def context(sentence, index):
+        # Tag of the 1-based token index; ROOT for 0, UNKNOWN when not aligned
+        valid = aligned[sentence] & (index >= 1) & (index <= np.diff(tag_offsets)[sentence])
+        position = np.where(valid, tag_offsets[sentence] + index - 1, len(gold_context) - 1)
+        return np.where(index == 0, root, gold_context[position])
+
+    # Dependency errors
+    row_sentence = np.repeat(np.arange(n_sentences), np.diff(dep_offsets))
+    index, heads, labels = gold_deps["index"], gold_deps["heads"], gold_deps["labels"]
+    head_error = pred_heads != heads
+    label_error = ~head_error & (pred_labels != labels)
+    distance = np.where(heads == 0, 0, heads - index)
+
+    records = []
+    for error, mask in (("head", head_error), ("label", label_error)):
+        rows = np.flatnonzero(mask)
+        records.append({
+            "error": np.full(len(rows), ERROR_TYPES.index(error)),
+            "sentence": row_sentence[rows],
+            "token": index[rows],
+            "gold": labels[rows],
+            "pred": np.where(pred_labels[rows] >= 0, pred_labels[rows], unknown),
+            "distance": distance[rows],
+            "pos": context(row_sentence[rows], index[rows]),
+            "head_pos": context(row_sentence[rows], heads[rows]),
+            "gold_head": heads[rows],
+            "pred_head": pred_heads[rows],
+        })
+
+    # Tagging errors, on sentences whose tag lines have the same length
+    pred_offsets = np.asarray(pred.tag_offsets, dtype=np.int64)
+    comparable = np.zeros(n_sentences, dtype=bool)
+    comparable[:len(pred)] = np.diff(tag_offsets)[:len(pred)] == np.diff(pred_offsets)
+    tag_sentence = np.repeat(np.arange(n_sentences), np.diff(tag_offsets))
+    tag_rows = np.flatnonzero(comparable[tag_sentence])
+    token = tag_rows - tag_offsets[tag_sentence[tag_rows]] + 1
+    pred_rows = pred_offsets[tag_sentence[tag_rows]] + token - 1
+
+    # Gold head of the token's dependency row, where tags and rows are aligned
+    sentence = tag_sentence[tag_rows]
+    has_row = aligned[sentence]
+    dep_row = np.where(has_row, dep_offsets[sentence] + token - 1, 0)
+    token_heads = np.where(has_row, heads[dep_row] if len(heads) else 0, -1)
+
+    for error, column in TAG_COLUMNS.items():
+        gold_tags = _tags(gold, column, symbol_ids)[tag_rows]
+        pred_tags = _tags(pred, column, symbol_ids)[pred_rows]
+        wrong = np.flatnonzero(gold_tags != pred_tags)
+        records.append({
+            "error": np.full(len(wrong), ERROR_TYPES.index(error)),
+            "sentence": sentence[wrong],
+            "token": token[wrong],
+            "gold": gold_tags[wrong],
+            "pred": pred_tags[wrong],
+            "distance": np.where(has_row[wrong], distance[dep_row[wrong]] if len(distance) else 0, NO_DISTANCE),
+            "pos": context(sentence[wrong], token[wrong]),
+            "head_pos": np.where(has_row[wrong], context(sentence[wrong], np.maximum(token_heads[wrong], 0)), unknown),
+            "gold_head": np.full(len(wrong), -1),
+            "pred_head": np.full(len(wrong), -1),
+        })
+
+    return {key: np.concatenate([record[key] for record in records]).astype(np.int32) for key in RECORD_COLUMNS[1:]}
+
+
+def merge_error_shards(shards):
+    """
+    Concatenates the error records of consecutive sentence ranges.
+
+    Args:
+        shards (list): Dicts with the records of a range and its 'sentences' count, in order.
+
+    Returns:
+        dict: Records with sentence positions relative to the first shard.
+    """
+    starts = np.cumsum([0] + [shard["sentences"] for shard in shards[:-1]])
+    merged = {key: np.concatenate([shard["records"][key] for shard in shards]) for key in RECORD_COLUMNS[1:]}
+    merged["sentence"] = np.concatenate([
+        shard["records"]["sentence"] + start for shard, start in zip(shards, starts)
+    ]).astype(np.int32)
+    return merged
+
+
+def summarize_errors(records):
+    """
+    Counts the errors of one parser by type.
+    """
+    counts = np.bincount(records["error"], minlength=len(ERROR_TYPES))
+    names = {"head": "Head", "label": "Label", "upos": "UPOS", "pos": "POS"}
+    return {f"{names[error]} Errors": int(count) for error, count in zip(ERROR_TYPES, counts)}
+
+
+class ErrorIndex:
+    """
+    Error records of several parsers with an inverted index on their keys.
+
+    Records are stored as flat int32 columns. For every indexed column the row ids
+    are kept sorted by value, so the rows with a given value are one contiguous
+    slice found by binary search, and a query intersects the slices of its filters.
+
+    Args:
+        columns (dict): Column name to int32 array, see RECORD_COLUMNS.
+        vocabularies (dict): 'symbols' and 'parsers' lists indexed by id.
+    """
+
+    def __init__(self, columns, vocabularies):
+        self.columns = columns
+        self.vocabularies = vocabularies
+        self._symbol_ids = {symbol: i for i, symbol in enumerate(vocabularies["symbols"])}
+
+        # Postings: row ids ordered by value, and the sorted values to search in
+        self._postings = {}
+        for column in INDEXED_COLUMNS:
+            order = np.argsort(columns[column], kind="stable")
+            self._postings[column] = (columns[column][order], order)
+
+    def __len__(self):
+        return len(self.columns["error"])
+
+    @classmethod
+    def from_records(cls, parser_records, symbols):
+        """
+        Builds an index from the error records of several parsers.
+
+        Args:
+            parser_records (dict): Parser name to records from `error_records` or `merge_error_shards`.
+            symbols (list or dict): The symbol vocabulary the records were built with, in id order.
+
+        Returns:
+            ErrorIndex: The index.
+        """
+        parsers = list(parser_records)
+        columns = {
+            key: np.concatenate([records[key] for records in parser_records.values()]).astype(np.int32)
+            if parsers else np.zeros(0, dtype=np.int32)
+            for key in RECORD_COLUMNS[1:]
+        }
+        columns["parser"] = np.concatenate([
+            np.full(len(records["error"]), i, dtype=np.int32) for i, records in enumerate(parser_records.values())
+        ]) if parsers else np.zeros(0, dtype=np.int32)
+        return cls(columns, {"symbols": list(symbols), "parsers": parsers})
+
+    def _ids(self, column, values):
+        # Query values of a column as ids; unknown names match nothing
+        values = [values] if isinstance(values, (str, int, np.integer)) else list(values)
+        if column == "parser":
+            return [self.vocabularies["parsers"].index(v) for v in values if v in self.vocabularies["parsers"]]
+        if column == "error":
+            return [ERROR_TYPES.index(v) for v in values if v in ERROR_TYPES]
+        if column in SYMBOL_COLUMNS:
+            return [self._symbol_ids[v] for v in values if v in self._symbol_ids]
+        return [int(v) for v in values]
+
+    def rows(self, **filters):
+        """
+        Finds the rows matching every filter.
+
+        Args:
+            **filters: Indexed column to a value or a list of accepted values, e.g.
+                `error="head", pos=["IN", "TO"], parser="Allen"`. Labels, tags and
+                parsers are given by name; distances are signed integers.
+
+        Returns:
+            np.ndarray: Sorted row ids.
+        """
+        result = None
+        for column, values in filters.items():
+            if column not in INDEXED_COLUMNS:
+                raise ValueError(f"Cannot filter on {column}; indexed columns are {INDEXED_COLUMNS}")
+            sorted_values, order = self._postings[column]
+            ids = np.asarray(self._ids(column, values), dtype=np.int64)
+            starts = np.searchsorted(sorted_values, ids, side="left")
+            ends = np.searchsorted(sorted_values, ids, side="right")
+            matches = np.sort(np.concatenate([order[start:end] for start, end in zip(starts, ends)] or [[]]))
+            result = matches if result is None else np.intersect1d(result, matches, assume_unique=True)
+        return np.arange(len(self)) if result is None else result.astype(np.int64)
+
+    def query(self, **filters):
+        """
+        Returns the errors matching every filter as a table, see `rows` for the filters.
+
+        Returns:
+            pd.DataFrame: One row per error, with names instead of ids and 1-based sentences.
+        """
+        return self.frame(self.rows(**filters))
+
+    def frame(self, rows):
+        """
+        Decodes the given rows into a table.
+        """
+        symbols = np.array(self.vocabularies["symbols"], dtype=object)
+        parsers = np.array(self.vocabularies["parsers"], dtype=object)
+        columns = {key: values[rows] for key, values in self.columns.items()}
+        distance = pd.array(columns["distance"], dtype="Int64")
+        distance[columns["distance"] == NO_DISTANCE] = pd.NA
+        return pd.DataFrame({
+            "Parser": parsers[columns["parser"]] if len(parsers) else [],
+            "Error": np.array(ERROR_TYPES, dtype=object)[columns["error"]],
+            "Sentence": columns["sentence"] + 1,
+            "Token": columns["token"],
+            "Gold": symbols[columns["gold"]],
+            "Predicted": symbols[columns["pred"]],
+            "Distance": distance,
+            "POS": symbols[columns["pos"]],
+            "Head POS": symbols[columns["head_pos"]],
+            "Gold Head": columns["gold_head"],
+            "Predicted Head": columns["pred_head"],
+        })
+
+    def disagreements(self, parser_a, parser_b, **filters):
+        """
+        Errors of one parser at tokens where a second parser predicted something else.
+
+        A token where `parser_b` made no error of the same kind counts as a
+        disagreement, since `parser_b` then predicted the gold analysis. Head and
+        label errors are compared as (head, label) predictions, tag errors per tag type.
+
+        Args:
+            parser_a (str): Parser whose errors are listed.
+            parser_b (str): Parser compared against.
+            **filters: Filters on parser_a's errors, see `rows`.
+
+        Returns:
+            pd.DataFrame: parser_a's errors, plus parser_b's 'Other Predicted' label or tag
+                and 'Other Predicted Head' (the gold values where parser_b was right).
+        """
+        rows_a = self.rows(**{**filters, "parser": parser_a})
+        rows_b = self.rows(parser=parser_b)
+
+        # Dependency errors share one key per token, tag errors one per tag type
+        family = np.array([0, 0, 1, 2])
+
+        def keys(rows):
+            sentence = self.columns["sentence"][rows].astype(np.int64)
+            token = self.columns["token"][rows].astype(np.int64)
+            return (sentence * (int(self.columns["token"].max(initial=0)) + 1) + token) * 3 \
+                + family[self.columns["error"][rows]]
+
+        keys_a, keys_b = keys(rows_a), keys(rows_b)
+        order = np.argsort(keys_b, kind="stable")
+        found = np.minimum(np.searchsorted(keys_b[order], keys_a), max(len(order) - 1, 0))
+        has_b = keys_b[order][found] == keys_a if len(order) else np.zeros(len(keys_a), dtype=bool)
+        match_b = rows_b[order][found] if len(order) else np.zeros(len(keys_a), dtype=np.int64)
+
+        # Where parser_b made no error it predicted the gold values
+        other_pred = np.where(has_b, self.columns["pred"][match_b], self.columns["gold"][rows_a])
+        other_head = np.where(has_b, self.columns["pred_head"][match_b], self.columns["gold_head"][rows_a])
+        differs = (other_pred != self.columns["pred"][rows_a]) | (other_head != self.columns["pred_head"][rows_a])
+
+        df = self.frame(rows_a[differs])
+        symbols = np.array(self.vocabularies["symbols"], dtype=object)
+        df["Other Predicted"] = symbols[other_pred[differs]]
+        df["Other Predicted Head"] = other_head[differs]
+        return df
+
+    def counts(self, by=("parser", "error"), **filters):
+        """
+        Counts the matching errors grouped by some columns.
+
+        Args:
+            by (tuple): Record columns to group by.
+            **filters: See `rows`.
+
+        Returns:
+            pd.DataFrame: Group columns and a 'Count' column, largest first.
+        """
+        df = self.query(**filters)
+        names = {"parser": "Parser", "error": "Error", "gold": "Gold", "pred": "Predicted", "distance": "Distance",
+                 "pos": "POS", "head_pos": "Head POS"}
+        groups = [names.get(column, column) for column in by]
+        return (df.groupby(groups, dropna=False).size().reset_index(name="Count")
+                .sort_values("Count", ascending=False, kind="stable").reset_index(drop=True))
+
+    def save(self, path):
+        """
+        Saves the index as one compressed .npz file; postings are rebuilt on load.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}.npz"
+        vocabularies = {**self.vocabularies, "errors": list(ERROR_TYPES)}
+        np.savez_compressed(tmp_path, vocabularies=np.array(json.dumps(vocabularies)), **self.columns)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads an index saved with `save`; an index saved with other error types must be rebuilt.
+        """
+        with np.load(path) as data:
+            vocabularies = json.loads(str(data["vocabularies"]))
+            columns = {key: data[key] for key in RECORD_COLUMNS}
+        if vocabularies.pop("errors", None) != list(ERROR_TYPES):
+            raise ValueError(f"{path} was built with other error types than {ERROR_TYPES}; rebuild it")
+        return cls(columns, vocabularies)
+
+
+def _filters(args):
+    # Query filters given on the command line
+    filters = {}
+    for column in INDEXED_COLUMNS:
+        values = getattr(args, column)
+        if values:
+            filters[column] = [int(v) for v in values] if column == "distance" else values
+    return filters
+
+
+if __name__ == "__main__":
+    from evaluation.evaluate import DEFAULT_PARSERS, evaluate
+
+    arg_parser = argparse.ArgumentParser(description="Build and query an index of parser errors.")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Evaluate the parsers and save their error index")
+    build.add_argument("--gold", default="data/gold_standard.txt")
+    build.add_argument("--output", default="results/error_index.npz")
+    build.add_argument("--workers", type=int, default=None)
+
+    for name in ("query", "count", "disagree"):
+        command = commands.add_parser(name)
+        command.add_argument("--index", default="results/error_index.npz")
+        for column in INDEXED_COLUMNS:
+            command.add_argument(f"--{column.replace('_', '-')}", dest=column, nargs="+")
+        if name == "count":
+            command.add_argument("--by", nargs="+", default=["parser", "error"])
+        if name == "disagree":
+            command.add_argument("--other", required=True, help="Parser to compare the --parser errors with")
+        command.add_argument("--limit", type=int, default=50, help="Rows printed to the console")
+    args = arg_parser.parse_args()
+
+    if args.command == "build":
+        results = evaluate(args.gold, DEFAULT_PARSERS, families=("errors",), workers=args.workers)
+        index = ErrorIndex.from_records({name: result["errors"]["records"] for name, result in results.items()},
+                                        next(iter(results.values()))["errors"]["symbols"])
+        index.save(args.output)
+        print(f"Indexed {len(index)} errors of {len(results)} parsers in {args.output}")
+    else:
+        index = ErrorIndex.load(args.index)
+        filters = _filters(args)
+        if args.command == "count":
+            table = index.counts(args.by, **filters)
+        elif args.command == "disagree":
+            parsers = filters.pop("parser", None)
+            if not parsers or len(parsers) != 1:
+                arg_parser.error("disagree needs exactly one --parser")
+            table = index.disagreements(parsers[0], args.other, **filters)
+        else:
+            table = index.query(**filters)
+        print(f"{len(table)} rows")
+        print(table.head(args.limit).to_string(index=False))
@@ -0,0 +1,303 @@
+import argparse
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from evaluation.alignment import score_aligned, summarize_aligned_counts
+from evaluation.breakdowns import Breakdowns
+from evaluation.constituency_eval import EVALB_DEFAULTS, constituency_counts, evalb_summary, load_trees
+from evaluation.dependency_eval import evaluate_dependency_corpus, summarize_dependency_counts
+from evaluation.error_index import ErrorIndex, error_records, merge_error_shards, summarize_errors, symbol_vocabulary
+from evaluation.pos_upos_eval import TAG_COLUMNS, evaluate_tagging_corpus, summarize_confusion
+from evaluation.results_writer import write_table
+from scripts.corpus_store import load_corpus
+from scripts.instrumentation import PROFILE_ENV, TRACE_ENV, tracer
+
+
+# Metric families a job can compute
+METRIC_FAMILIES = ("dependency", "pos_upos", "constituency", "aligned")
+
+# Families that collect records for analysis instead of scores
+ANALYSIS_FAMILIES = ("errors",)
+
+# Parser outputs evaluated by default
+DEFAULT_PARSERS = {
+    "Berkeley": "data/berkeley_neural_output.txt",
+    "CoreNLP": "data/corenlp_output.txt",
+    "Allen": "data/allen_output.txt",
+}
+
+# Per-process state set up by _init_worker
+_context = {}
+_corpora = {}
+
+
+def _init_worker(context):
+    # Runs once in every worker process
+    _context.clear()
+    _context.update(context)
+    _corpora.clear()
+
+
+def _corpus(path):
+    # Each worker memory-maps a corpus once and reuses it for all of its jobs
+    if path not in _corpora:
+        _corpora[path] = load_corpus(path, cache_dir=_context["cache_dir"])
+    return _corpora[path]
+
+
+def _run_job(job):
+    """
+    Scores one (parser, metric family, sentence range) job.
+
+    Args:
+        job (tuple): Parser name, parser path, metric family, first and end sentence.
+
+    Returns:
+        tuple: The job key and its per-sentence count statistics.
+    """
+    parser_name, parser_path, family, start, end = job
+    with tracer.stage("job", parser=parser_name, family=family, start=start) as stage:
+        result = _score_job(parser_path, family, start, end)
+        stage.count(sentences=end - start)
+    return (parser_name, family, start), result
+
+
+def _score_job(parser_path, family, start, end):
+    # Scores one metric family on the sentence range [start, end)
+    gold = _corpus(_context["gold_path"]).slice(start, end)
+    parser = _corpus(parser_path).slice(start, end)
+
+    # Fresh tables per job, filled while scoring and added up in _merge
+    breakdowns = _context["breakdowns"].empty() if _context["breakdowns"] is not None else None
+
+    if family == "dependency":
+        counts, _ = evaluate_dependency_corpus(gold, parser, breakdowns=breakdowns)
+        result = counts
+    elif family == "aligned":
+        result = score_aligned(gold, parser)
+    elif family == "errors":
+        result = {"records": error_records(gold, parser, dict(_context["symbol_ids"])), "sentences": end - start}
+    elif family == "pos_upos":
+        result = {}
+        for tag_type in TAG_COLUMNS:
+            scores = evaluate_tagging_corpus(gold, parser, tag_type, dict(_context["tag_ids"]), breakdowns)
+            result[tag_type] = {key: scores[key] for key in ("tokens", "correct", "precision", "recall", "f1", "confusion")}
+    else:
+        gold_trees = _context["gold_trees"]
+        gold_trees = gold_trees[start:end] if gold_trees is not None else [gold.tree(i) for i in range(len(gold))]
+        test_trees = [parser.tree(i) for i in range(len(parser))]
+        result = constituency_counts(gold_trees, test_trees, _context["evalb_params"])
+    if breakdowns is not None and family in ("dependency", "pos_upos"):
+        result = {**result, "breakdowns": breakdowns.tables}
+    return result
+
+
+def _merge(family, shards, tag_names, symbols=None, breakdowns=None, cutoff_len=EVALB_DEFAULTS["CUTOFF_LEN"]):
+    """
+    Merges shard results, in sentence order, from their count statistics.
+
+    Args:
+        family (str): Metric family of the shards.
+        shards (list): Shard results sorted by first sentence.
+        tag_names (list): Shared tag vocabulary of the confusion matrices.
+        symbols (list): Shared label and tag vocabulary of the error records.
+        breakdowns (Breakdowns): Empty tables the shard breakdowns are added to.
+        cutoff_len (int): EVALB's CUTOFF_LEN, for the second constituency summary.
+
+    Returns:
+        dict: Merged per-sentence statistics and the corpus summary.
+    """
+    if breakdowns is not None and shards and "breakdowns" in shards[0]:
+        # Shard tables add up; the rest of the shard is merged as without breakdowns
+        merged_breakdowns = breakdowns.empty()
+        for shard in shards:
+            merged_breakdowns += Breakdowns(breakdowns.labels, breakdowns.tags, tables=shard["breakdowns"])
+        merged = _merge(family, [{key: value for key, value in shard.items() if key != "breakdowns"}
+                                 for shard in shards], tag_names, symbols, cutoff_len=cutoff_len)
+        merged["breakdowns"] = merged_breakdowns
+        return merged
+
+    if family == "errors":
+        records = merge_error_shards(shards)
+        return {"records": records, "symbols": symbols, "summary": summarize_errors(records)}
+
+    if family in ("dependency", "aligned"):
+        counts = {key: np.concatenate([shard[key] for shard in shards]) for key in shards[0]}
+        summarize = summarize_dependency_counts if family == "dependency" else summarize_aligned_counts
+        return {"counts": counts, "summary": summarize(counts)}
+
+    if family == "constituency":
+        df = pd.concat(shards, ignore_index=True)
+        df["ID"] = range(1, len(df) + 1)
+        return {"counts": df, "summary": evalb_summary(df, cutoff_len)}
+
+    merged = {"summary": {}}
+    for tag_type in TAG_COLUMNS:
+        parts = [shard[tag_type] for shard in shards]
+        scores = {key: np.concatenate([part[key] for part in parts])
+                  for key in ("tokens", "correct", "precision", "recall", "f1")}
+        scores["confusion"] = sum(part["confusion"] for part in parts)
+        merged[tag_type] = scores
+
+        # Sentence averages as in summarize_results_to_table, plus corpus-level scores
+        prefix = tag_type.upper()
+        tokens = scores["tokens"]
+        accuracy = np.where(tokens > 0, scores["correct"] / np.maximum(tokens, 1), 0.0)
+        merged["summary"].update({
+            f"{prefix} Accuracy": accuracy.mean(),
+            f"{prefix} Precision": scores["precision"].mean(),
+            f"{prefix} Recall": scores["recall"].mean(),
+            f"{prefix} F1": scores["f1"].mean(),
+        })
+        merged[f"{tag_type}_corpus"] = summarize_confusion(scores["confusion"], tag_names)
+    return merged
+
+
+def evaluate(gold_path, parser_paths, families=METRIC_FAMILIES, gold_trees_path=None,
+             evalb_params=None, workers=None, shard_size=None, cache_dir=None, breakdowns=False):
+    """
+    Scores every parser and metric family against a gold standard loaded once.
+
+    Every (parser, metric family, sentence range) job runs in a process pool.
+    Workers memory-map the columnar caches instead of re-reading the text files,
+    and shard results are merged from their counts, never by averaging scores.
+
+    Args:
+        gold_path (str): Gold standard file in the block format.
+        parser_paths (dict): Parser name to output file.
+        families (iterable): Metric families to compute, see METRIC_FAMILIES and ANALYSIS_FAMILIES.
+        gold_trees_path (str): One-tree-per-line gold file for constituency scoring
+            (default: the trees of the gold standard blocks).
+        evalb_params (dict): EVALB parameters (default: EVALB_DEFAULTS).
+        workers (int): Number of processes (default: all cores, 1 runs in-process).
+        shard_size (int): Sentences per job (default: about four jobs per worker).
+        cache_dir (str): Corpus cache directory, see `load_corpus`.
+        breakdowns (bool): Also fill grouped count tables while scoring the dependency
+            and POS/UPOS families, see `evaluation.breakdowns`.
+
+    Returns:
+        dict: Parser name to metric family to merged statistics and 'summary' (and
+              'breakdowns', a Breakdowns object, when requested).
+    """
+    workers = workers or os.cpu_count() or 1
+
+    # Parse once in the parent so that workers only memory-map the caches
+    gold = load_corpus(gold_path, cache_dir=cache_dir)
+    parsers = {name: load_corpus(path, cache_dir=cache_dir) for name, path in parser_paths.items()}
+
+    # One shared tag vocabulary keeps the shard confusion matrices addable
+    tag_ids = {}
+    for corpus in [gold, *parsers.values()]:
+        for tag in corpus.vocabularies["tags"]:
+            tag_ids.setdefault(tag, len(tag_ids))
+
+    context = {
+        "gold_path": gold_path,
+        "symbol_ids": symbol_vocabulary([gold, *parsers.values()]),
+        "gold_trees": load_trees(gold_trees_path) if gold_trees_path else None,
+        "evalb_params": evalb_params or EVALB_DEFAULTS,
+        "tag_ids": tag_ids,
+        "cache_dir": cache_dir,
+        # Word frequencies come from the whole gold standard, not from each shard
+        "breakdowns": Breakdowns.for_corpora(gold, parsers.values()) if breakdowns else None,
+    }
+
+    n_sentences = len(gold)
+    shard_size = shard_size or max(1, math.ceil(n_sentences / (workers * 4)))
+    jobs = [
+        (name, parser_paths[name], family, start, min(start + shard_size, n_sentences))
+        for name in parsers
+        for family in families
+        for start in range(0, n_sentences, shard_size)
+    ]
+
+    with tracer.stage("jobs", workers=workers, jobs=len(jobs)) as stage:
+        if workers == 1:
+            _init_worker(context)
+            outputs = [_run_job(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(context,)) as pool:
+                outputs = list(pool.map(_run_job, jobs))
+        stage.count(sentences=n_sentences * len(parsers))
+
+    # Group shard results per (parser, family) in sentence order
+    grouped = {}
+    for (name, family, start), result in sorted(outputs, key=lambda output: output[0]):
+        grouped.setdefault((name, family), []).append(result)
+
+    results = {name: {} for name in parsers}
+    with tracer.stage("merge"):
+        for (name, family), shards in grouped.items():
+            results[name][family] = _merge(family, shards, list(tag_ids), list(context["symbol_ids"]),
+                                           context["breakdowns"], context["evalb_params"]["CUTOFF_LEN"])
+    return results
+
+
+def _to_json(value):
+    # Fallback serialiser for NumPy scalars and DataFrames
+    if isinstance(value, pd.DataFrame):
+        return value.to_dict("records")
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Score all parsers and metric families in parallel.")
+    arg_parser.add_argument("--gold", default="data/gold_standard.txt")
+    arg_parser.add_argument("--gold-trees", default="evaluation/evalb_pre/gold_standard_improved_tree.txt")
+    arg_parser.add_argument("--metrics", nargs="+", choices=METRIC_FAMILIES, default=list(METRIC_FAMILIES))
+    arg_parser.add_argument("--workers", type=int, default=None)
+    arg_parser.add_argument("--shard-size", type=int, default=None)
+    arg_parser.add_argument("--output", default="results/evaluation_summary.json")
+    arg_parser.add_argument("--error-index", default=None, help="Also collect every error into this index file")
+    arg_parser.add_argument("--breakdowns", default=None,
+                            help="Also save grouped dependency and tagging breakdowns here (path without extension)")
+    arg_parser.add_argument("--trace", default=None, help="Append stage timings to this JSON-lines file")
+    arg_parser.add_argument("--profile", nargs="*", default=[], help="Stage names to run under cProfile ('*' for all)")
+    args = arg_parser.parse_args()
+
+    if args.trace:
+        # Exported so that pool workers trace into the same file
+        os.environ[TRACE_ENV] = args.trace
+        os.environ[PROFILE_ENV] = ",".join(args.profile)
+        tracer.enable(args.trace, args.profile)
+
+    families = args.metrics + (["errors"] if args.error_index else [])
+    results = evaluate(args.gold, DEFAULT_PARSERS, families=families, gold_trees_path=args.gold_trees,
+                       workers=args.workers, shard_size=args.shard_size, breakdowns=bool(args.breakdowns))
+
+    if args.error_index:
+        errors = {name: parser_results["errors"] for name, parser_results in results.items()}
+        index = ErrorIndex.from_records({name: merged["records"] for name, merged in errors.items()},
+                                        next(iter(errors.values()))["symbols"])
+        index.save(args.error_index)
+        print(f"Error index with {len(index)} errors saved to: {args.error_index}")
+
+    if args.breakdowns:
+        # One table per parser and family; each family fills its own tables
+        tables = pd.concat([merged["breakdowns"].table().assign(Parser=name)
+                            for name, parser_results in results.items()
+                            for merged in parser_results.values() if "breakdowns" in merged], ignore_index=True)
+        path = write_table(args.breakdowns, tables[["Parser", *(column for column in tables if column != "Parser")]])
+        print(f"Breakdowns saved to: {path}")
+
+    summaries = {}
+    for name, families in results.items():
+        print(f"\n{name} Parser Summary:")
+        summaries[name] = {}
+        for family, merged in families.items():
+            summaries[name][family] = merged["summary"]
+            print(f"  {family}:")
+            for key, value in merged["summary"].items():
+                print(f"    {key}: {value}")
+
+    # Save the summaries of all parsers and metric families
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(summaries, f, indent=2, default=_to_json)
+    print(f"\nSummary saved to: {args.output}")
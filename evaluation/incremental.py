@@ -0,0 +1,416 @@
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+from evaluation.dependency_eval import DEPENDENCY_COUNT_KEYS, evaluate_dependency_corpus
+from evaluation.pos_upos_eval import TAG_COLUMNS, evaluate_tagging_corpus
+from scripts.corpus_store import build_corpus
+from scripts.data_preprocess import build_sentence, iter_raw_blocks
+from scripts.instrumentation import tracer
+
+
+# Bump when the stored statistics change; older index files are rebuilt from scratch
+INDEX_VERSION = 2
+
+# Metric families whose per-sentence statistics are kept in the index
+INCREMENTAL_FAMILIES = ("dependency", "pos_upos")
+
+# Per-sentence integer counts stored for each family; the index keeps running totals of these only
+TAG_COUNTS = ("tokens", "correct")
+COUNT_COLUMNS = {
+    "dependency": DEPENDENCY_COUNT_KEYS,
+    "pos_upos": tuple(f"{tag_type}_{key}" for tag_type in TAG_COLUMNS for key in TAG_COUNTS),
+}
+
+# Per-sentence tag scores that are not ratios of the stored counts (they are weighted
+# over the sentence's tags), stored as floats and only ever averaged over the columns
+TAG_SCORES = ("precision", "recall", "f1")
+SCORE_COLUMNS = {
+    "dependency": (),
+    "pos_upos": tuple(f"{tag_type}_{key}" for tag_type in TAG_COLUMNS for key in TAG_SCORES),
+}
+
+TAG_STATISTICS = TAG_COUNTS + TAG_SCORES
+FAMILY_COLUMNS = {family: COUNT_COLUMNS[family] + SCORE_COLUMNS[family] for family in COUNT_COLUMNS}
+
+
+def block_hash(block):
+    """
+    Hashes the content of a raw sentence block.
+
+    Args:
+        block (dict): Raw block from `iter_raw_blocks`.
+
+    Returns:
+        str: Hex digest of the header, tag, tree and dependency lines.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for line in [f"{block['number']} {block['text']}", *block["tags"], *block["tree"], *block["dependencies"]]:
+        digest.update(line.rstrip().encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def _block_number(block):
+    # "12." -> 12
+    return int(block["number"].rstrip("."))
+
+
+def scan_blocks(file_path, known_hashes, keep=()):
+    """
+    Hashes every block of a file and keeps the raw blocks that need rescoring.
+
+    Args:
+        file_path (str): Parser output file.
+        known_hashes (dict): Sentence number to the block hash stored in the index.
+        keep (iterable): Sentence numbers to keep even if their block is unchanged.
+
+    Returns:
+        dict: Sentence number to block hash, for every block of the file.
+        dict: Sentence number to raw block, for changed, new and kept blocks.
+    """
+    keep = set(keep)
+    hashes, blocks = {}, {}
+    for block in iter_raw_blocks(file_path):
+        number = _block_number(block)
+        hashes[number] = block_hash(block)
+        if number in keep or known_hashes.get(number) != hashes[number]:
+            blocks[number] = block
+    return hashes, blocks
+
+
+def sentence_statistics(gold_sentences, pred_sentences, families=INCREMENTAL_FAMILIES):
+    """
+    Scores a set of sentence pairs and returns their per-sentence statistics.
+
+    Args:
+        gold_sentences (list): Gold sentence records.
+        pred_sentences (list): Parser sentence records, paired by position.
+        families (iterable): Families to score, see INCREMENTAL_FAMILIES.
+
+    Returns:
+        dict: Column name (as in FAMILY_COLUMNS) to per-sentence array.
+    """
+    gold = build_corpus(gold_sentences)
+    pred = build_corpus(pred_sentences)
+
+    columns = {}
+    if "dependency" in families:
+        counts, _ = evaluate_dependency_corpus(gold, pred)
+        columns.update({key: np.asarray(counts[key], dtype=np.int64) for key in DEPENDENCY_COUNT_KEYS})
+    if "pos_upos" in families:
+        for tag_type in TAG_COLUMNS:
+            scores = evaluate_tagging_corpus(gold, pred, tag_type)
+            columns.update({f"{tag_type}_{key}": np.asarray(scores[key], dtype=np.int64) for key in TAG_COUNTS})
+            columns.update({f"{tag_type}_{key}": np.asarray(scores[key], dtype=np.float64) for key in TAG_SCORES})
+    return columns
+
+
+def count_totals(family, columns):
+    """
+    Sums a family's per-sentence counts; totals of disjoint sentence sets add and subtract exactly.
+
+    Args:
+        family (str): 'dependency' or 'pos_upos'.
+        columns (dict): Per-sentence statistics, see FAMILY_COLUMNS.
+
+    Returns:
+        dict: 'sentences' and the sum of every column of COUNT_COLUMNS, as ints.
+    """
+    keys = COUNT_COLUMNS[family]
+    return {"sentences": len(columns[keys[0]]), **{key: int(np.sum(columns[key])) for key in keys}}
+
+
+def sentence_score_sums(family, columns):
+    """
+    Sums the per-sentence scores a family's summary averages over sentences.
+
+    Args:
+        family (str): 'dependency' or 'pos_upos'.
+        columns (dict): Per-sentence statistics, see FAMILY_COLUMNS.
+
+    Returns:
+        dict: Sums of the sentence UAS and LAS ratios, or of every tag type's sentence
+              accuracy, precision, recall and F1.
+    """
+    if family == "dependency":
+        denominator = np.maximum(columns["tokens"], 1)
+        return {"uas_ratio": float(np.sum(columns["uas"] / denominator)),
+                "las_ratio": float(np.sum(columns["las"] / denominator))}
+
+    sums = {}
+    for tag_type in TAG_COLUMNS:
+        tokens = columns[f"{tag_type}_tokens"]
+        accuracy = np.where(tokens > 0, columns[f"{tag_type}_correct"] / np.maximum(tokens, 1), 0.0)
+        sums[f"{tag_type}_accuracy"] = float(np.sum(accuracy))
+        sums.update({f"{tag_type}_{key}": float(np.sum(columns[f"{tag_type}_{key}"])) for key in TAG_SCORES})
+    return sums
+
+
+def additive_totals(family, columns):
+    """
+    Counts and sentence score sums of a set of sentences, for totals that are only ever added.
+
+    Args:
+        family (str): 'dependency' or 'pos_upos'.
+        columns (dict): Per-sentence statistics, see FAMILY_COLUMNS.
+
+    Returns:
+        dict: Totals for `summarize_totals`; those of disjoint sentence sets add up.
+    """
+    return {**count_totals(family, columns), **sentence_score_sums(family, columns)}
+
+
+def summarize_totals(family, totals):
+    """
+    Derives a family's corpus summary from its totals.
+
+    Args:
+        family (str): 'dependency' or 'pos_upos'.
+        totals (dict): Totals from `additive_totals`.
+
+    Returns:
+        dict: The summary of `summarize_dependency_counts`, or the sentence-average
+              POS/UPOS scores of `evaluate` plus corpus accuracy.
+    """
+    n = totals["sentences"]
+    if family == "dependency":
+        return {
+            "Average UAS": totals["uas_ratio"] / n if n else 0.0,
+            "Average LAS": totals["las_ratio"] / n if n else 0.0,
+            "Micro UAS": totals["uas"] / totals["tokens"] if totals["tokens"] > 0 else 0.0,
+            "Micro LAS": totals["las"] / totals["tokens"] if totals["tokens"] > 0 else 0.0,
+            "Root Accuracy": totals["root"] / n if n else 0.0,
+            "Complete Match Rate": totals["complete"] / n if n else 0.0,
+        }
+
+    summary = {}
+    for tag_type in TAG_COLUMNS:
+        prefix = tag_type.upper()
+        summary.update({
+            f"{prefix} Accuracy": totals[f"{tag_type}_accuracy"] / n if n else 0.0,
+            f"{prefix} Precision": totals[f"{tag_type}_precision"] / n if n else 0.0,
+            f"{prefix} Recall": totals[f"{tag_type}_recall"] / n if n else 0.0,
+            f"{prefix} F1": totals[f"{tag_type}_f1"] / n if n else 0.0,
+            f"{prefix} Corpus Accuracy": (totals[f"{tag_type}_correct"] / totals[f"{tag_type}_tokens"]
+                                          if totals[f"{tag_type}_tokens"] > 0 else 0.0),
+        })
+    return summary
+
+
+def summarize_index(index, families):
+    """
+    Corpus summaries of an index: micro scores from its integer totals, and the sentence
+    averages recomputed from its per-sentence columns rather than kept as running sums.
+
+    Returns:
+        dict: Family to the summary of `summarize_totals`.
+    """
+    return {
+        family: summarize_totals(family, {**index["totals"][family],
+                                          **sentence_score_sums(family, index["columns"][family])})
+        for family in families
+    }
+
+
+def _empty_columns(family):
+    # Zero-length per-sentence columns with the stored dtypes
+    return {**{key: np.zeros(0, dtype=np.int64) for key in COUNT_COLUMNS[family]},
+            **{key: np.zeros(0, dtype=np.float64) for key in SCORE_COLUMNS[family]}}
+
+
+def default_index_path(parser_path):
+    # Sidecar next to the parser output, like the corpus cache
+    directory = os.path.join(os.path.dirname(os.path.abspath(parser_path)), ".eval_index")
+    return os.path.join(directory, os.path.basename(parser_path) + ".npz")
+
+
+def empty_index(families):
+    """
+    Returns an index without sentences, in the layout of `load_index`.
+    """
+    return {
+        "numbers": np.zeros(0, dtype=np.int64),
+        "gold_hashes": np.zeros(0, dtype="U32"),
+        "pred_hashes": np.zeros(0, dtype="U32"),
+        "columns": {family: _empty_columns(family) for family in families},
+        "totals": {family: count_totals(family, _empty_columns(family)) for family in families},
+    }
+
+
+def load_index(index_path, families):
+    """
+    Loads a sidecar index, or returns an empty one if it is missing or outdated.
+
+    Args:
+        index_path (str): Index file.
+        families (tuple): Families the caller needs.
+
+    Returns:
+        dict: 'numbers', 'gold_hashes', 'pred_hashes', per-family 'columns' and integer
+              count 'totals'.
+    """
+    empty = empty_index(families)
+    if not os.path.isfile(index_path):
+        return empty
+
+    with np.load(index_path) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta["version"] != INDEX_VERSION or meta["families"] != list(families):
+            return empty
+        return {
+            "numbers": data["numbers"],
+            "gold_hashes": data["gold_hashes"],
+            "pred_hashes": data["pred_hashes"],
+            "columns": {family: {key: data[f"{family}.{key}"] for key in FAMILY_COLUMNS[family]} for family in families},
+            "totals": meta["totals"],
+        }
+
+
+def save_index(index_path, index, families):
+    """
+    Writes a sidecar index atomically.
+    """
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    arrays = {
+        "numbers": index["numbers"],
+        "gold_hashes": index["gold_hashes"],
+        "pred_hashes": index["pred_hashes"],
+        "meta": np.array(json.dumps({"version": INDEX_VERSION, "families": list(families), "totals": index["totals"]})),
+    }
+    for family in families:
+        for key, values in index["columns"][family].items():
+            arrays[f"{family}.{key}"] = values
+
+    tmp_path = index_path + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, index_path)
+
+
+def update_index(index, gold_hashes, pred_hashes, rescored, statistics, families):
+    """
+    Puts the statistics of rescored sentences into an index and updates its running totals.
+
+    The old counts of rescored sentences, and of sentences no longer in both
+    files, are subtracted from the integer totals and the new ones added, so the
+    work is proportional to the size of the change and the totals stay exact.
+
+    Args:
+        index (dict): Index from `load_index`, updated in place.
+        gold_hashes (dict): Sentence number to block hash, for every gold block.
+        pred_hashes (dict): Sentence number to block hash, for every parser block.
+        rescored (list): Numbers of the sentences that were scored again, in order.
+        statistics (dict): Their per-sentence statistics from `sentence_statistics` (None if none).
+        families (tuple): Families kept in the index.
+
+    Returns:
+        dict: 'sentences', 'rescored', 'added' and 'removed' counts.
+    """
+    numbers = index["numbers"]
+    current = np.array(sorted(set(gold_hashes) & set(pred_hashes)), dtype=np.int64)
+    rescored = np.array(rescored, dtype=np.int64)
+    new_columns = {family: _empty_columns(family) for family in families}
+    if len(rescored):
+        new_columns = {family: {key: statistics[key] for key in FAMILY_COLUMNS[family]} for family in families}
+
+    # Rows leaving the index: rescored ones and sentences no longer in both files
+    old_rows = np.flatnonzero(np.isin(numbers, rescored) | ~np.isin(numbers, current))
+    kept = np.setdiff1d(np.arange(len(numbers)), old_rows)
+
+    for family in families:
+        old = {key: values[old_rows] for key, values in index["columns"][family].items()}
+        removed_totals = count_totals(family, old)
+        added_totals = count_totals(family, new_columns[family])
+        index["totals"][family] = {
+            key: value - removed_totals[key] + added_totals[key]
+            for key, value in index["totals"][family].items()
+        }
+
+        # Kept rows plus the rescored rows, in sentence number order
+        merged = {
+            key: np.concatenate([values[kept], new_columns[family][key]])
+            for key, values in index["columns"][family].items()
+        }
+        index["columns"][family] = merged
+
+    merged_numbers = np.concatenate([numbers[kept], rescored])
+    order = np.argsort(merged_numbers, kind="stable")
+    index["numbers"] = merged_numbers[order]
+    index["gold_hashes"] = np.array([gold_hashes[number] for number in index["numbers"].tolist()], dtype="U32")
+    index["pred_hashes"] = np.array([pred_hashes[number] for number in index["numbers"].tolist()], dtype="U32")
+    for family in families:
+        index["columns"][family] = {key: values[order] for key, values in index["columns"][family].items()}
+
+    return {
+        "sentences": len(current),
+        "rescored": len(rescored),
+        "added": int(np.sum(~np.isin(rescored, numbers))),
+        "removed": int(np.sum(~np.isin(numbers, current))),
+    }
+
+
+def evaluate_incremental(gold_path, parser_path, index_path=None, families=INCREMENTAL_FAMILIES):
+    """
+    Re-evaluates a parser, rescoring only the blocks that changed since the last run.
+
+    Blocks are keyed by sentence number and content hash, on both the gold and the
+    parser side. Changed, new and removed sentences update the running totals by
+    subtracting their old statistics and adding the new ones, so the scoring work
+    is proportional to the size of the change; unchanged blocks are only hashed.
+
+    Args:
+        gold_path (str): Gold standard file.
+        parser_path (str): Parser output file.
+        index_path (str): Sidecar index (default: `.eval_index/<file>.npz` next to the parser output).
+        families (tuple): Families to keep up to date, see INCREMENTAL_FAMILIES.
+
+    Returns:
+        dict: Family to corpus summary.
+        dict: 'sentences', 'rescored', 'added' and 'removed' counts of this run.
+    """
+    families = tuple(families)
+    index_path = index_path or default_index_path(parser_path)
+    index = load_index(index_path, families)
+    numbers = index["numbers"]
+
+    with tracer.stage("incremental", parser=parser_path) as stage:
+        # Find changed blocks on both sides; a changed gold block rescores its parser block too
+        pred_hashes, pred_blocks = scan_blocks(parser_path, dict(zip(numbers.tolist(), index["pred_hashes"].tolist())))
+        gold_hashes, gold_blocks = scan_blocks(gold_path, dict(zip(numbers.tolist(), index["gold_hashes"].tolist())),
+                                               keep=pred_blocks)
+        missing = [number for number in gold_blocks if number in pred_hashes and number not in pred_blocks]
+        if missing:
+            _, extra = scan_blocks(parser_path, pred_hashes, keep=missing)
+            pred_blocks.update(extra)
+
+        # Only sentences present on both sides are scored
+        current = sorted(set(gold_hashes) & set(pred_hashes))
+        rescored = [number for number in current if number in gold_blocks or number in pred_blocks]
+        statistics = sentence_statistics([build_sentence(gold_blocks[number]) for number in rescored],
+                                         [build_sentence(pred_blocks[number]) for number in rescored],
+                                         families) if rescored else None
+        run = update_index(index, gold_hashes, pred_hashes, rescored, statistics, families)
+        stage.count(sentences=len(rescored))
+
+    save_index(index_path, index, families)
+    return summarize_index(index, families), run
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Re-evaluate parsers, rescoring only changed sentences.")
+    arg_parser.add_argument("--gold", default="data/gold_standard.txt")
+    arg_parser.add_argument("parsers", nargs="*", default=["data/berkeley_neural_output.txt",
+                                                         "data/corenlp_output.txt", "data/allen_output.txt"])
+    arg_parser.add_argument("--metrics", nargs="+", choices=INCREMENTAL_FAMILIES, default=list(INCREMENTAL_FAMILIES))
+    args = arg_parser.parse_args()
+
+    for path in args.parsers:
+        summaries, run = evaluate_incremental(args.gold, path, families=args.metrics)
+        print(f"\n{path}: {run['rescored']} of {run['sentences']} sentences rescored "
+              f"({run['added']} added, {run['removed']} removed)")
+        for family, summary in summaries.items():
+            print(f"  {family}:")
+            for key, value in summary.items():
+                print(f"    {key}: {value}")
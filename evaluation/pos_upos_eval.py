@@ -1,9 +1,228 @@
-from sklearn.metrics import precision_recall_fscore_support
-from sklearn.metrics import accuracy_score
+import argparse
+import os
+
+import numpy as np
 import pandas as pd
 
 # Evaluate POS and UPOS with accuracy, precision, recall, and F1-score
-from scripts.data_preprocess import load_sentences
+from evaluation.breakdowns import Breakdowns
+from evaluation.results_writer import RESULT_FORMATS, ResultsWriter, default_format, write_table
+from scripts.corpus_store import as_corpus, load_corpus
+from scripts.instrumentation import tracer
+
+
+# Corpus column read for each evaluated tag type; as in the original per-sentence
+# code, 'upos' compares the fourth token field and 'pos' the third
+TAG_COLUMNS = {'upos': 'tag_pos', 'pos': 'tag_upos'}
+
+
+def tag_arrays(corpus, tag_type, tag_ids, n_sentences=None):
+    """
+    Extracts one tag column of a corpus with tags in a shared id space.
+
+    Args:
+        corpus (ColumnarCorpus): The corpus to extract from.
+        tag_type (str): 'upos' or 'pos'.
+        tag_ids (dict): Shared tag to id mapping; new tags are added in place.
+        n_sentences (int): Only keep the first n sentences (default: all).
+
+    Returns:
+        dict: 'offsets' and 'tags' arrays.
+    """
+    n_sentences = len(corpus) if n_sentences is None else n_sentences
+    offsets = np.asarray(corpus.tag_offsets[:n_sentences + 1], dtype=np.int64)
+
+    # Translate the corpus-local tag ids into the shared vocabulary
+    translation = np.array(
+        [tag_ids.setdefault(tag, len(tag_ids)) for tag in corpus.vocabularies['tags']],
+        dtype=np.int64,
+    )
+    local_tags = corpus.columns[TAG_COLUMNS[tag_type]][:offsets[-1]]
+    tags = translation[local_tags] if len(translation) else np.zeros(0, dtype=np.int64)
+    return {'offsets': offsets, 'tags': tags}
+
+
+def _count_keys(keys, query):
+    # Number of occurrences of every query key among `keys`
+    unique, counts = np.unique(keys, return_counts=True)
+    found = np.searchsorted(unique, query)
+    found = np.minimum(found, len(unique) - 1)
+    present = (unique[found] == query) if len(unique) else np.zeros(len(query), dtype=bool)
+    return np.where(present, counts[found] if len(unique) else 0, 0)
+
+
+def score_tag_arrays(gold, pred, n_tags):
+    """
+    Scores a whole corpus of tags in one integer-encoded pass.
+
+    Fills the global gold x predicted confusion matrix with np.bincount and
+    computes per-sentence accuracy and support-weighted precision, recall and F1
+    from (sentence, tag) counts, matching sklearn's 'weighted' average.
+
+    Args:
+        gold (dict): Gold tag arrays from `tag_arrays`.
+        pred (dict): Predicted tag arrays, tags in the same id space.
+        n_tags (int): Size of the shared tag vocabulary.
+
+    Returns:
+        dict: Per-sentence 'tokens', 'correct', 'precision', 'recall' and 'f1'
+              arrays, the 'confusion' matrix and the 'mismatch' token mask.
+    """
+    offsets = gold['offsets']
+    tokens = np.diff(offsets)
+    mismatched = np.flatnonzero(tokens != np.diff(pred['offsets']))
+    if len(mismatched):
+        i = mismatched[0]
+        raise ValueError(
+            f"Sentence {i + 1} has {tokens[i]} gold tags but {np.diff(pred['offsets'])[i]} predicted tags"
+        )
+
+    gold_tags = gold['tags']
+    pred_tags = pred['tags']
+    correct = gold_tags == pred_tags
+    confusion = np.bincount(gold_tags * n_tags + pred_tags, minlength=n_tags * n_tags).reshape(n_tags, n_tags)
+
+    # Per (sentence, tag) support, predicted count and true positives
+    sentence = np.repeat(np.arange(len(tokens)), tokens)
+    gold_keys = sentence * n_tags + gold_tags
+    keys, support = np.unique(gold_keys, return_counts=True)
+    predicted = _count_keys(sentence * n_tags + pred_tags, keys)
+    true_positives = _count_keys(gold_keys[correct], keys)
+
+    precision = np.divide(true_positives, predicted, out=np.zeros(len(keys)), where=predicted > 0)
+    recall = true_positives / support
+    f1 = 2 * true_positives / (support + predicted)
+
+    # Support-weighted averages per sentence; tags absent from gold have no weight
+    key_sentence = keys // n_tags
+    denominator = np.maximum(tokens, 1)
+
+    def weighted(values):
+        return np.bincount(key_sentence, weights=support * values, minlength=len(tokens)) / denominator
+
+    return {
+        'tokens': tokens,
+        'correct': np.bincount(sentence, weights=correct, minlength=len(tokens)).astype(np.int64),
+        'precision': weighted(precision),
+        'recall': weighted(recall),
+        'f1': weighted(f1),
+        'confusion': confusion,
+        'mismatch': ~correct,
+    }
+
+
+def summarize_confusion(confusion, tag_names):
+    """
+    Derives corpus-level tagging scores from a confusion matrix.
+
+    Args:
+        confusion (np.ndarray): Gold x predicted tag counts.
+        tag_names (list): Tag string for every row/column of the matrix.
+
+    Returns:
+        dict: Micro, macro and weighted precision/recall/F1, accuracy and a
+              'per_tag' DataFrame with precision, recall, F1 and support per tag.
+    """
+    true_positives = np.diag(confusion).astype(float)
+    support = confusion.sum(axis=1)
+    predicted = confusion.sum(axis=0)
+    total = support.sum()
+
+    precision = np.divide(true_positives, predicted, out=np.zeros(len(support)), where=predicted > 0)
+    recall = np.divide(true_positives, support, out=np.zeros(len(support)), where=support > 0)
+    f1 = np.divide(2 * true_positives, support + predicted, out=np.zeros(len(support)),
+                   where=(support + predicted) > 0)
+
+    # Only tags seen in gold or predictions count towards the macro average
+    seen = (support + predicted) > 0
+    accuracy = true_positives.sum() / total if total > 0 else 0.0
+
+    per_tag = pd.DataFrame({
+        'Tag': tag_names,
+        'Precision': precision,
+        'Recall': recall,
+        'F1': f1,
+        'Support': support,
+    })[seen].reset_index(drop=True)
+
+    return {
+        'accuracy': accuracy,
+        'micro_precision': accuracy,
+        'micro_recall': accuracy,
+        'micro_f1': accuracy,
+        'macro_precision': precision[seen].mean() if seen.any() else 0.0,
+        'macro_recall': recall[seen].mean() if seen.any() else 0.0,
+        'macro_f1': f1[seen].mean() if seen.any() else 0.0,
+        'weighted_precision': (precision * support).sum() / total if total > 0 else 0.0,
+        'weighted_recall': (recall * support).sum() / total if total > 0 else 0.0,
+        'weighted_f1': (f1 * support).sum() / total if total > 0 else 0.0,
+        'per_tag': per_tag,
+    }
+
+
+def evaluate_tagging_corpus(gold, parser, tag_type, tag_ids=None, breakdowns=None):
+    """
+    Scores one tag type of a parser corpus against the gold corpus.
+
+    Args:
+        gold (ColumnarCorpus): Gold standard corpus.
+        parser (ColumnarCorpus): Parser output corpus.
+        tag_type (str): 'upos' or 'pos'.
+        tag_ids (dict): Tag to id mapping to reuse, so that confusion matrices of
+            several runs share rows and columns (default: a fresh mapping).
+        breakdowns (Breakdowns): Grouped tables whose accuracy by word frequency band
+            is filled in place during scoring (default: none).
+
+    Returns:
+        dict: Per-sentence scores from `score_tag_arrays`, plus the gold and predicted
+              tag arrays, the shared 'tag_names' and the corpus-level 'summary'.
+    """
+    with tracer.stage('tagging', tag_type=tag_type) as stage:
+        n_sentences = min(len(gold), len(parser))
+        tag_ids = {} if tag_ids is None else tag_ids
+        gold_arrays = tag_arrays(gold, tag_type, tag_ids, n_sentences)
+        pred_arrays = tag_arrays(parser, tag_type, tag_ids, n_sentences)
+
+        scores = score_tag_arrays(gold_arrays, pred_arrays, len(tag_ids))
+        if breakdowns is not None:
+            gold_forms = np.asarray(gold.columns['tag_form'][:gold_arrays['offsets'][-1]], dtype=np.int64)
+            breakdowns.add_tagging(TAG_COLUMNS[tag_type], ~scores['mismatch'], gold_forms, gold)
+        stage.count(sentences=n_sentences, tokens=len(gold_arrays['tags']))
+    tag_names = list(tag_ids)
+    return {
+        **scores,
+        'offsets': gold_arrays['offsets'],
+        'gold_tags': gold_arrays['tags'],
+        'pred_tags': pred_arrays['tags'],
+        'tag_names': tag_names,
+        'summary': summarize_confusion(scores['confusion'], tag_names),
+    }
+
+
+def mismatch_lists(scores):
+    """
+    Groups mismatched tokens by sentence as (index, gold tag, predicted tag) tuples.
+
+    Args:
+        scores (dict): Result of `evaluate_tagging_corpus`.
+
+    Returns:
+        list: One list of mismatch tuples per sentence.
+    """
+    offsets = scores['offsets']
+    positions = np.flatnonzero(scores['mismatch'])
+    tag_names = scores['tag_names']
+
+    # Mismatch positions are sorted, so each sentence owns a contiguous slice
+    bounds = np.searchsorted(positions, offsets)
+    local = (positions - np.repeat(offsets[:-1], np.diff(bounds))).tolist()
+    gold_tags = scores['gold_tags'][positions].tolist()
+    pred_tags = scores['pred_tags'][positions].tolist()
+
+    return [
+        [(local[k], tag_names[gold_tags[k]], tag_names[pred_tags[k]]) for k in range(bounds[i], bounds[i + 1])]
+        for i in range(len(offsets) - 1)
+    ]
 
 
 # Function to evaluate detailed POS and UPOS metrics for a single parser's output against the gold standard
@@ -19,45 +238,41 @@ def evaluate_pos_upos_detailed(gold, parser):
     Returns:
         dict: Metrics including accuracy, precision, recall, F1-score for UPOS and POS.
     """
-    gold_upos = [tag[3] for tag in gold['tokens_tags']]  # Extract UPOS tags from gold standard
-    gold_pos = [tag[2] for tag in gold['tokens_tags']]  # Extract POS tags from gold standard
+    gold_corpus = as_corpus([gold])
+    parser_corpus = as_corpus([parser])
 
-    parser_upos = [tag[3] for tag in parser['tokens_tags']]  # Extract UPOS tags from parser output
-    parser_pos = [tag[2] for tag in parser['tokens_tags']]  # Extract POS tags from parser output
+    metrics = {}
+    for tag_type in TAG_COLUMNS:
+        scores = evaluate_tagging_corpus(gold_corpus, parser_corpus, tag_type)
+        metrics.update(_sentence_metrics(scores, tag_type, 0))
+    return metrics
 
-    # Calculate UPOS metrics
-    upos_precision, upos_recall, upos_f1, _ = precision_recall_fscore_support(
-        gold_upos, parser_upos, average='weighted', zero_division=0
-    )
-    upos_accuracy = accuracy_score(gold_upos, parser_upos)
-
-    # Calculate POS metrics
-    pos_precision, pos_recall, pos_f1, _ = precision_recall_fscore_support(
-        gold_pos, parser_pos, average='weighted', zero_division=0
-    )
-    pos_accuracy = accuracy_score(gold_pos, parser_pos)
 
+def _sentence_metrics(scores, tag_type, i):
+    # Metrics of sentence i in the layout of evaluate_pos_upos_detailed
+    tokens = scores['tokens'][i]
     return {
-        'upos_accuracy': upos_accuracy,
-        'upos_precision': upos_precision,
-        'upos_recall': upos_recall,
-        'upos_f1': upos_f1,
-        'pos_accuracy': pos_accuracy,
-        'pos_precision': pos_precision,
-        'pos_recall': pos_recall,
-        'pos_f1': pos_f1
+        f'{tag_type}_accuracy': scores['correct'][i] / tokens if tokens > 0 else 0.0,
+        f'{tag_type}_precision': scores['precision'][i],
+        f'{tag_type}_recall': scores['recall'][i],
+        f'{tag_type}_f1': scores['f1'][i],
     }
 
 
 # Function to compare multiple parser outputs against a gold standard
-def compare_parsers_pos_upos(gold_standard, parser_outputs, parser_names):
+def compare_parsers_pos_upos(gold_standard, parser_outputs, parser_names, breakdowns=None):
     """
     Compares POS and UPOS tagging performance of multiple parsers against the gold standard.
 
+    Each parser is scored with one integer-encoded pass per tag type; sentence
+    metrics and mismatch lists are all derived from those counts.
+
     Args:
-        gold_standard (list): List of gold standard sentences with token-level tags.
-        parser_outputs (list): List of parser outputs (one list per parser).
+        gold_standard (list or ColumnarCorpus): Gold standard sentences with token-level tags.
+        parser_outputs (list): List of parser outputs (one list or corpus per parser).
         parser_names (list): List of parser names corresponding to the outputs.
+        breakdowns (dict): Parser name to Breakdowns whose tag accuracy by word frequency
+            band is filled in place during scoring (default: none).
 
     Returns:
         tuple: A summary of results for all parsers and detailed error analysis.
@@ -65,28 +280,41 @@ def compare_parsers_pos_upos(gold_standard, parser_outputs, parser_names):
     results = []  # Store overall results for each parser
     detailed_errors = []  # Store detailed mismatch information for each parser
 
+    gold_corpus = as_corpus(gold_standard)
+
     for parser_output, parser_name in zip(parser_outputs, parser_names):
-        parser_result = {'Parser': parser_name, 'Sentences': []}
+        with tracer.stage('pos_upos', parser=parser_name):
+            parser_corpus = as_corpus(parser_output)
+            parser_breakdowns = (breakdowns or {}).get(parser_name)
+            upos_scores = evaluate_tagging_corpus(gold_corpus, parser_corpus, 'upos', breakdowns=parser_breakdowns)
+            pos_scores = evaluate_tagging_corpus(gold_corpus, parser_corpus, 'pos', breakdowns=parser_breakdowns)
+            results.append(_parser_sentence_results(gold_corpus, parser_name, upos_scores, pos_scores, detailed_errors))
+
+    return results, detailed_errors
 
-        for gold, parser in zip(gold_standard, parser_output):
-            metrics = evaluate_pos_upos_detailed(gold, parser)
 
-            # Extract mismatches for UPOS and POS tags
-            gold_upos = [tag[3] for tag in gold['tokens_tags']]
-            gold_pos = [tag[2] for tag in gold['tokens_tags']]
-            parser_upos = [tag[3] for tag in parser['tokens_tags']]
-            parser_pos = [tag[2] for tag in parser['tokens_tags']]
+def _parser_sentence_results(gold_corpus, parser_name, upos_scores, pos_scores, detailed_errors):
+    # Per-sentence metrics and mismatch lists of one parser, in the compare_parsers_pos_upos layout
+    with tracer.stage('sentence_results') as stage:
+        upos_mismatch_lists = mismatch_lists(upos_scores)
+        pos_mismatch_lists = mismatch_lists(pos_scores)
 
-            upos_mismatches = [
-                (i, g, p) for i, (g, p) in enumerate(zip(gold_upos, parser_upos)) if g != p
-            ]
-            pos_mismatches = [
-                (i, g, p) for i, (g, p) in enumerate(zip(gold_pos, parser_pos)) if g != p
-            ]
+        parser_result = {
+            'Parser': parser_name,
+            'Sentences': [],
+            'upos_summary': upos_scores['summary'],  # Corpus-level UPOS scores
+            'pos_summary': pos_scores['summary'],  # Corpus-level POS scores
+        }
+
+        for i in range(len(upos_scores['tokens'])):
+            text = gold_corpus.text(i)
+            upos_mismatches = upos_mismatch_lists[i]
+            pos_mismatches = pos_mismatch_lists[i]
 
             parser_result['Sentences'].append({
-                'text': gold['text'],  # Sentence text
-                **metrics,  # Metrics for the sentence
+                'text': text,  # Sentence text
+                **_sentence_metrics(upos_scores, 'upos', i),  # Metrics for the sentence
+                **_sentence_metrics(pos_scores, 'pos', i),
                 'upos_mismatches': upos_mismatches,  # Detailed UPOS mismatches
                 'pos_mismatches': pos_mismatches  # Detailed POS mismatches
             })
@@ -94,14 +322,13 @@ def compare_parsers_pos_upos(gold_standard, parser_outputs, parser_names):
             # Append detailed error information
             detailed_errors.append({
                 'Parser': parser_name,
-                'Sentence': gold['text'],
+                'Sentence': text,
                 'UPOS Mismatches': upos_mismatches,
                 'POS Mismatches': pos_mismatches
             })
+        stage.count(sentences=len(parser_result['Sentences']))
 
-        results.append(parser_result)
-
-    return results, detailed_errors
+    return parser_result
 
 
 # Function to summarize comparison results into a table
@@ -171,59 +398,126 @@ def generate_detailed_error_table(detailed_errors):
     return pd.DataFrame(error_data)
 
 
-# Load data from specified file paths
-gold_standard = load_sentences('data/gold_standard.txt')
-berkeley = load_sentences('data/berkeley_neural_output.txt')
-corenlp = load_sentences('data/corenlp_output.txt')
-allen = load_sentences('data/allen_output.txt')
+def mismatch_rows(detailed_errors):
+    """
+    Flattens mismatch lists into one row per mismatched token.
 
-# Compare parser outputs and generate metrics
-parser_outputs = [berkeley, corenlp, allen]
-parser_names = ["Berkeley", "CoreNLP", "Allen"]
-comparison_results, detailed_errors = compare_parsers_pos_upos(gold_standard, parser_outputs, parser_names)
+    Args:
+        detailed_errors (DataFrame): Rows of `generate_detailed_error_table` for one parser,
+            one row per sentence in sentence order.
 
-# Summarize results and generate error tables
-summary_table = summarize_results_to_table(comparison_results)
-detailed_error_table = generate_detailed_error_table(detailed_errors)
+    Returns:
+        dict: 'Parser', 'ID' (1-based sentence number), 'Tag Type', 'Token', 'Gold' and
+              'Predicted' columns.
+    """
+    rows = {'Parser': [], 'ID': [], 'Tag Type': [], 'Token': [], 'Gold': [], 'Predicted': []}
+    for sentence_id, (parser, upos_mismatches, pos_mismatches) in enumerate(
+            detailed_errors[['Parser', 'UPOS Mismatches', 'POS Mismatches']].itertuples(index=False), start=1):
+        for tag_type, mismatches in (('UPOS', upos_mismatches), ('POS', pos_mismatches)):
+            for token, gold_tag, pred_tag in mismatches:
+                rows['Parser'].append(parser)
+                rows['ID'].append(sentence_id)
+                rows['Tag Type'].append(tag_type)
+                rows['Token'].append(token)
+                rows['Gold'].append(gold_tag)
+                rows['Predicted'].append(pred_tag)
+    return rows
+
+
+def sentence_rows(parser_result):
+    """
+    Per-sentence metrics of one parser from `compare_parsers_pos_upos`, as columns.
+    """
+    sentences = parser_result['Sentences']
+    metrics = [key for key in (sentences[0] if sentences else {})
+               if key.endswith(('accuracy', 'precision', 'recall', 'f1'))]
+    return {
+        'Parser': [parser_result['Parser']] * len(sentences),
+        'ID': list(range(1, len(sentences) + 1)),
+        'Sentence': [s['text'] for s in sentences],
+        **{metric: [s[metric] for s in sentences] for metric in metrics},
+    }
 
 
 # Function to display and save results to files
-def display_and_save_results(summary_table, detailed_error_table, output_dir="results"):
+def display_and_save_results(summary_table, detailed_error_table, output_dir="results", format=None,
+                             comparison_results=None):
     """
-    Displays and saves the summary metrics and detailed error analysis to files.
+    Displays the summary metrics and saves them with the detailed error analysis as results files.
+
+    Only the summary goes to the console. Mismatches are saved one row per token and
+    streamed one parser at a time, in Parquet when pyarrow is installed and CSV otherwise.
 
     Args:
         summary_table (DataFrame): Summary of average metrics for each parser.
         detailed_error_table (DataFrame): Detailed error analysis for each parser and sentence.
         output_dir (str): Directory to save the results.
+        format (str): Results format, see `evaluation.results_writer` (default: best available).
+        comparison_results (list): Results of `compare_parsers_pos_upos`; when given, the
+            per-sentence metrics are saved too.
     """
-    import os
-
-    # Ensure the output directory exists
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Display results in the console
+    # Display the summary in the console
     print("Summary of POS and UPOS Metrics:")
     print(summary_table.to_string(index=False))
-    print("\nDetailed Error Analysis:")
-    print(detailed_error_table.to_string(index=False))
-
-    # Save summary metrics to a text file
-    summary_file = os.path.join(output_dir, "summary_metrics.txt")
-    with open(summary_file, "w", encoding="utf-8") as f:
-        f.write("Summary of POS and UPOS Metrics:\n")
-        f.write(summary_table.to_string(index=False))
-        f.write("\n")
-
-    # Save detailed error analysis to a text file
-    error_file = os.path.join(output_dir, "detailed_error_analysis.txt")
-    with open(error_file, "w", encoding="utf-8") as f:
-        f.write("Detailed Error Analysis:\n")
-        f.write(detailed_error_table.to_string(index=False))
-        f.write("\n")
 
+    summary_file = write_table(os.path.join(output_dir, "summary_metrics"), summary_table, format)
     print(f"\nSummary saved to: {summary_file}")
-    print(f"Detailed errors saved to: {error_file}")
 
-# Call the function to display and save results
-display_and_save_results(summary_table, detailed_error_table)
+    # Save detailed error analysis, one row group per parser
+    with ResultsWriter(os.path.join(output_dir, "detailed_error_analysis"), format) as writer:
+        for _, parser_errors in detailed_error_table.groupby('Parser', sort=False):
+            rows = mismatch_rows(parser_errors)
+            if rows['ID']:
+                writer.write(rows)
+        if not writer.rows:
+            # Header only, so the file of an earlier run is not mistaken for this one's
+            writer.write(mismatch_rows(detailed_error_table.iloc[:0]))
+        errors_file = writer.close()
+    if errors_file is not None:
+        print(f"Detailed errors saved to: {errors_file} ({writer.rows} mismatches)")
+
+    if comparison_results is not None:
+        with ResultsWriter(os.path.join(output_dir, "pos_upos_sentences"), format) as writer:
+            for parser_result in comparison_results:
+                writer.write(sentence_rows(parser_result))
+            sentences_file = writer.close()
+        if sentences_file is not None:
+            print(f"Sentence metrics saved to: {sentences_file}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Evaluate POS and UPOS tags against the gold standard.")
+    arg_parser.add_argument("--format", choices=RESULT_FORMATS, default=default_format(),
+                            help="Results file format (default: parquet if pyarrow is installed, else csv)")
+    arg_parser.add_argument("--output-dir", default="results")
+    arg_parser.add_argument("--breakdowns", action="store_true", help="Also save tag accuracy by word frequency band")
+    args = arg_parser.parse_args()
+
+    # Load data from specified file paths
+    gold_standard = load_corpus('data/gold_standard.txt')
+    berkeley = load_corpus('data/berkeley_neural_output.txt')
+    corenlp = load_corpus('data/corenlp_output.txt')
+    allen = load_corpus('data/allen_output.txt')
+
+    # Compare parser outputs and generate metrics
+    parser_outputs = [berkeley, corenlp, allen]
+    parser_names = ["Berkeley", "CoreNLP", "Allen"]
+    breakdowns = {name: Breakdowns.for_corpora(gold_standard, [output])
+                  for name, output in zip(parser_names, parser_outputs)} if args.breakdowns else None
+    comparison_results, detailed_errors = compare_parsers_pos_upos(gold_standard, parser_outputs, parser_names,
+                                                                   breakdowns)
+
+    # Summarize results and generate error tables
+    with tracer.stage('pos_upos_tables'):
+        summary_table = summarize_results_to_table(comparison_results)
+        detailed_error_table = generate_detailed_error_table(detailed_errors)
+
+    # Call the function to display and save results
+    with tracer.stage('pos_upos_output'):
+        display_and_save_results(summary_table, detailed_error_table, args.output_dir, args.format, comparison_results)
+
+    if breakdowns:
+        tables = pd.concat({name: parser_breakdowns.table() for name, parser_breakdowns in breakdowns.items()},
+                           names=['Parser']).reset_index(0)
+        breakdowns_path = write_table(os.path.join(args.output_dir, 'tagging_breakdowns'), tables, args.format)
+        print(f"Breakdowns saved to: {breakdowns_path}")
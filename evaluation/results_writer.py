@@ -0,0 +1,166 @@
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # Optional; results fall back to CSV
+    pa = None
+
+
+# Output formats and the file extension of each
+RESULT_FORMATS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv"}
+
+
+def default_format():
+    """
+    Returns the best available results format: Parquet when pyarrow is installed, CSV otherwise.
+    """
+    return "parquet" if pa is not None else "csv"
+
+
+class ResultsWriter:
+    """
+    Streams tables into one results file, one row group per `write` call.
+
+    Parquet and Arrow IPC files need pyarrow; CSV needs nothing beyond pandas. Every
+    batch must have the same columns as the first. The file is written under a
+    temporary name and moved into place on `close`, so readers never see a partial file.
+    """
+
+    def __init__(self, path, format=None):
+        """
+        Args:
+            path (str): Output path without extension; the format's extension is added.
+            format (str): 'parquet', 'arrow' or 'csv' (default: `default_format()`).
+        """
+        self.format = format or default_format()
+        if self.format not in RESULT_FORMATS:
+            raise ValueError(f"Unknown results format: {self.format}")
+        if self.format != "csv" and pa is None:
+            raise ImportError(f"Writing {self.format} results requires pyarrow")
+
+        self.path = path + RESULT_FORMATS[self.format]
+        self._tmp_path = f"{self.path}.tmp{os.getpid()}"
+        self._writer = None
+        self._schema = None
+        self._columns = None
+        self.rows = 0
+
+    def write(self, table):
+        """
+        Appends a batch of rows.
+
+        Args:
+            table (pd.DataFrame or dict): Rows to append, as a DataFrame or a dict of columns.
+        """
+        df = table if isinstance(table, pd.DataFrame) else pd.DataFrame(table)
+        if self._columns is None:
+            self._columns = list(df.columns)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        elif list(df.columns) != self._columns:
+            raise ValueError(f"Columns {list(df.columns)} do not match {self._columns} in {self.path}")
+
+        if self.format == "csv":
+            df.to_csv(self._tmp_path, mode="w" if self._writer is None else "a",
+                      header=self._writer is None, index=False)
+            self._writer = True
+        else:
+            batch = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._schema = batch.schema
+                if self.format == "parquet":
+                    self._writer = pa.parquet.ParquetWriter(self._tmp_path, self._schema)
+                else:
+                    self._writer = pa.ipc.new_file(self._tmp_path, self._schema)
+            # Later batches take the first batch's types (e.g. an all-integer float column)
+            self._writer.write_table(batch.cast(self._schema))
+        self.rows += len(df)
+
+    def close(self):
+        """
+        Finishes the file and moves it into place.
+
+        Returns:
+            str: Path of the written file, or None if nothing was written.
+        """
+        if self._writer is None:
+            return None
+        if self._writer is not True:
+            self._writer.close()
+        self._writer = None
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        elif self._writer is not None:
+            # Drop the partial file on failure
+            if self._writer is not True:
+                self._writer.close()
+            os.remove(self._tmp_path)
+
+
+def write_table(path, table, format=None):
+    """
+    Writes a single table as a results file.
+
+    Args:
+        path (str): Output path without extension.
+        table (pd.DataFrame or dict): Table to write.
+        format (str): Results format (default: `default_format()`).
+
+    Returns:
+        str: Path of the written file.
+    """
+    with ResultsWriter(path, format) as writer:
+        writer.write(table)
+    return writer.path
+
+
+def summary_frame(summaries):
+    """
+    Turns named summaries into a table with one row per name.
+
+    Args:
+        summaries (dict): Name (e.g. parser) to summary dict of metric name to value.
+
+    Returns:
+        pd.DataFrame: 'Parser' column followed by one column per metric.
+    """
+    return pd.DataFrame([{"Parser": name, **summary} for name, summary in summaries.items()])
+
+
+def read_results(path):
+    """
+    Loads a results file written by `ResultsWriter` back into a DataFrame.
+
+    Args:
+        path (str): Results file, with its extension.
+
+    Returns:
+        pd.DataFrame: The table.
+    """
+    if path.endswith(RESULT_FORMATS["csv"]):
+        return pd.read_csv(path)
+    if pa is None:
+        raise ImportError(f"Reading {path} requires pyarrow")
+    if path.endswith(RESULT_FORMATS["parquet"]):
+        return pa.parquet.read_table(path).to_pandas()
+    with pa.ipc.open_file(path) as reader:
+        return reader.read_all().to_pandas()
+
+
+def print_summary(title, summary):
+    """
+    Prints a summary dict to the console, one metric per line.
+    """
+    print(f"\n{title}:")
+    for key, value in summary.items():
+        print(f"  {key}: {value}")
@@ -0,0 +1,323 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from evaluation.evaluate import DEFAULT_PARSERS
+from evaluation.incremental import (INCREMENTAL_FAMILIES, empty_index, scan_blocks, sentence_statistics,
+                                    summarize_index, update_index)
+from scripts.data_preprocess import build_sentence
+from scripts.instrumentation import tracer
+
+
+# Seconds between two checks of the watched files
+DEFAULT_INTERVAL = 0.5
+
+# Local address of the JSON endpoint
+DEFAULT_HOST = "127.0.0.1"
+
+
+def file_signature(path):
+    """
+    Returns (modification time in ns, size) of a file, or None if it does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class EvaluationService:
+    """
+    Long-lived evaluator that keeps the gold standard and every parser's scores in memory.
+
+    The gold blocks are read, hashed and turned into sentence records once. For each
+    parser output the service holds an in-memory index like `evaluation.incremental`'s
+    sidecar: per-sentence statistics keyed by sentence number and block hash, and the
+    running totals. When an output changes, only its changed blocks are scored and
+    the totals are updated by subtraction and addition; an unchanged file is only
+    checked by modification time and size. A changed gold standard is reloaded and
+    every parser rescored from scratch. An output that cannot be scored keeps its
+    previous result, and the error is kept in `errors` until it scores again.
+
+    Methods are safe to call from several threads.
+
+    Args:
+        gold_path (str): Gold standard file.
+        families (tuple): Families to keep up to date, see INCREMENTAL_FAMILIES.
+    """
+
+    def __init__(self, gold_path, families=INCREMENTAL_FAMILIES):
+        self.gold_path = gold_path
+        self.families = tuple(families)
+        self.results = {}
+        self.errors = {}
+        self._states = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._load_gold()
+
+    def _load_gold(self):
+        # Gold hashes and sentence records stay resident for the life of the service
+        # Only replaced once the new gold standard has been read in full
+        with tracer.stage("service_gold", file=self.gold_path) as stage:
+            signature = file_signature(self.gold_path)
+            hashes, blocks = scan_blocks(self.gold_path, {})
+            sentences = {number: build_sentence(block) for number, block in blocks.items()}
+            stage.count(sentences=len(sentences))
+        self._gold_signature, self._gold_hashes, self._gold_sentences = signature, hashes, sentences
+        self._states.clear()
+
+    def evaluate(self, parser_path, name=None, force=False):
+        """
+        Scores a parser output, rescoring only what changed since the previous call.
+
+        Args:
+            parser_path (str): Parser output file.
+            name (str): Name to report the parser under (default: the path).
+            force (bool): Rescore every sentence even if nothing changed.
+
+        Returns:
+            dict: 'parser', 'path', 'summary' (family to corpus summary), 'previous' (the
+                  summary before this update, or None), 'run' counts of `update_index`
+                  and 'seconds' spent; None if the file does not exist.
+        """
+        name = name or parser_path
+        with self._lock:
+            if file_signature(self.gold_path) != self._gold_signature:
+                self._load_gold()
+
+            signature = file_signature(parser_path)
+            if signature is None:
+                return None
+            state = self._states.get(parser_path)
+            if state is not None and state["signature"] == signature and not force:
+                return self.results[state["name"]]
+
+            started = time.perf_counter()
+            with tracer.stage("service_evaluate", parser=name) as stage:
+                index = state["index"] if state is not None and not force else empty_index(self.families)
+                known = dict(zip(index["numbers"].tolist(), index["pred_hashes"].tolist()))
+                pred_hashes, pred_blocks = scan_blocks(parser_path, known)
+
+                # Sentences present on both sides whose parser block changed or is new
+                rescored = sorted(number for number in pred_blocks if number in self._gold_hashes)
+                statistics = sentence_statistics([self._gold_sentences[number] for number in rescored],
+                                                 [build_sentence(pred_blocks[number]) for number in rescored],
+                                                 self.families) if rescored else None
+                run = update_index(index, self._gold_hashes, pred_hashes, rescored, statistics, self.families)
+                stage.count(sentences=len(rescored))
+
+            previous = self.results.get(name)
+            self._states[parser_path] = {"signature": signature, "index": index, "name": name}
+            self.results[name] = {
+                "parser": name,
+                "path": parser_path,
+                "summary": summarize_index(index, self.families),
+                "previous": previous["summary"] if previous is not None else None,
+                "run": run,
+                "seconds": time.perf_counter() - started,
+            }
+            return self.results[name]
+
+    def poll(self, parser_paths):
+        """
+        Rescores the outputs that changed since they were last scored.
+
+        Parser scripts write their output in place, batch by batch, so a changed
+        file is only scored once two polls in a row see the same modification
+        time and size (of it and of the gold standard). An output that still
+        fails to score, e.g. one cut off mid-block, is reported once per version
+        and keeps its previous result.
+
+        Args:
+            parser_paths (dict): Parser name to output file.
+
+        Returns:
+            tuple: Results of `evaluate` for the outputs that were rescored, and the
+                   errors ('parser', 'path', 'error') of those that failed.
+        """
+        updated, failed = [], []
+        for name, path in parser_paths.items():
+            signature = file_signature(path)
+            gold_signature = file_signature(self.gold_path)
+            state = self._states.get(path)
+            if signature is None or (state is not None and state["signature"] == signature
+                                     and gold_signature == self._gold_signature):
+                self._pending.pop(path, None)
+                continue
+
+            # Wait for the file to stop changing
+            seen = (signature, gold_signature)
+            if self._pending.get(path) != seen:
+                self._pending[path] = seen
+                continue
+            error = self.errors.get(name)
+            if error is not None and error["signatures"] == seen:
+                continue
+
+            try:
+                result = self.evaluate(path, name)
+            except Exception as exception:
+                self.errors[name] = {"parser": name, "path": path, "error": f"{type(exception).__name__}: {exception}",
+                                     "signatures": seen}
+                failed.append(self.errors[name])
+                continue
+            self._pending.pop(path, None)
+            self.errors.pop(name, None)
+            if result is not None:
+                updated.append(result)
+        return updated, failed
+
+    def snapshot(self):
+        """
+        Returns the latest result of every parser, for JSON output.
+        """
+        with self._lock:
+            return {"gold": self.gold_path, "families": list(self.families), "parsers": dict(self.results),
+                    "errors": {name: error["error"] for name, error in self.errors.items()}}
+
+
+def print_result(result):
+    """
+    Prints a parser's updated summary with the change of every metric since the previous one.
+    """
+    run = result["run"]
+    print(f"\n{result['parser']}: {run['rescored']} of {run['sentences']} sentences rescored "
+          f"in {result['seconds'] * 1000:.1f} ms")
+    previous = result["previous"] or {}
+    for family, summary in result["summary"].items():
+        print(f"  {family}:")
+        for key, value in summary.items():
+            before = previous.get(family, {}).get(key)
+            change = f" ({value - before:+.4f})" if before is not None and value != before else ""
+            print(f"    {key}: {value:.4f}{change}")
+
+
+def print_error(error):
+    """
+    Reports a parser output that could not be scored.
+    """
+    print(f"\n{error['parser']}: {error['path']} could not be scored, keeping the previous result: "
+          f"{error['error']}", file=sys.stderr)
+
+
+def _handler(service, parser_paths):
+    # Request handler bound to one service
+
+    class Handler(BaseHTTPRequestHandler):
+        """
+        JSON endpoint: GET /summaries returns every parser's latest result, and
+        GET /evaluate?parser=<name or path> scores one output first (rescoring it if it changed).
+        """
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/summaries":
+                self._send(200, service.snapshot())
+            elif url.path == "/evaluate":
+                parser = parse_qs(url.query).get("parser", [None])[0]
+                if parser is None:
+                    self._send(400, {"error": "missing 'parser' parameter"})
+                    return
+                path = parser_paths.get(parser, parser)
+                try:
+                    result = service.evaluate(path, parser if parser in parser_paths else None)
+                except Exception as error:
+                    self._send(422, {"error": f"{path} could not be scored: {type(error).__name__}: {error}"})
+                    return
+                if result is None:
+                    self._send(404, {"error": f"{path} does not exist"})
+                else:
+                    self._send(200, result)
+            else:
+                self._send(404, {"error": f"unknown endpoint {url.path}"})
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Keep the console for summaries
+            pass
+
+    return Handler
+
+
+def serve(service, parser_paths, port, host=DEFAULT_HOST):
+    """
+    Starts the JSON endpoint in a background thread.
+
+    Args:
+        service (EvaluationService): Service to query.
+        parser_paths (dict): Parser name to output file, for `?parser=<name>`.
+        port (int): Port to listen on (0 picks a free one).
+        host (str): Address to bind; local only by default.
+
+    Returns:
+        ThreadingHTTPServer: The running server; call `shutdown()` to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), _handler(service, parser_paths))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def watch(service, parser_paths, interval=DEFAULT_INTERVAL, on_result=print_result, on_error=print_error,
+          stop=None):
+    """
+    Polls the parser outputs and rescores each one whenever it changes.
+
+    Files are checked by modification time and size, so an idle check costs one
+    stat call per file. Parser scripts rewrite their output in place while they
+    run, so a change is scored once it has been stable for one interval (see
+    `EvaluationService.poll`); an output that fails to score is reported and
+    the loop goes on.
+
+    Args:
+        service (EvaluationService): Service holding the gold standard and scores.
+        parser_paths (dict): Parser name to output file.
+        interval (float): Seconds between checks.
+        on_result (callable): Called with every updated result.
+        on_error (callable): Called with every output that failed to score.
+        stop (threading.Event): Ends the loop when set (default: run until interrupted).
+    """
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        updated, failed = service.poll(parser_paths)
+        for result in updated:
+            on_result(result)
+        for error in failed:
+            on_error(error)
+        stop.wait(interval)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Keep the gold standard in memory and rescore parser "
+                                                     "outputs whenever they change.")
+    arg_parser.add_argument("--gold", default="data/gold_standard.txt")
+    arg_parser.add_argument("--parser", action="append", default=None, metavar="NAME=PATH",
+                            help="Parser output to watch (default: the Berkeley, CoreNLP and Allen outputs)")
+    arg_parser.add_argument("--metrics", nargs="+", choices=INCREMENTAL_FAMILIES, default=list(INCREMENTAL_FAMILIES))
+    arg_parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="Seconds between checks")
+    arg_parser.add_argument("--port", type=int, default=None, help="Also serve JSON summaries on this local port")
+    args = arg_parser.parse_args()
+
+    parsers = dict(entry.split("=", 1) for entry in args.parser) if args.parser else dict(DEFAULT_PARSERS)
+    evaluation_service = EvaluationService(args.gold, args.metrics)
+    if args.port is not None:
+        http_server = serve(evaluation_service, parsers, args.port)
+        print(f"JSON summaries at http://{DEFAULT_HOST}:{http_server.server_address[1]}/summaries")
+    print(f"Watching {len(parsers)} parser outputs against {args.gold} (Ctrl-C to stop)")
+    try:
+        watch(evaluation_service, parsers, args.interval)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,345 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from evaluation.evaluate import DEFAULT_PARSERS, METRIC_FAMILIES, evaluate
+from evaluation.pos_upos_eval import TAG_COLUMNS
+from scripts.instrumentation import tracer
+
+
+# Elements of the resample index matrix per chunk (int64 indices plus float64 weights: ~128 MB)
+DEFAULT_CHUNK_ELEMENTS = 2 ** 23
+
+
+def _ratio(numerator, denominator, scale=1.0):
+    # One metric as a ratio of per-sentence sums: sum(numerator) / sum(denominator)
+    return (scale * np.asarray(numerator, dtype=float), np.asarray(denominator, dtype=float))
+
+
+def dependency_metric_vectors(counts):
+    """
+    Expresses every dependency summary metric as a ratio of per-sentence sums.
+
+    Args:
+        counts (dict): Per-sentence counts from `score_dependency_arrays`.
+
+    Returns:
+        dict: Metric name (as in `summarize_dependency_counts`) to (numerator, denominator) vectors.
+    """
+    tokens = counts["tokens"]
+    sentences = np.ones(len(tokens))
+    denominator = np.maximum(tokens, 1)
+    return {
+        "Average UAS": _ratio(counts["uas"] / denominator, sentences),
+        "Average LAS": _ratio(counts["las"] / denominator, sentences),
+        "Micro UAS": _ratio(counts["uas"], tokens),
+        "Micro LAS": _ratio(counts["las"], tokens),
+        "Root Accuracy": _ratio(counts["root"], sentences),
+        "Complete Match Rate": _ratio(counts["complete"], sentences),
+    }
+
+
+def tagging_metric_vectors(scores, tag_type):
+    """
+    Expresses the POS/UPOS metrics as ratios of per-sentence sums.
+
+    The sentence averages match `summarize_results_to_table`; corpus accuracy is
+    the micro accuracy of `summarize_confusion`.
+
+    Args:
+        scores (dict): Per-sentence 'tokens', 'correct', 'precision', 'recall' and 'f1'.
+        tag_type (str): 'upos' or 'pos'.
+
+    Returns:
+        dict: Metric name to (numerator, denominator) vectors.
+    """
+    prefix = tag_type.upper()
+    tokens = scores["tokens"]
+    sentences = np.ones(len(tokens))
+    return {
+        f"{prefix} Accuracy": _ratio(np.where(tokens > 0, scores["correct"] / np.maximum(tokens, 1), 0.0), sentences),
+        f"{prefix} Precision": _ratio(scores["precision"], sentences),
+        f"{prefix} Recall": _ratio(scores["recall"], sentences),
+        f"{prefix} F1": _ratio(scores["f1"], sentences),
+        f"{prefix} Corpus Accuracy": _ratio(scores["correct"], tokens),
+    }
+
+
+def constituency_metric_vectors(df):
+    """
+    Expresses the EVALB summary metrics as ratios of per-sentence sums.
+
+    Error sentences get zero weight, as in `summarize_constituency_counts`. The
+    F-measure 2PR/(P+R) equals 2 * matched / (gold + test) over valid sentences.
+
+    Args:
+        df (pd.DataFrame): Per-sentence counts from `constituency_counts`.
+
+    Returns:
+        dict: Metric name (as in the EVALB summary) to (numerator, denominator) vectors.
+    """
+    valid = (df["status"] == 0).to_numpy(dtype=float)
+    matched = df["matched"].to_numpy() * valid
+    gold = df["gold"].to_numpy() * valid
+    test = df["test"].to_numpy() * valid
+    crossing = df["crossing"].to_numpy() * valid
+    complete = (df["matched"] == df["gold"]) & (df["matched"] == df["test"])
+    return {
+        "Bracketing Recall": _ratio(matched, gold, 100.0),
+        "Bracketing Precision": _ratio(matched, test, 100.0),
+        "Bracketing FMeasure": _ratio(2 * matched, gold + test, 100.0),
+        "Complete match": _ratio(complete.to_numpy() * valid, valid, 100.0),
+        "Average crossing": _ratio(crossing, valid),
+        "No crossing": _ratio((df["crossing"] == 0).to_numpy() * valid, valid, 100.0),
+        "2 or less crossing": _ratio((df["crossing"] <= 2).to_numpy() * valid, valid, 100.0),
+        "Tagging accuracy": _ratio(df["correct_tags"].to_numpy() * valid, df["tagged"].to_numpy() * valid, 100.0),
+    }
+
+
+def aligned_metric_vectors(counts):
+    """
+    Expresses the CoNLL 2018 style aligned F1 scores as ratios of per-sentence sums.
+
+    Args:
+        counts (dict): Per-sentence counts from `score_aligned`.
+
+    Returns:
+        dict: Metric name to (numerator, denominator) vectors.
+    """
+    words = counts["gold_words"] + counts["pred_words"]
+    tags = counts["gold_tags"] + counts["pred_tags"]
+    return {
+        "Words F1": _ratio(2 * counts["aligned_words"], words),
+        "UAS F1": _ratio(2 * counts["uas"], words),
+        "LAS F1": _ratio(2 * counts["las"], words),
+        "Tokens F1": _ratio(2 * counts["aligned_tags"], tags),
+        "UPOS F1": _ratio(2 * counts["upos"], tags),
+        "POS F1": _ratio(2 * counts["pos"], tags),
+    }
+
+
+def metric_vectors(family, merged):
+    """
+    Collects the metric vectors of one merged result of `evaluate`.
+
+    Args:
+        family (str): Metric family, see METRIC_FAMILIES.
+        merged (dict): Merged statistics of one parser and family.
+
+    Returns:
+        dict: Metric name to (numerator, denominator) vectors.
+    """
+    if family == "dependency":
+        return dependency_metric_vectors(merged["counts"])
+    if family == "constituency":
+        return constituency_metric_vectors(merged["counts"])
+    if family == "aligned":
+        return aligned_metric_vectors(merged["counts"])
+    vectors = {}
+    for tag_type in TAG_COLUMNS:
+        vectors.update(tagging_metric_vectors(merged[tag_type], tag_type))
+    return vectors
+
+
+def _stack(vectors, names):
+    # (sentences x metrics) numerator and denominator matrices
+    numerators = np.column_stack([vectors[name][0] for name in names])
+    denominators = np.column_stack([vectors[name][1] for name in names])
+    return numerators, denominators
+
+
+def _divide(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.full(np.broadcast(numerator, denominator).shape, np.nan),
+                     where=denominator != 0)
+
+
+def _chunks(n_resamples, n_sentences, chunk_size):
+    # Sizes of the resample chunks so that each index matrix stays bounded
+    chunk_size = chunk_size or max(1, DEFAULT_CHUNK_ELEMENTS // max(n_sentences, 1))
+    for start in range(0, n_resamples, chunk_size):
+        yield min(chunk_size, n_resamples - start)
+
+
+def _resample_weights(rng, size, n_sentences):
+    # Each row counts how often every sentence was drawn in one bootstrap resample
+    indices = rng.integers(0, n_sentences, size=(size, n_sentences))
+    indices += np.arange(size)[:, None] * n_sentences
+    return np.bincount(indices.ravel(), minlength=size * n_sentences).reshape(size, n_sentences).astype(float)
+
+
+def paired_bootstrap(a, b, n_resamples=10000, confidence=0.95, seed=0, chunk_size=None):
+    """
+    Paired bootstrap confidence intervals and p-values for two systems.
+
+    Both systems are resampled with the same sentence indices. Every resample of a
+    chunk is one row of an index matrix, turned into per-sentence draw counts, so
+    all metrics of all resamples come from two matrix products per system.
+
+    Args:
+        a (dict): Metric vectors of system A (e.g. from `metric_vectors`).
+        b (dict): Metric vectors of system B, over the same sentences.
+        n_resamples (int): Number of bootstrap resamples.
+        confidence (float): Confidence level of the percentile intervals.
+        seed (int): Random seed.
+        chunk_size (int): Resamples per chunk (default: bounded by DEFAULT_CHUNK_ELEMENTS).
+
+    Returns:
+        pd.DataFrame: Per metric the observed scores of A and B and their difference,
+            the interval bounds of each and the two-sided p-value of the difference.
+    """
+    names = [name for name in a if name in b]
+    num_a, den_a = _stack(a, names)
+    num_b, den_b = _stack(b, names)
+    n_sentences = len(num_a)
+    if len(num_b) != n_sentences:
+        raise ValueError(f"System A has {n_sentences} sentences but system B has {len(num_b)}")
+
+    observed_a = _divide(num_a.sum(axis=0), den_a.sum(axis=0))
+    observed_b = _divide(num_b.sum(axis=0), den_b.sum(axis=0))
+    observed = observed_a - observed_b
+
+    rng = np.random.default_rng(seed)
+    samples_a, samples_b = [], []
+    with tracer.stage("paired_bootstrap", resamples=n_resamples) as stage:
+        for size in _chunks(n_resamples, n_sentences, chunk_size):
+            weights = _resample_weights(rng, size, n_sentences)
+            samples_a.append(_divide(weights @ num_a, weights @ den_a))
+            samples_b.append(_divide(weights @ num_b, weights @ den_b))
+        stage.count(sentences=n_sentences)
+    samples_a = np.concatenate(samples_a)
+    samples_b = np.concatenate(samples_b)
+    deltas = samples_a - samples_b
+
+    # Percentile intervals; resamples with an empty denominator are ignored
+    tail = 100.0 * (1 - confidence) / 2
+    bounds_a = np.nanpercentile(samples_a, [tail, 100 - tail], axis=0)
+    bounds_b = np.nanpercentile(samples_b, [tail, 100 - tail], axis=0)
+    bounds_delta = np.nanpercentile(deltas, [tail, 100 - tail], axis=0)
+
+    # Two-sided test of the centred bootstrap distribution of the difference
+    exceed = (np.abs(deltas - observed) >= np.abs(observed)).sum(axis=0)
+    p_values = (exceed + 1) / (np.isfinite(deltas).sum(axis=0) + 1)
+
+    return pd.DataFrame({
+        "Metric": names,
+        "A": observed_a,
+        "B": observed_b,
+        "Difference": observed,
+        "A Low": bounds_a[0],
+        "A High": bounds_a[1],
+        "B Low": bounds_b[0],
+        "B High": bounds_b[1],
+        "Difference Low": bounds_delta[0],
+        "Difference High": bounds_delta[1],
+        "p-value": p_values,
+    })
+
+
+def approximate_randomization(a, b, n_resamples=10000, seed=0, chunk_size=None):
+    """
+    Paired approximate-randomisation test for two systems.
+
+    Each resample swaps the outputs of the two systems on a random half of the
+    sentences; the swap masks of a chunk form one matrix, so the shuffled sums of
+    every metric are matrix products with the per-sentence differences.
+
+    Args:
+        a (dict): Metric vectors of system A.
+        b (dict): Metric vectors of system B, over the same sentences.
+        n_resamples (int): Number of random swaps.
+        seed (int): Random seed.
+        chunk_size (int): Resamples per chunk (default: bounded by DEFAULT_CHUNK_ELEMENTS).
+
+    Returns:
+        pd.DataFrame: Per metric the observed difference and its two-sided p-value.
+    """
+    names = [name for name in a if name in b]
+    num_a, den_a = _stack(a, names)
+    num_b, den_b = _stack(b, names)
+    n_sentences = len(num_a)
+    if len(num_b) != n_sentences:
+        raise ValueError(f"System A has {n_sentences} sentences but system B has {len(num_b)}")
+
+    sum_num_a, sum_den_a = num_a.sum(axis=0), den_a.sum(axis=0)
+    sum_num_b, sum_den_b = num_b.sum(axis=0), den_b.sum(axis=0)
+    observed = _divide(sum_num_a, sum_den_a) - _divide(sum_num_b, sum_den_b)
+
+    # Swapping a sentence moves its difference from one system's sums to the other's
+    diff_num, diff_den = num_b - num_a, den_b - den_a
+
+    rng = np.random.default_rng(seed)
+    exceed = np.zeros(len(names))
+    finite = np.zeros(len(names))
+    with tracer.stage("approximate_randomization", resamples=n_resamples) as stage:
+        for size in _chunks(n_resamples, n_sentences, chunk_size):
+            swaps = (rng.random((size, n_sentences)) < 0.5).astype(float)
+            moved_num, moved_den = swaps @ diff_num, swaps @ diff_den
+            shuffled = (_divide(sum_num_a + moved_num, sum_den_a + moved_den)
+                        - _divide(sum_num_b - moved_num, sum_den_b - moved_den))
+            exceed += (np.abs(shuffled) >= np.abs(observed) - 1e-12).sum(axis=0)
+            finite += np.isfinite(shuffled).sum(axis=0)
+        stage.count(sentences=n_sentences)
+
+    return pd.DataFrame({"Metric": names, "Difference": observed, "p-value": (exceed + 1) / (finite + 1)})
+
+
+def compare_parsers(results, parser_a, parser_b, families=METRIC_FAMILIES, n_resamples=10000,
+                    confidence=0.95, seed=0, chunk_size=None):
+    """
+    Runs both tests on every metric of two parsers scored by `evaluate`.
+
+    Args:
+        results (dict): Output of `evaluate`.
+        parser_a (str): Name of system A.
+        parser_b (str): Name of system B.
+        families (iterable): Metric families to test.
+        n_resamples (int): Resamples per test.
+        confidence (float): Confidence level of the bootstrap intervals.
+        seed (int): Random seed.
+        chunk_size (int): Resamples per chunk.
+
+    Returns:
+        pd.DataFrame: Bootstrap table with a 'Family' column and the approximate
+            randomisation p-value in 'AR p-value'.
+    """
+    tables = []
+    for family in families:
+        a = metric_vectors(family, results[parser_a][family])
+        b = metric_vectors(family, results[parser_b][family])
+        table = paired_bootstrap(a, b, n_resamples, confidence, seed, chunk_size)
+        table["AR p-value"] = approximate_randomization(a, b, n_resamples, seed, chunk_size)["p-value"]
+        table.insert(0, "Family", family)
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Paired significance tests between two parsers.")
+    arg_parser.add_argument("parser_a", choices=list(DEFAULT_PARSERS))
+    arg_parser.add_argument("parser_b", choices=list(DEFAULT_PARSERS))
+    arg_parser.add_argument("--gold", default="data/gold_standard.txt")
+    arg_parser.add_argument("--gold-trees", default="evaluation/evalb_pre/gold_standard_improved_tree.txt")
+    arg_parser.add_argument("--metrics", nargs="+", choices=METRIC_FAMILIES, default=list(METRIC_FAMILIES))
+    arg_parser.add_argument("--resamples", type=int, default=10000)
+    arg_parser.add_argument("--confidence", type=float, default=0.95)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--chunk-size", type=int, default=None, help="Resamples per chunk, to cap memory")
+    arg_parser.add_argument("--workers", type=int, default=None)
+    args = arg_parser.parse_args()
+
+    parsers = {name: DEFAULT_PARSERS[name] for name in (args.parser_a, args.parser_b)}
+    results = evaluate(args.gold, parsers, families=args.metrics, gold_trees_path=args.gold_trees, workers=args.workers)
+    table = compare_parsers(results, args.parser_a, args.parser_b, args.metrics, args.resamples,
+                            args.confidence, args.seed, args.chunk_size)
+
+    print(f"{args.parser_a} (A) vs. {args.parser_b} (B), {args.resamples} resamples:")
+    print(table.to_string(index=False))
+
+    # Save the table for later analysis
+    os.makedirs("results", exist_ok=True)
+    output_file = os.path.join("results", f"significance_{args.parser_a}_vs_{args.parser_b}.json")
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(table.to_dict("records"), f, indent=2)
+    print(f"\nSignificance tests saved to: {output_file}")
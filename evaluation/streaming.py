@@ -0,0 +1,241 @@
+import argparse
+from itertools import zip_longest
+
+import numpy as np
+from evaluation.alignment import score_aligned, summarize_aligned_counts
+from evaluation.constituency_eval import (EVALB_DEFAULTS, constituency_counts, constituency_totals, iter_trees,
+                                          summarize_constituency_totals, with_cutoff_summary)
+from evaluation.dependency_eval import evaluate_dependency_corpus
+from evaluation.evaluate import DEFAULT_PARSERS, METRIC_FAMILIES
+from evaluation.incremental import additive_totals, summarize_totals
+from evaluation.pos_upos_eval import TAG_COLUMNS, evaluate_tagging_corpus, summarize_confusion
+from scripts.corpus_store import build_corpus
+from scripts.data_preprocess import iter_sentences
+from scripts.instrumentation import peak_rss_bytes, tracer
+
+
+# Sentences per window, and the tag tokens (over gold and all parsers) that close a window early
+DEFAULT_WINDOW_SIZE = 1000
+DEFAULT_WINDOW_TOKENS = 200_000
+
+# Marks the end of a shorter stream in the lockstep walk
+_END = object()
+
+# Prefix of the constituency totals of sentences up to EVALB's CUTOFF_LEN
+CUTOFF_PREFIX = "cutoff_"
+
+
+def _check_numbers(name, position, gold, pred):
+    # Blocks are paired by position; a numbering mismatch means the files are out of step
+    if gold is _END or pred is _END:
+        side = "gold standard" if gold is _END else name
+        raise ValueError(f"The {side} file ends at sentence {position}, before the other files")
+    if gold and pred and gold["number"] != pred["number"]:
+        raise ValueError(f"{name}: sentence {position + 1} is numbered {pred['number']} "
+                         f"but {gold['number']} in the gold standard")
+
+
+def iter_windows(gold_path, parser_paths, window_size=DEFAULT_WINDOW_SIZE, window_tokens=DEFAULT_WINDOW_TOKENS,
+                 gold_trees_path=None):
+    """
+    Walks the gold standard and every parser output in lockstep, one window at a time.
+
+    Each file is read one block at a time, so only the current window is ever held
+    in memory. Blocks are paired by position, as in `evaluation.evaluate`, and the
+    sentence numbers of non-empty pairs must agree.
+
+    Args:
+        gold_path (str): Gold standard file.
+        parser_paths (dict): Parser name to output file.
+        window_size (int): Maximum sentences per window.
+        window_tokens (int): Tag tokens, summed over all files, after which a window is closed early.
+        gold_trees_path (str): Optional one-tree-per-line gold file, read in step with the others.
+
+    Yields:
+        int: Position of the window's first sentence.
+        list: Gold sentence records.
+        dict: Parser name to the parser's records for the same sentences.
+        list: Gold trees of the window, or None without a gold trees file.
+
+    Raises:
+        ValueError: If a file is shorter than the others or the files are out of step.
+    """
+    names = list(parser_paths)
+    streams = [iter_sentences(gold_path), *(iter_sentences(parser_paths[name]) for name in names)]
+    if gold_trees_path:
+        streams.append(iter_trees(gold_trees_path))
+
+    start = 0
+    window, tokens = [], 0
+    for position, row in enumerate(zip_longest(*streams, fillvalue=_END)):
+        gold, preds = row[0], row[1:len(names) + 1]
+        for name, pred in zip(names, preds):
+            _check_numbers(name, position, gold, pred)
+        if gold_trees_path and (gold is _END or row[-1] is _END):
+            raise ValueError(f"{gold_trees_path} has a different number of trees than {gold_path} has sentences")
+
+        window.append(row)
+        tokens += sum(len(record["tokens_tags"]) for record in row[:len(names) + 1] if record)
+        if len(window) >= window_size or tokens >= window_tokens:
+            yield start, *_unzip(window, names, gold_trees_path)
+            start += len(window)
+            window, tokens = [], 0
+
+    if window:
+        yield start, *_unzip(window, names, gold_trees_path)
+
+
+def _unzip(window, names, gold_trees_path):
+    # Window rows -> gold records, parser records and gold trees
+    columns = list(zip(*window))
+    trees = list(columns[-1]) if gold_trees_path else None
+    return list(columns[0]), {name: list(columns[i + 1]) for i, name in enumerate(names)}, trees
+
+
+def _add(totals, window_totals):
+    # Running totals of disjoint windows add up key by key
+    for key, value in window_totals.items():
+        totals[key] = totals.get(key, 0) + value
+
+
+def _grow(confusion, size):
+    # Pads a confusion matrix when the shared tag vocabulary grew
+    missing = size - len(confusion)
+    return np.pad(confusion, ((0, missing), (0, missing))) if missing else confusion
+
+
+def _score_window(gold, pred, family, gold_trees, tag_ids, evalb_params):
+    # Additive totals of one metric family over one window; per-sentence results are dropped here
+    if family == "dependency":
+        counts, _ = evaluate_dependency_corpus(gold, pred)
+        return additive_totals(family, counts)
+    if family == "aligned":
+        return {key: int(np.sum(value)) for key, value in score_aligned(gold, pred).items()}
+    if family == "constituency":
+        gold_trees = gold_trees if gold_trees is not None else [gold.tree(i) for i in range(len(gold))]
+        test_trees = [pred.tree(i) for i in range(len(gold))]
+        df = constituency_counts(gold_trees, test_trees, evalb_params)
+        # EVALB also summarises the sentences up to CUTOFF_LEN words; their totals are kept alongside
+        cutoff = constituency_totals(df, evalb_params["CUTOFF_LEN"])
+        return {**constituency_totals(df), **{f"{CUTOFF_PREFIX}{key}": value for key, value in cutoff.items()}}
+
+    columns, confusions = {}, {}
+    for tag_type in TAG_COLUMNS:
+        scores = evaluate_tagging_corpus(gold, pred, tag_type, tag_ids)
+        columns.update({f"{tag_type}_{key}": scores[key] for key in ("tokens", "correct", "precision", "recall", "f1")})
+        confusions[tag_type] = scores["confusion"]
+    return additive_totals(family, columns), confusions
+
+
+def _summarize(family, totals, confusions, tag_names, cutoff_len):
+    # Corpus summary of a family from its running totals
+    if family == "dependency":
+        return summarize_totals(family, totals)
+    if family == "aligned":
+        return summarize_aligned_counts(totals)
+    if family == "constituency":
+        cutoff = {key[len(CUTOFF_PREFIX):]: value for key, value in totals.items() if key.startswith(CUTOFF_PREFIX)}
+        all_totals = {key: value for key, value in totals.items() if not key.startswith(CUTOFF_PREFIX)}
+        return with_cutoff_summary(summarize_constituency_totals(all_totals), summarize_constituency_totals(cutoff),
+                                   cutoff_len)
+
+    merged = {"summary": summarize_totals(family, totals)}
+    for tag_type in TAG_COLUMNS:
+        merged[f"{tag_type}_corpus"] = summarize_confusion(_grow(confusions[tag_type], len(tag_names)), tag_names)
+    return merged
+
+
+def evaluate_streaming(gold_path, parser_paths, families=METRIC_FAMILIES, window_size=DEFAULT_WINDOW_SIZE,
+                       window_tokens=DEFAULT_WINDOW_TOKENS, gold_trees_path=None, evalb_params=None, max_rss_mb=None):
+    """
+    Scores parsers against a gold standard in bounded memory, for corpora larger than RAM.
+
+    The files are walked in lockstep (see `iter_windows`); each window is turned into
+    small columnar corpora, scored, and reduced to additive totals before the next one
+    is read. Nothing per sentence is kept, so memory depends on the window size and
+    not on the corpus size, and the summaries equal those of `evaluation.evaluate`.
+    Constituency scoring covers all sentences, as `evaluate` does; POS/UPOS adds the
+    corpus accuracy of `evaluation.incremental` to the sentence averages.
+
+    Args:
+        gold_path (str): Gold standard file.
+        parser_paths (dict): Parser name to output file.
+        families (iterable): Metric families to compute, see METRIC_FAMILIES.
+        window_size (int): Maximum sentences per window.
+        window_tokens (int): Tag tokens per window, over all files, that close a window early.
+        gold_trees_path (str): One-tree-per-line gold file for constituency scoring
+            (default: the trees of the gold standard blocks).
+        evalb_params (dict): EVALB parameters (default: EVALB_DEFAULTS).
+        max_rss_mb (float): Memory ceiling; MemoryError is raised once the peak resident
+            set size exceeds it (default: no ceiling).
+
+    Returns:
+        dict: Parser name to metric family to 'totals' and 'summary' (plus the corpus
+              confusion scores for POS/UPOS).
+        dict: 'sentences', 'windows' and 'peak_rss_bytes' of the run.
+    """
+    families = tuple(families)
+    evalb_params = evalb_params or EVALB_DEFAULTS
+    totals = {name: {family: {} for family in families} for name in parser_paths}
+    confusions = {name: {tag_type: np.zeros((0, 0), dtype=np.int64) for tag_type in TAG_COLUMNS}
+                  for name in parser_paths}
+    # One tag vocabulary across windows keeps the confusion matrices addable
+    tag_ids = {}
+    sentences = windows = 0
+
+    for start, gold_records, parser_records, gold_trees in iter_windows(gold_path, parser_paths, window_size,
+                                                                         window_tokens, gold_trees_path):
+        with tracer.stage("streaming_window", start=start) as stage:
+            gold = build_corpus(gold_records)
+            for name, records in parser_records.items():
+                pred = build_corpus(records)
+                for family in families:
+                    window_totals = _score_window(gold, pred, family, gold_trees, tag_ids, evalb_params)
+                    if family == "pos_upos":
+                        window_totals, window_confusions = window_totals
+                        for tag_type, confusion in window_confusions.items():
+                            size = max(len(confusion), len(confusions[name][tag_type]))
+                            confusions[name][tag_type] = _grow(confusions[name][tag_type], size) + _grow(confusion, size)
+                    _add(totals[name][family], window_totals)
+            stage.count(sentences=len(gold_records), tokens=len(gold.columns["tag_upos"]))
+
+        sentences += len(gold_records)
+        windows += 1
+        peak = peak_rss_bytes()
+        if max_rss_mb is not None and peak is not None and peak > max_rss_mb * 2 ** 20:
+            raise MemoryError(f"Peak memory {peak / 2 ** 20:.0f} MB exceeds the {max_rss_mb} MB ceiling "
+                              f"after {sentences} sentences; use a smaller window")
+
+    results = {name: {} for name in parser_paths}
+    tag_names = list(tag_ids)
+    for name, parser_totals in totals.items():
+        for family, family_totals in parser_totals.items():
+            summary = _summarize(family, family_totals, confusions[name], tag_names, evalb_params["CUTOFF_LEN"])
+            results[name][family] = {"totals": family_totals, **(summary if family == "pos_upos" else
+                                                                 {"summary": summary})}
+    return results, {"sentences": sentences, "windows": windows, "peak_rss_bytes": peak_rss_bytes()}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Score parsers in bounded memory, one window of sentences "
+                                                     "at a time.")
+    arg_parser.add_argument("--gold", default="data/gold_standard.txt")
+    arg_parser.add_argument("--gold-trees", default=None, help="One-tree-per-line gold file for constituency")
+    arg_parser.add_argument("--metrics", nargs="+", choices=METRIC_FAMILIES, default=list(METRIC_FAMILIES))
+    arg_parser.add_argument("--window-size", type=int, default=DEFAULT_WINDOW_SIZE, help="Sentences per window")
+    arg_parser.add_argument("--window-tokens", type=int, default=DEFAULT_WINDOW_TOKENS,
+                            help="Tag tokens per window, over all files, that close a window early")
+    arg_parser.add_argument("--max-rss-mb", type=float, default=None, help="Abort above this peak memory")
+    args = arg_parser.parse_args()
+
+    results, run = evaluate_streaming(args.gold, DEFAULT_PARSERS, args.metrics, args.window_size,
+                                      args.window_tokens, args.gold_trees, max_rss_mb=args.max_rss_mb)
+    for name, families in results.items():
+        print(f"\n{name} Parser Summary:")
+        for family, merged in families.items():
+            print(f"  {family}:")
+            for key, value in merged["summary"].items():
+                print(f"    {key}: {value}")
+    peak = run["peak_rss_bytes"]
+    print(f"\n{run['sentences']} sentences in {run['windows']} windows"
+          + (f", peak memory {peak / 2 ** 20:.0f} MB" if peak else ""))
@@ -0,0 +1,151 @@
+package com.example;
+
+import edu.stanford.nlp.pipeline.*;
+import edu.stanford.nlp.ling.*;
+import edu.stanford.nlp.semgraph.*;
+import edu.stanford.nlp.trees.*;
+import edu.stanford.nlp.util.CoreMap;
+
+import java.io.*;
+import java.nio.charset.StandardCharsets;
+import java.util.*;
+
+/**
+ * Long-running CoreNLP worker driven over stdin/stdout.
+ *
+ * Protocol: the client writes one "N<TAB>sentence" line per sentence and an empty line to close a batch.
+ * The worker annotates the whole batch as one multi-sentence document, one input sentence per line, with the
+ * sentence-level annotators running on CoreNLP's own thread pool. It writes one block per sentence in the
+ * "N. sentence" format, in input order, followed by a line holding only END. The worker exits at EOF,
+ * so the JVM and the models are loaded once for any number of batches.
+ */
+public class CoreNLPWorker {
+    public static final String END_OF_BATCH = "END";
+
+    // One dependency row of the block format
+    private static class DependencyRow {
+        final int index;
+        final String word;
+        final String relation;
+        final int head;
+
+        DependencyRow(int index, String word, String relation, int head) {
+            this.index = index;
+            this.word = word;
+            this.relation = relation;
+            this.head = head;
+        }
+    }
+
+    public static Properties defaultProperties(int threads) {
+        Properties props = new Properties();
+        props.setProperty("annotators", "tokenize,ssplit,pos,lemma,parse,depparse");
+        props.setProperty("ssplit.eolonly", "true"); // Each line of a batch document is one sentence
+        props.setProperty("parse.maxlen", "120");
+        props.setProperty("pos.confidence", "1.0");
+        // Threads of the sentence-level annotators (pos, parse, depparse) within one document
+        props.setProperty("nthreads", String.valueOf(threads));
+        props.setProperty("threads", String.valueOf(threads));
+        return props;
+    }
+
+    /**
+     * Annotates a batch of sentences as one multi-sentence document, one sentence per line.
+     *
+     * Sentences are only split at line ends, so the document's sentences line up with the input lines.
+     */
+    public static List<CoreMap> annotateBatch(StanfordCoreNLP pipeline, List<String> texts) {
+        Annotation document = new Annotation(String.join("\n", texts));
+        pipeline.annotate(document);
+        List<CoreMap> sentences = document.get(CoreAnnotations.SentencesAnnotation.class);
+        if (sentences.size() != texts.size()) {
+            throw new IllegalStateException("Annotated " + sentences.size() + " sentences for a batch of "
+                    + texts.size() + " lines");
+        }
+        return sentences;
+    }
+
+    /**
+     * Formats an annotated sentence as a block: header, tags, tree and dependency rows.
+     */
+    public static String formatBlock(int number, String text, CoreMap sentence) {
+        StringBuilder block = new StringBuilder();
+        block.append(number).append(". ").append(text).append('\n');
+
+        Tree parseTree = sentence.get(TreeCoreAnnotations.TreeAnnotation.class);
+
+        // Tokens & tags: word\lemma\UPOS\XPOS, UPOS mapped from the Penn tags of the tree
+        List<CoreLabel> tokens = sentence.get(CoreAnnotations.TokensAnnotation.class);
+        List<Label> uposTags = UniversalPOSMapper.mapTree(parseTree).preTerminalYield();
+        List<String> tagFields = new ArrayList<>();
+        for (int i = 0; i < tokens.size(); i++) {
+            CoreLabel token = tokens.get(i);
+            String upos = i < uposTags.size() ? uposTags.get(i).value() : token.tag();
+            tagFields.add(token.word() + "\\" + token.lemma() + "\\" + upos + "\\" + token.tag());
+        }
+        block.append(String.join("\t", tagFields)).append('\n');
+
+        // Parse Tree
+        block.append(parseTree.pennString().replace(System.lineSeparator(), "\n"));
+
+        // Dependency parsing: the root rows, then one row per edge
+        SemanticGraph dependencies = sentence.get(SemanticGraphCoreAnnotations.BasicDependenciesAnnotation.class);
+        List<DependencyRow> rows = new ArrayList<>();
+        for (IndexedWord root : dependencies.getRoots()) {
+            rows.add(new DependencyRow(root.index(), root.word(), "ROOT", 0));
+        }
+        for (SemanticGraphEdge edge : dependencies.edgeIterable()) {
+            rows.add(new DependencyRow(edge.getDependent().index(), edge.getDependent().word(),
+                    edge.getRelation().toString(), edge.getGovernor().index()));
+        }
+
+        // Sort all dependencies by the index of the dependent word
+        rows.sort(Comparator.comparingInt(row -> row.index));
+        for (DependencyRow row : rows) {
+            block.append(row.index).append('\t').append(row.word).append('\t')
+                    .append(row.relation).append('\t').append(row.head).append('\n');
+        }
+        return block.append('\n').toString();
+    }
+
+    private static void writeBatch(StanfordCoreNLP pipeline, List<Integer> numbers, List<String> texts,
+                                   PrintWriter out) {
+        List<CoreMap> sentences = annotateBatch(pipeline, texts);
+        for (int i = 0; i < sentences.size(); i++) {
+            out.print(formatBlock(numbers.get(i), texts.get(i), sentences.get(i)));
+        }
+        out.print(END_OF_BATCH + "\n");
+        out.flush();
+    }
+
+    public static void main(String[] args) throws IOException {
+        int threads = args.length > 0 ? Integer.parseInt(args[0]) : Runtime.getRuntime().availableProcessors();
+
+        // Keep stdout for the protocol; anything else printed goes to stderr
+        PrintWriter out = new PrintWriter(new BufferedWriter(new OutputStreamWriter(System.out, StandardCharsets.UTF_8)));
+        System.setOut(System.err);
+
+        StanfordCoreNLP pipeline = new StanfordCoreNLP(defaultProperties(threads));
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+
+        List<Integer> numbers = new ArrayList<>();
+        List<String> texts = new ArrayList<>();
+        String line;
+        while ((line = in.readLine()) != null) {
+            if (line.isEmpty()) {
+                // An empty line closes the current batch
+                writeBatch(pipeline, numbers, texts, out);
+                numbers.clear();
+                texts.clear();
+                continue;
+            }
+            int tab = line.indexOf('\t');
+            numbers.add(Integer.parseInt(line.substring(0, tab)));
+            texts.add(line.substring(tab + 1));
+        }
+
+        if (!texts.isEmpty()) {
+            writeBatch(pipeline, numbers, texts, out);
+        }
+    }
+}
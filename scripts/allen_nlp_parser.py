@@ -1,15 +1,19 @@
-from allennlp.predictors.predictor import Predictor
-from allennlp_models import pretrained
-import spacy
-from nltk import Tree
+from scripts.constituency_tree import parse_tree
+from scripts.model_registry import load_allen_predictor, load_spacy, registry, spacy_version
+from scripts.parser_runner import OUTPUTS, run_from_arguments, runner_arguments
 
-# Load SpaCy and AllenNLP models
-nlp = spacy.load("en_core_web_sm")  # Load SpaCy's small English model for tokenization and POS tagging
+# SpaCy's small English model for tokenization and POS tagging
+registry.register("en_core_web_sm", lambda: load_spacy("en_core_web_sm"))
 
-# Load pretrained AllenNLP models for coreference resolution, constituency parsing, and dependency parsing
-coref_predictor = pretrained.load_predictor("coref-spanbert")  # Coreference resolution model
-constituency_predictor = pretrained.load_predictor("structured-prediction-constituency-parser")  # Constituency parser
-dependency_predictor = pretrained.load_predictor("structured-prediction-biaffine-parser")  # Dependency parser
+# Pretrained AllenNLP models for constituency parsing and dependency parsing, loaded on first use
+registry.register("allen_constituency", lambda: load_allen_predictor("structured-prediction-constituency-parser"))
+registry.register("allen_dependency", lambda: load_allen_predictor("structured-prediction-biaffine-parser"))
+
+
+def model_id(outputs=OUTPUTS):
+    # Identifies the models in the parse cache; changes with the spaCy model version
+    return (f"structured-prediction-constituency-parser/structured-prediction-biaffine-parser/"
+            f"en_core_web_sm-{spacy_version('en_core_web_sm')}/{'+'.join(sorted(outputs))}")
 
 
 def format_constituency_tree(tree_str):
@@ -22,55 +26,59 @@ def format_constituency_tree(tree_str):
     Returns:
         str: A properly indented and readable format of the tree.
     """
-    # Parse the tree string into an NLTK Tree object
-    tree = Tree.fromstring(tree_str)
-    # Return the indented format of the tree
-    return tree.pformat()
-
-
-# Input sentences for processing
-sentences = [
-    "As she walked past it, the driver's glass started to open.",
-    "With a handkerchief she wiped the sweat from her forehead.",
-    "Prudently, they had diversified into banking and insurance, and as a result their influence was felt at the highest level.",
-    "The arranged marriage would be the social event of the following year.",
-    "When at last she spoke, her words were heavy and disjointed.",
-    "The road to the coast was busy with traffic in both directions.",
-    "The expected date came and went.",
-    "She sighed at the irony of it all, the waste of it all.",
-    "All through August the rain hardly stopped.",
-    "Thank the gods he didn't have to know of this."
-]
-
-# Output file to save results
-output_file = "data/allen_output.txt"
-
-# Open the output file for writing
-with open(output_file, "w", encoding="utf-8") as f:
-    for i, sentence in enumerate(sentences):
-        # Write the sentence number and text to the file
-        f.write(f"{i + 1}. {sentence}\n")
-
-        # Tokenization and POS tagging with SpaCy
-        doc = nlp(sentence)  # Tokenize the sentence and perform POS tagging
-        for token in doc:
-            # Write token, lemma, part of speech, and detailed tag to the file
-            f.write(
-                f"{token.text}\\{token.lemma_}\\{token.pos_}\\{token.tag_}\t"
-            )
-        f.write("\n")  # Newline for better separation
-
-        # Constituency parsing
-        constituency_result = constituency_predictor.predict(sentence=sentence)  # Predict the constituency tree
-        formatted_tree = format_constituency_tree(constituency_result["trees"])  # Format the tree
-        f.write(formatted_tree + "\n")  # Write the formatted tree to the file
-
-        # Dependency parsing
-        dependency_result = dependency_predictor.predict(sentence=sentence)  # Predict dependency structure
-        for idx, (word, head, rel) in enumerate(zip(dependency_result["words"], dependency_result["predicted_heads"],
-                                                    dependency_result["predicted_dependencies"])):
-            # Write dependency parsing results: token index, word, relation, and head index
-            f.write(f"{idx + 1}\t{word}\t{rel}\t{head}\n")
-        f.write("\n")  # Separate results for each sentence
-
-print(f"Improved results saved to {output_file}")
+    # Parse the tree string into an array-backed tree and indent it as NLTK's pformat does
+    return parse_tree(tree_str).pformat()
+
+
+def parse_batch(sentences, outputs=OUTPUTS):
+    """
+    Tags and parses a batch of sentences with batched spaCy and AllenNLP calls.
+
+    Args:
+        sentences (list): Sentence strings.
+        outputs (tuple): Sections to produce; predictors for the others are not loaded.
+
+    Returns:
+        list: (tokens_tags, constituency tree, dependency rows) per sentence.
+    """
+    inputs = [{"sentence": sentence} for sentence in sentences]
+
+    # Tokenization and POS tagging with SpaCy
+    docs = registry.get("en_core_web_sm").pipe(sentences, batch_size=len(sentences))
+
+    # Constituency and dependency parsing, one predictor call per batch
+    if "constituency" in outputs:
+        constituency_trees = [
+            format_constituency_tree(result["trees"])
+            for result in registry.get("allen_constituency").predict_batch_json(inputs)
+        ]
+    else:
+        constituency_trees = ["()"] * len(sentences)
+
+    if "dependency" in outputs:
+        dependency_results = registry.get("allen_dependency").predict_batch_json(inputs)
+    else:
+        dependency_results = [{"words": [], "predicted_heads": [], "predicted_dependencies": []}] * len(sentences)
+
+    results = []
+    for doc, formatted_tree, dependency_result in zip(docs, constituency_trees, dependency_results):
+        # Token, lemma, part of speech, and detailed tag
+        tokens_tags = [(token.text, token.lemma_, token.pos_, token.tag_) for token in doc]
+
+        # Dependency parsing results: token index, word, relation, and head index
+        dependencies = [
+            (idx + 1, word, rel, head)
+            for idx, (word, head, rel) in enumerate(zip(dependency_result["words"], dependency_result["predicted_heads"],
+                                                        dependency_result["predicted_dependencies"]))
+        ]
+        results.append((tokens_tags, formatted_tree, dependencies))
+    return results
+
+
+if __name__ == "__main__":
+    args = runner_arguments("Parse sentences with spaCy and AllenNLP.", "data/allen_output.txt").parse_args()
+
+    # Parse the input sentences in batches and save the formatted results to a file
+    run_from_arguments(lambda batch: parse_batch(batch, args.outputs), args, "allen", model_id(args.outputs))
+
+    print(f"Improved results saved to {args.output}")
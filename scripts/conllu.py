@@ -0,0 +1,155 @@
+import argparse
+import json
+
+from scripts.data_preprocess import clean_constituency_parse, iter_sentences, remove_outer_layer
+
+
+# Comment keys; the tree and (when needed) the tag tokens travel in comments
+TEXT_COMMENT = "text"
+SENT_ID_COMMENT = "sent_id"
+TREE_COMMENT = "constituency"
+TAGS_COMMENT = "tokens_tags"  # JSON, only when the tag line is tokenised unlike the dependency rows
+
+# CoNLL-U placeholder for an empty field
+EMPTY = "_"
+
+
+def _field(value):
+    # CoNLL-U fields cannot be empty or contain tabs and newlines
+    value = str(value).replace("\t", " ").replace("\n", " ")
+    return value if value else EMPTY
+
+
+def format_conllu(number, text, tokens_tags, tree, dependencies):
+    """
+    Formats one sentence as a CoNLL-U block.
+
+    Word lines come from the dependency rows, with lemma, UPOS and XPOS taken from
+    the tag tokens when both are tokenised alike; otherwise the tag tokens are kept
+    in a JSON comment so that no information is lost. A sentence without dependency
+    rows gets one word line per tag token and no heads.
+
+    Args:
+        number (int or str): Sentence number, written as `sent_id` ("12." becomes 12).
+        text (str): Sentence text.
+        tokens_tags (list): (text, lemma, upos, xpos) tuples.
+        tree (str): Bracketed constituency tree; written on one line, empty to omit.
+        dependencies (list): (index, word, relation, head) rows.
+
+    Returns:
+        str: The block, followed by a blank line.
+    """
+    tokens_tags = [tuple(str(field) for field in token) for token in tokens_tags]
+    dependencies = [tuple(str(field) for field in row) for row in dependencies]
+    aligned = all(len(token) == 4 for token in tokens_tags) and (
+        not dependencies
+        or (len(tokens_tags) == len(dependencies)
+            and all(token[0] == row[1] for token, row in zip(tokens_tags, dependencies)))
+    )
+
+    lines = [f"# {SENT_ID_COMMENT} = {str(number).rstrip('.')}", f"# {TEXT_COMMENT} = {text}"]
+    tree = clean_constituency_parse(tree).strip() if tree else ""
+    if tree:
+        lines.append(f"# {TREE_COMMENT} = {tree}")
+    if not aligned:
+        lines.append(f"# {TAGS_COMMENT} = {json.dumps(tokens_tags, ensure_ascii=False)}")
+
+    if dependencies:
+        for i, (index, word, relation, head) in enumerate(dependencies):
+            lemma, upos, xpos = tokens_tags[i][1:] if aligned else (EMPTY, EMPTY, EMPTY)
+            lines.append("\t".join(_field(value) for value in
+                                   (index, word, lemma, upos, xpos, EMPTY, head, relation, EMPTY, EMPTY)))
+    else:
+        for i, (word, lemma, upos, xpos) in enumerate(tokens_tags, start=1):
+            lines.append("\t".join(_field(value) for value in
+                                   (i, word, lemma, upos, xpos, EMPTY, EMPTY, EMPTY, EMPTY, EMPTY)))
+    return "\n".join(lines) + "\n\n"
+
+
+def iter_conllu(file_path):
+    """
+    Reads a CoNLL-U file line by line and yields one sentence record at a time.
+
+    Records have the layout of `iter_sentences`. Multiword token ranges and empty
+    nodes are skipped, so the records hold syntactic words only. The tree comes
+    from the `constituency` comment (empty when absent) with its outer TOP/ROOT
+    layer removed, as for the block format.
+
+    Args:
+        file_path (str): The path to the CoNLL-U file.
+
+    Yields:
+        dict: Sentence record with 'number', 'text', 'tokens_tags', 'constituency_parse'
+              and 'dependency_parse' keys.
+    """
+    comments, words = {}, []
+    count = 0
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line.startswith("#"):
+                key, separator, value = line[1:].partition("=")
+                if separator:
+                    comments[key.strip()] = value.strip()
+            elif line.strip():
+                fields = line.split("\t")
+                # "3-4" is a multiword token range and "3.1" an empty node
+                if fields[0].isdigit():
+                    words.append(fields)
+            elif comments or words:
+                count += 1
+                yield _build_record(comments, words, count)
+                comments, words = {}, []
+
+    # Flush the last sentence if the file does not end with a blank line
+    if comments or words:
+        yield _build_record(comments, words, count + 1)
+
+
+def _build_record(comments, words, count):
+    # Sentence record of one CoNLL-U block
+    if TAGS_COMMENT in comments:
+        tokens_tags = [tuple(token) for token in json.loads(comments[TAGS_COMMENT])]
+    else:
+        tokens_tags = [(fields[1], fields[2], fields[3], fields[4]) for fields in words]
+
+    tree = comments.get(TREE_COMMENT, "")
+    return {
+        "number": f"{comments.get(SENT_ID_COMMENT, count)}.",
+        "text": comments.get(TEXT_COMMENT, " ".join(fields[1] for fields in words)),
+        "tokens_tags": tokens_tags,
+        "constituency_parse": clean_constituency_parse(remove_outer_layer(tree)) if tree else "",
+        "dependency_parse": [[fields[0], fields[1], fields[7], fields[6]] for fields in words if fields[6] != EMPTY],
+    }
+
+
+def write_conllu(sentences, file_path):
+    """
+    Writes sentence records as CoNLL-U, one block at a time.
+
+    Args:
+        sentences (iterable): Records as produced by `iter_sentences`; empty records are skipped.
+        file_path (str): Output file.
+
+    Returns:
+        int: Number of sentences written.
+    """
+    written = 0
+    with open(file_path, "w", encoding="utf-8") as f:
+        for sentence in sentences:
+            if not sentence:
+                continue
+            f.write(format_conllu(sentence["number"], sentence["text"], sentence["tokens_tags"],
+                                  sentence["constituency_parse"], sentence["dependency_parse"]))
+            written += 1
+    return written
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Convert a parser output file to CoNLL-U.")
+    arg_parser.add_argument("input", help="File in the block format (or CoNLL-U)")
+    arg_parser.add_argument("output", help="CoNLL-U output file")
+    args = arg_parser.parse_args()
+
+    print(f"Wrote {write_conllu(iter_sentences(args.input), args.output)} sentences to {args.output}")
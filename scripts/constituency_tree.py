@@ -0,0 +1,342 @@
+import argparse
+import re
+from array import array
+
+import numpy as np
+
+
+# Opening bracket, closing bracket or any other run of non-space characters
+TOKEN_PATTERN = re.compile(r"\(|\)|[^\s()]+")
+
+# Root labels dropped by `strip_outer`, as `remove_outer_layer` does for strings
+OUTER_LABELS = ("TOP", "ROOT")
+
+# Node columns (one entry per bracket, in preorder) and the leaf column
+NODE_COLUMNS = ("parent", "label", "start", "end")
+LEAF_COLUMN = "leaf"
+
+# Margin of the indented format, as NLTK's Tree.pformat
+DEFAULT_MARGIN = 70
+
+
+class ConstituencyTree:
+    """
+    Array-backed constituency tree.
+
+    Brackets are nodes numbered in preorder, stored in parallel int32 arrays:
+    the parent node (-1 for a root), the interned label id and the span of leaves
+    [start, end) the node covers. Leaves are word ids in sentence order. Children
+    of a node are the nodes whose parent it is, in node order, interleaved by span
+    with the words directly below it; trees where a node mixes bare words and
+    sub-brackets, or with several roots, are represented as written.
+
+    Args:
+        columns (dict): Column name to int32 array, see NODE_COLUMNS and LEAF_COLUMN.
+        vocabularies (dict): 'labels' and 'words' lists of strings, indexed by id.
+    """
+
+    def __init__(self, columns, vocabularies):
+        self.columns = columns
+        self.vocabularies = vocabularies
+
+    def __len__(self):
+        return len(self.columns["parent"])
+
+    def __str__(self):
+        return self.to_string()
+
+    @property
+    def n_leaves(self):
+        return len(self.columns[LEAF_COLUMN])
+
+    def leaves(self):
+        """
+        Returns the words of the tree in sentence order.
+        """
+        words = self.vocabularies["words"]
+        return [words[i] for i in self.columns[LEAF_COLUMN].tolist()]
+
+    def labels(self):
+        """
+        Returns the label of every node, in preorder.
+        """
+        labels = self.vocabularies["labels"]
+        return [labels[i] for i in self.columns["label"].tolist()]
+
+    def spans(self):
+        """
+        Returns every node as a (label, start, end) span over leaf positions, end exclusive.
+        """
+        return list(zip(self.labels(), self.columns["start"].tolist(), self.columns["end"].tolist()))
+
+    def _children(self):
+        # Ordered children of every node, plus the forest level at index len(self):
+        # ('node', j) and ('leaf', position) items, merged by leaf position
+        parent, start, end = (self.columns[name].tolist() for name in ("parent", "start", "end"))
+        n = len(parent)
+        child_nodes = [[] for _ in range(n + 1)]
+        for node, p in enumerate(parent):
+            child_nodes[p if p >= 0 else n].append(node)
+
+        children = []
+        for node in range(n + 1):
+            cursor, last = (start[node], end[node]) if node < n else (0, self.n_leaves)
+            items = []
+            for child in child_nodes[node]:
+                items.extend(("leaf", position) for position in range(cursor, start[child]))
+                items.append(("node", child))
+                cursor = end[child]
+            items.extend(("leaf", position) for position in range(cursor, last))
+            children.append(items)
+        return children
+
+    def _render(self, canonical, margin=None):
+        # Writes the tree without recursion from a stack of pending strings and nodes.
+        # Flat nodes are "(label child child)"; with a margin, a node whose flat form
+        # does not fit is written as in NLTK's pformat, one indented child per line
+        labels, words = self.vocabularies["labels"], self.vocabularies["words"]
+        label_ids, leaf_ids = self.columns["label"].tolist(), self.columns[LEAF_COLUMN].tolist()
+        children = self._children()
+        n = len(label_ids)
+
+        def text(item):
+            kind, value = item
+            return words[leaf_ids[value]] if kind == "leaf" else None
+
+        flat_length = [0] * n
+        if margin is not None:
+            # Children come after their parent in preorder, so a reverse pass sees them first
+            for node in range(n - 1, -1, -1):
+                lengths = [len(text(item)) if item[0] == "leaf" else flat_length[item[1]] for item in children[node]]
+                flat_length[node] = 3 + len(labels[label_ids[node]]) + sum(lengths) + max(len(lengths) - 1, 0)
+
+        out = []
+        top_separator = "\n" if margin is not None else " "
+        stack = []
+        for i, item in enumerate(reversed(children[n])):
+            stack.append((item, 0, False))
+            if i < len(children[n]) - 1:
+                stack.append(top_separator)
+
+        while stack:
+            task = stack.pop()
+            if isinstance(task, str):
+                out.append(task)
+                continue
+            item, indent, flat = task
+            if item[0] == "leaf":
+                out.append(text(item))
+                continue
+
+            node = item[1]
+            label = labels[label_ids[node]]
+            items = children[node]
+            flat = flat or margin is None or flat_length[node] + indent < margin
+            if flat:
+                # Canonical strings have no space after an empty label or before a closing bracket
+                separator = " " if not canonical or (label and items) else ""
+                pending = [f"({label}{separator}"]
+                for i, child in enumerate(items):
+                    if i:
+                        pending.append(" ")
+                    pending.append((child, indent, True))
+            else:
+                pending = [f"({label}"]
+                for child in items:
+                    pending.append("\n" + " " * (indent + 2))
+                    pending.append((child, indent + 2, False))
+            pending.append(")")
+            stack.extend(reversed(pending))
+        return "".join(out)
+
+    def to_string(self):
+        """
+        Writes the tree on one line in canonical form: "(S (NP (DT The) (NN dog)) (VP (VBZ runs)))".
+
+        Single spaces separate children, with none after an opening bracket or
+        before a closing one, which is the form `clean_constituency_parse` produces.
+        """
+        return self._render(canonical=True)
+
+    def pformat(self, margin=DEFAULT_MARGIN):
+        """
+        Writes the tree indented, in the layout of NLTK's Tree.pformat.
+
+        Args:
+            margin (int): A subtree whose flat form, plus its indentation, is shorter stays on one line.
+
+        Returns:
+            str: The indented tree (trees of a forest on separate lines).
+        """
+        return self._render(canonical=False, margin=margin)
+
+
+def _new_buffers():
+    # Growable int32 buffers for the node and leaf columns
+    return {name: array("i") for name in (*NODE_COLUMNS, LEAF_COLUMN)}
+
+
+def scan_tree(text, ids, strip_outer=False):
+    """
+    Reads the nodes and leaves of one bracketed tree in a single, non-recursive pass.
+
+    Args:
+        text (str): Bracketed constituency parse, on one line or several.
+        ids (dict): 'labels' and 'words' string to id mappings; new strings are added in place.
+        strip_outer (bool): Drop an outermost TOP or ROOT bracket.
+
+    Returns:
+        tuple: Lists of the node parents, label ids, span starts and span ends, in
+               preorder, and the word ids of the leaves.
+
+    Raises:
+        ValueError: If the brackets are unbalanced.
+    """
+    labels, words = ids["labels"], ids["words"]
+    parent, label, start, end, leaf = [], [], [], [], []
+    stack = []
+    expect_label = False
+
+    for token in TOKEN_PATTERN.findall(text):
+        if token == "(":
+            parent.append(stack[-1] if stack else -1)
+            label.append(-1)  # Set by the label token, or to "" when the bracket closes without one
+            start.append(len(leaf))
+            end.append(-1)
+            stack.append(len(parent) - 1)
+            expect_label = True
+        elif token == ")":
+            if not stack:
+                raise ValueError(f"Unbalanced brackets in tree: {text}")
+            node = stack.pop()
+            end[node] = len(leaf)
+            if label[node] < 0:
+                label[node] = labels.setdefault("", len(labels))
+            expect_label = False
+        elif expect_label:
+            label[-1] = labels.setdefault(token, len(labels))
+            expect_label = False
+        else:
+            leaf.append(words.setdefault(token, len(words)))
+    if stack:
+        raise ValueError(f"Unbalanced brackets in tree: {text}")
+
+    outer_ids = {labels.get(outer) for outer in OUTER_LABELS}
+    if strip_outer and parent.count(-1) == 1 and label[0] in outer_ids and (len(parent) > 1 or leaf):
+        # Drop the TOP/ROOT bracket; its children become roots
+        parent = [p - 1 for p in parent[1:]]
+        label, start, end = label[1:], start[1:], end[1:]
+    return parent, label, start, end, leaf
+
+
+def _scan(text, ids, buffers, strip_outer):
+    # Appends one tree to the buffers; they are only extended once the whole tree has been read
+    for name, values in zip((*NODE_COLUMNS, LEAF_COLUMN), scan_tree(text, ids, strip_outer)):
+        buffers[name].extend(values)
+
+
+def _columns(buffers):
+    # int32 arrays over the buffers, without copying
+    return {name: np.frombuffer(buffer, dtype=np.int32) if len(buffer) else np.zeros(0, dtype=np.int32)
+            for name, buffer in buffers.items()}
+
+
+def parse_tree(text, strip_outer=False):
+    """
+    Parses a bracketed tree, on one line or indented over several, without recursion.
+
+    Args:
+        text (str): Bracketed constituency parse.
+        strip_outer (bool): Drop an outermost TOP or ROOT bracket.
+
+    Returns:
+        ConstituencyTree: The tree, with its own vocabularies.
+
+    Raises:
+        ValueError: If the brackets are unbalanced.
+    """
+    ids = {"labels": {}, "words": {}}
+    buffers = _new_buffers()
+    _scan(text, ids, buffers, strip_outer)
+    return ConstituencyTree(_columns(buffers), {name: list(vocabulary) for name, vocabulary in ids.items()})
+
+
+class Treebank:
+    """
+    Constituency trees of a whole corpus in flat int32 columns.
+
+    The node and leaf columns of all trees are concatenated, with per-tree offsets
+    marking where each tree starts, and labels and words are interned once for the
+    corpus, as in `ColumnarCorpus`. A tree costs 16 bytes per node and 4 per word.
+
+    Args:
+        columns (dict): Node and leaf columns, 'node_offsets', 'leaf_offsets' and 'valid'.
+        vocabularies (dict): 'labels' and 'words' lists of strings, indexed by id.
+    """
+
+    def __init__(self, columns, vocabularies):
+        self.columns = columns
+        self.vocabularies = vocabularies
+
+    def __len__(self):
+        return len(self.columns["valid"])
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def tree(self, i):
+        """
+        Returns tree i as a ConstituencyTree sharing the treebank's arrays (empty if it was unbalanced).
+        """
+        nodes = slice(*self.columns["node_offsets"][i:i + 2])
+        leaves = slice(*self.columns["leaf_offsets"][i:i + 2])
+        columns = {name: self.columns[name][nodes] for name in NODE_COLUMNS}
+        columns[LEAF_COLUMN] = self.columns[LEAF_COLUMN][leaves]
+        return ConstituencyTree(columns, self.vocabularies)
+
+
+def build_treebank(trees, strip_outer=False):
+    """
+    Parses bracketed trees into a Treebank in a single pass.
+
+    Args:
+        trees (iterable): Bracketed trees, e.g. `corpus.tree(i)` for every sentence.
+        strip_outer (bool): Drop an outermost TOP or ROOT bracket of every tree.
+
+    Returns:
+        Treebank: The trees; unbalanced ones are kept empty and marked invalid.
+    """
+    ids = {"labels": {}, "words": {}}
+    buffers = _new_buffers()
+    offsets = {"node_offsets": array("q", [0]), "leaf_offsets": array("q", [0]), "valid": array("B")}
+    for text in trees:
+        try:
+            _scan(text, ids, buffers, strip_outer)
+            offsets["valid"].append(1)
+        except ValueError:
+            offsets["valid"].append(0)
+        offsets["node_offsets"].append(len(buffers["parent"]))
+        offsets["leaf_offsets"].append(len(buffers[LEAF_COLUMN]))
+
+    columns = _columns(buffers)
+    columns["node_offsets"] = np.array(offsets["node_offsets"], dtype=np.int64)
+    columns["leaf_offsets"] = np.array(offsets["leaf_offsets"], dtype=np.int64)
+    columns["valid"] = np.array(offsets["valid"], dtype=np.uint8)
+    return Treebank(columns, {name: list(vocabulary) for name, vocabulary in ids.items()})
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Parse the trees of a parser output file into a treebank "
+                                                     "and print them in canonical or indented form.")
+    arg_parser.add_argument("input", help="Parser output file (block format or CoNLL-U)")
+    arg_parser.add_argument("--indent", action="store_true", help="Print indented trees instead of one per line")
+    args = arg_parser.parse_args()
+
+    from scripts.corpus_store import load_corpus
+    corpus = load_corpus(args.input)
+    treebank = build_treebank(corpus.tree(i) for i in range(len(corpus)))
+    for i in range(len(treebank)):
+        tree = treebank.tree(i)
+        print(tree.pformat() if args.indent else tree.to_string())
+    print(f"{len(treebank)} trees, {treebank.nbytes} bytes of arrays")
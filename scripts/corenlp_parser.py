@@ -0,0 +1,146 @@
+import atexit
+import os
+import shlex
+import subprocess
+
+from scripts.data_preprocess import DEPENDENCY_PATTERN
+from scripts.model_registry import registry
+from scripts.parser_runner import run_from_arguments, runner_arguments
+
+# Annotators of the Java worker (CoreNLPWorker.defaultProperties) and the CoreNLP version of pom.xml
+CORENLP_MODEL = "corenlp-4.5.7/tokenize,ssplit,pos,lemma,parse,depparse"
+
+# Starts the persistent worker through Maven; the argument is the number of annotation threads
+WORKER_COMMAND = "mvn -q exec:java -Dexec.mainClass=com.example.CoreNLPWorker -Dexec.args={threads}"
+
+# Annotation threads when no thread cap is set in the environment
+DEFAULT_WORKER_THREADS = 4
+
+# Thread cap set by the orchestrator and the benchmark harness for every parser
+THREADS_ENV = "OMP_NUM_THREADS"
+WORKER_DIRECTORY = "java_core_nlp"
+
+# Line written by the worker after the last block of a batch
+END_OF_BATCH = "END"
+
+
+class CoreNLPWorkerClient:
+    """
+    Talks to a long-running CoreNLPWorker process over its stdin/stdout.
+
+    The JVM and the CoreNLP models are loaded once when the process starts; every
+    batch after that only pays for annotation. A batch is written as "N<TAB>sentence"
+    lines closed by an empty line, and read back as blocks up to the END line.
+    """
+
+    def __init__(self, command=WORKER_COMMAND, cwd=WORKER_DIRECTORY):
+        if isinstance(command, str):
+            command = command.format(threads=os.environ.get(THREADS_ENV) or DEFAULT_WORKER_THREADS)
+        self.process = subprocess.Popen(
+            shlex.split(command) if isinstance(command, str) else command,
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+
+    def annotate(self, sentences):
+        """
+        Annotates a batch of sentences.
+
+        Args:
+            sentences (list): Sentence strings, one sentence each.
+
+        Returns:
+            list: The block text of each sentence, in input order.
+        """
+        # Newlines would break the line protocol; the worker treats each line as one sentence
+        request = "".join(f"{i}\t{' '.join(sentence.split())}\n" for i, sentence in enumerate(sentences, 1))
+        self.process.stdin.write(request + "\n")
+        self.process.stdin.flush()
+
+        blocks, lines = [], []
+        for line in self.process.stdout:
+            if line.rstrip("\n") == END_OF_BATCH:
+                break
+            if line.strip():
+                lines.append(line)
+            elif lines:
+                blocks.append("".join(lines))
+                lines = []
+        else:
+            raise RuntimeError(f"CoreNLP worker exited with code {self.process.wait()}")
+
+        if len(blocks) != len(sentences):
+            raise RuntimeError(f"CoreNLP worker returned {len(blocks)} blocks for {len(sentences)} sentences")
+        return blocks
+
+    def close(self):
+        """
+        Closes the worker's input and waits for it to exit.
+        """
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait()
+
+
+def start_worker(command=WORKER_COMMAND, cwd=WORKER_DIRECTORY):
+    """
+    Starts a worker process that is shut down when the interpreter exits.
+    """
+    client = CoreNLPWorkerClient(command, cwd)
+    atexit.register(client.close)
+    return client
+
+
+# The worker is started on first use and kept running for later batches
+registry.register("corenlp_worker", start_worker)
+
+
+def parse_block(block):
+    """
+    Splits a block written by the worker into its sections.
+
+    Args:
+        block (str): "N. sentence" header, tag line, tree lines and dependency rows.
+
+    Returns:
+        tuple: (tokens_tags, constituency tree, dependency rows).
+    """
+    lines = block.rstrip("\n").split("\n")
+    tokens_tags = [tuple(token.split("\\")) for token in lines[1].split("\t") if token]
+
+    # The tree runs up to the first dependency row
+    tree_end = next((i for i in range(2, len(lines)) if DEPENDENCY_PATTERN.match(lines[i])), len(lines))
+    tree = "\n".join(lines[2:tree_end])
+    dependencies = [lines[i].split("\t") for i in range(tree_end, len(lines))]
+    return tokens_tags, tree, dependencies
+
+
+def parse_batch(sentences):
+    """
+    Parses a batch of sentences with the persistent CoreNLP worker.
+
+    Args:
+        sentences (list): Sentence strings.
+
+    Returns:
+        list: (tokens_tags, constituency tree, dependency rows) per sentence.
+    """
+    return [parse_block(block) for block in registry.get("corenlp_worker").annotate(sentences)]
+
+
+if __name__ == "__main__":
+    arg_parser = runner_arguments("Parse sentences with a persistent CoreNLP worker.", "data/corenlp_output.txt")
+    arg_parser.add_argument("--worker-command", default=WORKER_COMMAND,
+                            help="Command that starts CoreNLPWorker ({threads} is replaced by the thread count)")
+    args = arg_parser.parse_args()
+
+    registry.register("corenlp_worker", lambda: start_worker(args.worker_command))
+
+    # Parse the input sentences in batches and save the formatted results to a file
+    run_from_arguments(parse_batch, args, "corenlp", CORENLP_MODEL)
+
+    print(f"Parsing completed. Results saved to {args.output}")
@@ -0,0 +1,357 @@
+import hashlib
+import json
+import os
+import shutil
+from array import array
+
+import numpy as np
+
+from scripts.data_preprocess import iter_sentences
+from scripts.instrumentation import tracer
+
+
+# Bump whenever the on-disk layout changes so stale caches are ignored
+CACHE_FORMAT_VERSION = 1
+
+# Integer columns written as one .npy file each
+COLUMN_DTYPES = {
+    'valid': np.uint8,  # 0 for blocks the reader could not parse
+    'number': np.int32,  # Sentence number from the "N." header
+    'text_offsets': np.int64,  # Byte offsets into text_bytes
+    'text_bytes': np.uint8,  # UTF-8 sentence texts, concatenated
+    'tree_offsets': np.int64,  # Byte offsets into tree_bytes
+    'tree_bytes': np.uint8,  # UTF-8 constituency parses, concatenated
+    'tag_offsets': np.int64,  # Token offsets of each sentence in the tag columns
+    'tag_form': np.int32,  # Word form id
+    'tag_lemma': np.int32,  # Lemma id (same vocabulary as word forms)
+    'tag_upos': np.int32,  # UPOS tag id
+    'tag_pos': np.int32,  # Language-specific POS tag id
+    'tag_arity': np.uint8,  # Number of backslash-separated fields of the token
+    'dep_offsets': np.int64,  # Row offsets of each sentence in the dependency columns
+    'dep_index': np.int32,  # Dependent index
+    'dep_form': np.int32,  # Dependent word form id
+    'dep_label': np.int32,  # Relation label id
+    'dep_head': np.int32,  # Head index (0 for the root)
+}
+
+
+class ColumnarCorpus:
+    """
+    Array-backed view of a parser output file.
+
+    Tokens and dependency rows of all sentences are stored in flat integer columns,
+    with per-sentence offsets marking where each sentence starts. Strings are interned
+    into three vocabularies ('forms', 'tags' and 'labels'), so every column is a plain
+    NumPy array that can be memory-mapped from the on-disk cache.
+
+    Args:
+        columns (dict): Column name to NumPy array, see COLUMN_DTYPES.
+        vocabularies (dict): Vocabulary name to list of strings, indexed by id.
+    """
+
+    def __init__(self, columns, vocabularies):
+        self.columns = columns
+        self.vocabularies = vocabularies
+
+    def __len__(self):
+        return len(self.columns['valid'])
+
+    @property
+    def dep_offsets(self):
+        return self.columns['dep_offsets']
+
+    @property
+    def heads(self):
+        return self.columns['dep_head']
+
+    @property
+    def labels(self):
+        return self.columns['dep_label']
+
+    @property
+    def tag_offsets(self):
+        return self.columns['tag_offsets']
+
+    def text(self, i):
+        """
+        Returns the text of sentence i ('' for an unparsable block).
+        """
+        return _decode(self.columns['text_bytes'], self.columns['text_offsets'], i)
+
+    def tree(self, i):
+        """
+        Returns the cleaned constituency parse of sentence i.
+        """
+        return _decode(self.columns['tree_bytes'], self.columns['tree_offsets'], i)
+
+    def slice(self, start, end):
+        """
+        Returns the sentences [start, end) as a corpus sharing this corpus' buffers.
+
+        Args:
+            start (int): First sentence position.
+            end (int): Position after the last sentence.
+
+        Returns:
+            ColumnarCorpus: View over the sentence range, with rebased offsets.
+        """
+        end = min(end, len(self))
+        columns = {'valid': self.columns['valid'][start:end], 'number': self.columns['number'][start:end]}
+
+        # Each offsets column indexes a group of data columns
+        groups = {
+            'text_offsets': ('text_bytes',),
+            'tree_offsets': ('tree_bytes',),
+            'tag_offsets': ('tag_form', 'tag_lemma', 'tag_upos', 'tag_pos', 'tag_arity'),
+            'dep_offsets': ('dep_index', 'dep_form', 'dep_label', 'dep_head'),
+        }
+        for offsets_name, data_names in groups.items():
+            offsets = self.columns[offsets_name][start:end + 1]
+            columns[offsets_name] = np.asarray(offsets) - offsets[0]
+            for name in data_names:
+                columns[name] = self.columns[name][offsets[0]:offsets[-1]]
+        return ColumnarCorpus(columns, self.vocabularies)
+
+    def record(self, i):
+        """
+        Rebuilds the `load_sentences` record of sentence i.
+
+        Args:
+            i (int): Sentence position in the corpus.
+
+        Returns:
+            dict: Sentence record, or an empty dict for an unparsable block.
+        """
+        columns = self.columns
+        if not columns['valid'][i]:
+            return {}
+
+        forms = self.vocabularies['forms']
+        tags = self.vocabularies['tags']
+        labels = self.vocabularies['labels']
+
+        tokens_tags = []
+        for t in range(columns['tag_offsets'][i], columns['tag_offsets'][i + 1]):
+            fields = (forms[columns['tag_form'][t]], forms[columns['tag_lemma'][t]],
+                      tags[columns['tag_upos'][t]], tags[columns['tag_pos'][t]])
+            # Re-splitting restores tokens that did not have exactly four fields
+            tokens_tags.append(tuple('\\'.join(fields[:columns['tag_arity'][t]]).split('\\')))
+
+        dependency_parse = [
+            [str(columns['dep_index'][d]), forms[columns['dep_form'][d]],
+             labels[columns['dep_label'][d]], str(columns['dep_head'][d])]
+            for d in range(columns['dep_offsets'][i], columns['dep_offsets'][i + 1])
+        ]
+
+        return {
+            'number': f"{columns['number'][i]}.",
+            'text': self.text(i),
+            'tokens_tags': tokens_tags,
+            'constituency_parse': self.tree(i),
+            'dependency_parse': dependency_parse,
+        }
+
+    def iter_records(self):
+        """
+        Yields the `load_sentences` record of every sentence in order.
+        """
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def to_records(self):
+        """
+        Returns the corpus as the list of records produced by `load_sentences`.
+        """
+        return list(self.iter_records())
+
+    def save(self, directory):
+        """
+        Writes the corpus to a cache directory, one .npy file per column.
+
+        The directory is written under a temporary name first and then moved into
+        place, so a concurrent reader never sees a partially written cache.
+
+        Args:
+            directory (str): Target cache directory.
+        """
+        tmp_directory = f"{directory}.tmp{os.getpid()}"
+        os.makedirs(tmp_directory, exist_ok=True)
+
+        for name, values in self.columns.items():
+            np.save(os.path.join(tmp_directory, f"{name}.npy"), np.ascontiguousarray(values))
+        with open(os.path.join(tmp_directory, 'vocabularies.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.vocabularies, f, ensure_ascii=False)
+
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        try:
+            os.replace(tmp_directory, directory)
+        except OSError:
+            # Another process filled the directory in the meantime (cache entries of the
+            # same source file are identical); keep its copy
+            if not os.path.isfile(os.path.join(directory, 'vocabularies.json')):
+                raise
+            shutil.rmtree(tmp_directory)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """
+        Loads a corpus written by `save`.
+
+        Args:
+            directory (str): Cache directory.
+            mmap (bool): Memory-map the columns instead of reading them into memory.
+
+        Returns:
+            ColumnarCorpus: The cached corpus.
+        """
+        mmap_mode = 'r' if mmap else None
+        columns = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in COLUMN_DTYPES
+        }
+        with open(os.path.join(directory, 'vocabularies.json'), 'r', encoding='utf-8') as f:
+            vocabularies = json.load(f)
+        return cls(columns, vocabularies)
+
+
+def build_corpus(sentences):
+    """
+    Converts sentence records into a ColumnarCorpus in a single pass.
+
+    Args:
+        sentences (iterable): Sentence records as produced by `iter_sentences`.
+
+    Returns:
+        ColumnarCorpus: The columnar corpus.
+    """
+    # Growable typed buffers; converted to NumPy arrays without copying at the end
+    buffers = {name: array(np.dtype(dtype).char) for name, dtype in COLUMN_DTYPES.items()}
+    for name in ('text_offsets', 'tree_offsets', 'tag_offsets', 'dep_offsets'):
+        buffers[name].append(0)
+    text_bytes = bytearray()
+    tree_bytes = bytearray()
+
+    vocabularies = {'forms': {}, 'tags': {}, 'labels': {}}
+    forms = vocabularies['forms']
+    tags = vocabularies['tags']
+    labels = vocabularies['labels']
+
+    for sentence in sentences:
+        if sentence:
+            buffers['valid'].append(1)
+            buffers['number'].append(int(sentence['number'].rstrip('.')))
+            text_bytes += sentence['text'].encode('utf-8')
+            tree_bytes += sentence['constituency_parse'].encode('utf-8')
+
+            for token in sentence['tokens_tags']:
+                # Pad short tokens and fold any extra fields into the last one
+                fields = list(token[:3]) + ['\\'.join(token[3:])]
+                fields += [''] * (4 - len(fields))
+                buffers['tag_form'].append(forms.setdefault(fields[0], len(forms)))
+                buffers['tag_lemma'].append(forms.setdefault(fields[1], len(forms)))
+                buffers['tag_upos'].append(tags.setdefault(fields[2], len(tags)))
+                buffers['tag_pos'].append(tags.setdefault(fields[3], len(tags)))
+                buffers['tag_arity'].append(min(len(token), 4))
+
+            for dep in sentence['dependency_parse']:
+                buffers['dep_index'].append(int(dep[0]))
+                buffers['dep_form'].append(forms.setdefault(dep[1], len(forms)))
+                buffers['dep_label'].append(labels.setdefault(dep[2], len(labels)))
+                buffers['dep_head'].append(int(dep[3]))
+        else:
+            buffers['valid'].append(0)
+            buffers['number'].append(0)
+
+        buffers['text_offsets'].append(len(text_bytes))
+        buffers['tree_offsets'].append(len(tree_bytes))
+        buffers['tag_offsets'].append(len(buffers['tag_form']))
+        buffers['dep_offsets'].append(len(buffers['dep_index']))
+
+    columns = {
+        name: np.frombuffer(buffer, dtype=COLUMN_DTYPES[name]) if len(buffer) else np.zeros(0, COLUMN_DTYPES[name])
+        for name, buffer in buffers.items()
+    }
+    columns['text_bytes'] = np.frombuffer(bytes(text_bytes), dtype=np.uint8)
+    columns['tree_bytes'] = np.frombuffer(bytes(tree_bytes), dtype=np.uint8)
+
+    # Vocabularies are stored as lists indexed by id
+    vocabularies = {name: list(vocab) for name, vocab in vocabularies.items()}
+    return ColumnarCorpus(columns, vocabularies)
+
+
+def as_corpus(sentences):
+    """
+    Returns a ColumnarCorpus for either a corpus or a list of sentence records.
+
+    Args:
+        sentences (list or ColumnarCorpus): Sentence records or an existing corpus.
+
+    Returns:
+        ColumnarCorpus: The columnar corpus.
+    """
+    if isinstance(sentences, ColumnarCorpus):
+        return sentences
+    return build_corpus(sentences)
+
+
+def file_hash(file_path, chunk_size=1 << 20):
+    """
+    Computes the SHA-256 digest of a file, reading it in fixed-size chunks.
+
+    Args:
+        file_path (str): The path to the file.
+        chunk_size (int): Number of bytes read at a time.
+
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_corpus(file_path, cache_dir=None):
+    """
+    Loads a parser output file as a ColumnarCorpus, using the binary cache when possible.
+
+    The cache entry is keyed by the hash of the source file, so an edited file is
+    parsed again while repeated runs over an unchanged file only memory-map the
+    cached columns.
+
+    Args:
+        file_path (str): The path to the parser output file.
+        cache_dir (str): Cache directory; defaults to `.corpus_cache` next to the file.
+            Pass False to disable caching.
+
+    Returns:
+        ColumnarCorpus: The columnar corpus.
+    """
+    with tracer.stage('load_corpus', file=file_path) as stage:
+        if cache_dir is False:
+            corpus = build_corpus(iter_sentences(file_path))
+            stage.count(cache='off')
+        else:
+            if cache_dir is None:
+                cache_dir = os.path.join(os.path.dirname(os.path.abspath(file_path)), '.corpus_cache')
+
+            entry = os.path.join(cache_dir, f"v{CACHE_FORMAT_VERSION}-{file_hash(file_path)}")
+            if os.path.isfile(os.path.join(entry, 'vocabularies.json')):
+                corpus = ColumnarCorpus.load(entry)
+                stage.count(cache='hit')
+            else:
+                corpus = build_corpus(iter_sentences(file_path))
+                os.makedirs(cache_dir, exist_ok=True)
+                corpus.save(entry)
+                stage.count(cache='miss')
+
+        if tracer.enabled:
+            stage.count(sentences=len(corpus), tokens=int(corpus.tag_offsets[-1]))
+    return corpus
+
+
+def _decode(blob, offsets, i):
+    # Slice one UTF-8 string out of a concatenated byte column
+    return bytes(blob[offsets[i]:offsets[i + 1]]).decode('utf-8')
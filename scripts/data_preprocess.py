@@ -1,38 +1,174 @@
 import re
 
+from scripts.instrumentation import tracer
+
+
+# Line patterns used by the block reader
+HEADER_PATTERN = re.compile(r'^(\d+\.)\s+(.*)$')  # "N. sentence text"
+DEPENDENCY_PATTERN = re.compile(r'^\d+\t')  # "index\tword\trelation\thead"
+
+# Reader states, one per section of a sentence block
+STATE_HEADER = 'header'
+STATE_TAGS = 'tags'
+STATE_TREE = 'tree'
+STATE_DEPENDENCIES = 'dependencies'
+
+# File extension read as CoNLL-U instead of the block format
+CONLLU_EXTENSION = '.conllu'
+
+
+def iter_sentences(file_path):
+    """
+    Reads a parser output file line by line and yields one sentence record at a time.
+
+    Files ending in `.conllu` are read as CoNLL-U (see `scripts.conllu`), anything
+    else as the "N. sentence" block format.
+
+    Args:
+        file_path (str): The path to the parser output file.
+
+    Yields:
+        dict: Sentence record with 'number', 'text', 'tokens_tags', 'constituency_parse'
+              and 'dependency_parse' keys, or an empty dict for an incomplete block.
+    """
+    if file_path.endswith(CONLLU_EXTENSION):
+        # Imported here because the CoNLL-U module reuses the tree helpers below
+        from scripts.conllu import iter_conllu
+        yield from iter_conllu(file_path)
+        return
+
+    for block in iter_raw_blocks(file_path):
+        yield build_sentence(block)
+
+
+def iter_raw_blocks(file_path):
+    """
+    Splits a parser output file into the raw lines of its sentence blocks.
+
+    Each block is made of a "N. sentence" header line, a tab-separated line of
+    backslash-joined token tags, a (possibly multi-line) bracketed constituency tree
+    and one tab-separated row per dependency. The sections are tracked with an
+    explicit state machine, so memory stays flat regardless of the file size and
+    numbers inside the sentence text (e.g. "12. ") never split a block.
+
+    Args:
+        file_path (str): The path to the parser output file.
+
+    Yields:
+        dict: Raw block with the header 'number' and 'text' and the 'tags', 'tree'
+              and 'dependencies' line lists; `build_sentence` turns it into a record.
+    """
+    state = STATE_HEADER
+    block = None
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+
+            if state == STATE_HEADER:
+                # Skip anything between blocks until the next numbered header
+                match = HEADER_PATTERN.match(line)
+                if match:
+                    block = _new_block(match)
+                    state = STATE_TAGS
+
+            elif state == STATE_TAGS:
+                # The line right after the header always holds the tags; further
+                # lines belong to the tags until the tree opens
+                if block['tags'] and line.startswith('('):
+                    block['tree'].append(line)
+                    state = STATE_TREE
+                else:
+                    block['tags'].append(line)
+
+            elif state == STATE_TREE:
+                # The tree runs until the first dependency row; a new header means
+                # the block had no dependency rows at all
+                if DEPENDENCY_PATTERN.match(line):
+                    block['dependencies'].append(line)
+                    state = STATE_DEPENDENCIES
+                elif HEADER_PATTERN.match(line):
+                    yield block
+                    block = _new_block(HEADER_PATTERN.match(line))
+                    state = STATE_TAGS
+                else:
+                    block['tree'].append(line)
+
+            elif state == STATE_DEPENDENCIES:
+                # A blank line or the next header closes the block
+                match = HEADER_PATTERN.match(line)
+                if match:
+                    yield block
+                    block = _new_block(match)
+                    state = STATE_TAGS
+                elif not line.strip():
+                    yield block
+                    block = None
+                    state = STATE_HEADER
+                else:
+                    block['dependencies'].append(line)
+
+    # Flush the last block if the file does not end with a blank line
+    if block is not None:
+        yield block
+
+
+def _new_block(header_match):
+    # Start collecting the raw lines of a sentence block
+    return {
+        'number': header_match.group(1),
+        'text': header_match.group(2).strip(),
+        'tags': [],
+        'tree': [],
+        'dependencies': [],
+    }
+
+
+def build_sentence(block):
+    """
+    Builds the sentence record of a raw block from `iter_raw_blocks`.
+
+    Args:
+        block (dict): Raw block lines.
+
+    Returns:
+        dict: Sentence record, or an empty dict when the tree or the dependency rows are missing.
+    """
+    if not block['tree'] or not block['dependencies']:
+        return {}
+
+    sentence_info = {}
+    sentence_info['number'] = block['number']
+    sentence_info['text'] = block['text']
+    sentence_info['tokens_tags'] = [
+        tuple(tok.split('\\')) for tok in '\n'.join(block['tags']).strip().split('\t')
+    ]
+
+    # Process the constituency parse to remove outermost layer
+    constituency_parse = ''.join(block['tree']).strip()
+    sentence_info['constituency_parse'] = clean_constituency_parse(remove_outer_layer(constituency_parse))
+
+    sentence_info['dependency_parse'] = [
+        line.split('\t') for line in '\n'.join(block['dependencies']).strip().split('\n')
+    ]
+    return sentence_info
+
 
 # Function to parse the input file
 def load_sentences(file_path):
-    sentences = []
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = f.read()
-
-    # Split into sentence blocks (based on numbering)
-    sentence_blocks = re.split(r'(\d+\.\s)', data)[1:]
-    for i in range(0, len(sentence_blocks), 2):
-        sentence_info = {}
-        sentence_number = sentence_blocks[i].strip()
-        sentence_block = sentence_blocks[i + 1]
-
-        # Extract different parts
-        match = re.search(r'(.*?\n)(.*?)\n(\(.*\))\n(\d+\t.*)', sentence_block, re.DOTALL)
-
-        if match:
-            sentence_info['number'] = sentence_number
-            sentence_info['text'] = match.group(1).strip()
-            sentence_info['tokens_tags'] = [
-                tuple(tok.split('\\')) for tok in match.group(2).strip().split('\t')
-            ]
-
-            # Process the constituency parse to remove outermost layer
-            constituency_parse = match.group(3).replace('\n', '').strip()
-            sentence_info['constituency_parse'] = clean_constituency_parse(remove_outer_layer(constituency_parse))
-
-            sentence_info['dependency_parse'] = [
-                line.split('\t') for line in match.group(4).strip().split('\n')
-            ]
-
-        sentences.append(sentence_info)
+    """
+    Loads every sentence record of a parser output file into a list.
+
+    Args:
+        file_path (str): The path to the parser output file.
+
+    Returns:
+        list: Sentence records as produced by `iter_sentences`.
+    """
+    with tracer.stage('load_sentences', file=file_path) as stage:
+        sentences = list(iter_sentences(file_path))
+        if tracer.enabled:
+            stage.count(sentences=len(sentences), tokens=sum(len(s.get('tokens_tags', ())) for s in sentences))
     return sentences
 
 
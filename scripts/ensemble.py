@@ -0,0 +1,418 @@
+import argparse
+import math
+import os
+
+import numpy as np
+from scripts.corpus_store import ColumnarCorpus, load_corpus
+from scripts.instrumentation import tracer
+from scripts.parser_runner import OUTPUT_FORMATS, format_block, format_conllu_block
+
+
+# Parser outputs combined by default, in tie-breaking order
+DEFAULT_PARSERS = {
+    "Berkeley": "data/berkeley_neural_output.txt",
+    "CoreNLP": "data/corenlp_output.txt",
+    "Allen": "data/allen_output.txt",
+}
+DEFAULT_OUTPUT = "data/ensemble_output.txt"
+
+# Score of a root arc no parser voted for, while some other root arc has votes;
+# finite so that a tree always exists
+FORBIDDEN = -1e9
+
+# Bonus per vote that breaks exact ties in favour of the earlier parser
+TIE_BREAK = 1e-6
+
+# Label votes of parsers whose head differs from the chosen one count this much
+LABEL_FALLBACK = 1e-3
+
+# Score matrix cells decoded together; sentences are grouped by length up to this size
+MATRIX_CELLS = 1 << 22
+
+
+def _find_cycle(heads):
+    # Nodes of a cycle in a head array (heads[0] is the root), or None
+    heads = heads.tolist()
+    state = [0] * len(heads)  # 0 unvisited, 1 on the current path, 2 done
+    state[0] = 2
+    for start in range(1, len(heads)):
+        path = []
+        node = start
+        while state[node] == 0:
+            state[node] = 1
+            path.append(node)
+            node = heads[node]
+        if state[node] == 1:
+            return np.array(path[path.index(node):])
+        for node in path:
+            state[node] = 2
+    return None
+
+
+def chu_liu_edmonds(scores):
+    """
+    Finds the maximum spanning arborescence of a score matrix, without recursion.
+
+    Args:
+        scores (np.ndarray): (n + 1, n + 1) matrix, scores[d, h] the score of head h
+            for dependent d; node 0 is the root.
+
+    Returns:
+        np.ndarray: Head of every node, with heads[0] = 0.
+    """
+    scores = np.array(scores, dtype=np.float64)
+    np.fill_diagonal(scores, -np.inf)
+    scores[0] = -np.inf
+
+    # Contract greedy cycles until the greedy heads form a tree
+    contractions = []
+    while True:
+        heads = scores.argmax(axis=1)
+        heads[0] = 0
+        cycle = _find_cycle(heads)
+        if cycle is None:
+            break
+
+        in_cycle = np.zeros(len(scores), dtype=bool)
+        in_cycle[cycle] = True
+        outside = np.flatnonzero(~in_cycle)
+        cycle_heads = heads[cycle]
+        # Entering the cycle at d replaces d's cycle arc; leaving it starts at its best member
+        enter = scores[np.ix_(cycle, outside)] - scores[cycle, cycle_heads][:, None]
+        enter_arg = enter.argmax(axis=0)
+        leave = scores[np.ix_(outside, cycle)]
+        leave_arg = leave.argmax(axis=1)
+
+        c = len(outside)
+        contracted = np.full((c + 1, c + 1), -np.inf)
+        contracted[:c, :c] = scores[np.ix_(outside, outside)]
+        contracted[c, :c] = enter[enter_arg, np.arange(c)]
+        contracted[:c, c] = leave[np.arange(c), leave_arg]
+        contracted[0] = -np.inf
+        contractions.append((outside, cycle, cycle_heads, enter_arg, leave_arg))
+        scores = contracted
+
+    # Expand the contracted nodes again, innermost last
+    for outside, cycle, cycle_heads, enter_arg, leave_arg in reversed(contractions):
+        c = len(outside)
+        expanded = np.empty(c + len(cycle), dtype=np.int64)
+        outside_heads = heads[:c]
+        expanded[outside] = np.where(outside_heads == c, cycle[leave_arg], outside[np.minimum(outside_heads, c - 1)])
+        expanded[cycle] = cycle_heads
+        expanded[cycle[enter_arg[heads[c]]]] = outside[heads[c]]
+        heads = expanded
+    heads[0] = 0
+    return heads
+
+
+def decode_tree(scores):
+    """
+    Decodes the best tree with a single root attachment.
+
+    The unconstrained spanning tree is kept when it has one root dependent;
+    otherwise every dependent with a usable root arc is tried as the only one.
+
+    Args:
+        scores (np.ndarray): (n + 1, n + 1) arc scores, see `chu_liu_edmonds`.
+
+    Returns:
+        np.ndarray: Head of every node, with heads[0] = 0.
+    """
+    heads = chu_liu_edmonds(scores)
+    if np.count_nonzero(heads[1:] == 0) == 1:
+        return heads
+
+    candidates = np.flatnonzero(scores[1:, 0] > FORBIDDEN / 2) + 1
+    if not len(candidates):
+        candidates = np.arange(1, len(scores))
+    best, best_score = heads, -np.inf
+    dependents = np.arange(1, len(scores))
+    for root in candidates.tolist():
+        constrained = np.array(scores, dtype=np.float64)
+        constrained[dependents[dependents != root], 0] = -np.inf
+        candidate = chu_liu_edmonds(constrained)
+        total = scores[dependents, candidate[1:]].sum()
+        if total > best_score:
+            best, best_score = candidate, total
+    return best
+
+
+def decode_heads(lengths, offsets, heads, weights):
+    """
+    Picks a well-formed tree for every sentence from weighted arc votes.
+
+    Sentences are grouped by length into batches of (sentence, dependent, head)
+    score matrices filled with one scatter-add per parser. The greedy choice of
+    every dependent is kept where it already is a tree with a single root, which
+    a vectorised pointer-jumping check finds for the whole batch at once; only
+    the other sentences go through `decode_tree`.
+
+    Args:
+        lengths (np.ndarray): Tokens per sentence.
+        offsets (np.ndarray): Token offsets of the sentences (len(lengths) + 1).
+        heads (np.ndarray): (parsers, tokens) voted heads, -1 where a parser abstains.
+        weights (np.ndarray): (parsers, tokens) vote weights, 0 where a parser abstains.
+
+    Returns:
+        np.ndarray: Chosen head per token.
+        int: Number of sentences that needed the spanning tree search.
+    """
+    n_parsers = len(heads)
+    chosen = np.zeros(offsets[-1], dtype=np.int64)
+    searched = 0
+    order = np.argsort(lengths, kind="stable")
+    order = order[lengths[order] > 0]
+
+    start = 0
+    while start < len(order):
+        # Sentences are sorted by length, so a batch's padded size is set by its last sentence
+        cells = np.arange(1, len(order) - start + 1) * (lengths[order[start:]] + 1) ** 2
+        size = max(1, int(np.count_nonzero(cells <= MATRIX_CELLS)))
+        batch = order[start:start + size]
+        start += size
+
+        n = lengths[batch]
+        width = int(n.max()) + 1
+        batch_index = np.repeat(np.arange(len(batch)), n)
+        tokens = np.concatenate([np.arange(offsets[s], offsets[s + 1]) for s in batch.tolist()])
+        dependents = tokens - offsets[batch][batch_index] + 1
+
+        votes = np.zeros((len(batch), width, width))
+        for p in range(n_parsers):
+            voted = weights[p, tokens] > 0
+            np.add.at(votes, (batch_index[voted], dependents[voted], heads[p, tokens][voted]),
+                      weights[p, tokens][voted] + TIE_BREAK * (n_parsers - p))
+
+        # Heads beyond the sentence and self-loops are impossible; unvoted root arcs are
+        # a last resort whenever some root arc has votes
+        columns = np.arange(width)
+        scores = np.where(columns[None, None, :] > n[:, None, None], -np.inf, votes)
+        scores[:, columns, columns] = -np.inf
+        root_voted = (votes[:, :, 0] > 0).any(axis=1)
+        scores[:, :, 0] = np.where(root_voted[:, None] & (votes[:, :, 0] == 0), FORBIDDEN, scores[:, :, 0])
+
+        greedy = scores.argmax(axis=2)
+        real = columns[None, :] <= n[:, None]
+        real[:, 0] = False
+        greedy[~real] = 0
+        single_root = np.count_nonzero((greedy == 0) & real, axis=1) == 1
+        ancestors = greedy
+        for _ in range(math.ceil(math.log2(width)) + 1):
+            ancestors = np.take_along_axis(ancestors, ancestors, axis=1)
+        tree = single_root & (ancestors == 0).all(axis=1)
+
+        for b in np.flatnonzero(~tree).tolist():
+            greedy[b, :n[b] + 1] = decode_tree(scores[b, :n[b] + 1, :n[b] + 1])
+        searched += int(np.count_nonzero(~tree))
+        chosen[tokens] = greedy[batch_index, dependents]
+    return chosen, searched
+
+
+def vote_labels(chosen, heads, labels, weights):
+    """
+    Picks a label per token by weighted vote.
+
+    Parsers that attach the token to the chosen head vote with their full weight;
+    the others only decide between labels nobody with the chosen head proposed.
+
+    Args:
+        chosen (np.ndarray): Chosen head per token.
+        heads (np.ndarray): (parsers, tokens) voted heads.
+        labels (np.ndarray): (parsers, tokens) label ids, -1 where a parser abstains.
+        weights (np.ndarray): (parsers, tokens) vote weights.
+
+    Returns:
+        np.ndarray: Chosen label id per token.
+    """
+    support = weights * ((heads == chosen[None, :]) + LABEL_FALLBACK)
+    # Total support of each parser's label: the support of every parser proposing the same label
+    same = labels[:, None, :] == labels[None, :, :]
+    totals = (same * support[None, :, :]).sum(axis=1)
+    totals[labels < 0] = -np.inf
+    return labels[totals.argmax(axis=0), np.arange(labels.shape[1])]
+
+
+def check_aligned(corpora, names):
+    """
+    Checks that parser corpora hold the same sentences in the same order.
+
+    Raises:
+        ValueError: If the sentence counts differ, or two parsed sentences at the same
+            position have different numbers.
+    """
+    first = corpora[0]
+    for name, corpus in zip(names[1:], corpora[1:]):
+        if len(corpus) != len(first):
+            raise ValueError(f"{name} has {len(corpus)} sentences but {names[0]} has {len(first)}")
+        both = (np.asarray(first.columns["valid"]) > 0) & (np.asarray(corpus.columns["valid"]) > 0)
+        mismatch = np.flatnonzero(both & (np.asarray(first.columns["number"]) != np.asarray(corpus.columns["number"])))
+        if len(mismatch):
+            i = int(mismatch[0])
+            raise ValueError(f"Sentence {i + 1} is numbered {corpus.columns['number'][i]} in {name} "
+                             f"but {first.columns['number'][i]} in {names[0]}")
+
+
+def _in_memory(corpus):
+    # Window copy with Python list columns: rebuilding records indexes them element by element
+    columns = {name: values if name.endswith("_bytes") else np.asarray(values).tolist()
+               for name, values in corpus.columns.items()}
+    return ColumnarCorpus(columns, corpus.vocabularies)
+
+
+def combine_window(corpora, weights, form_maps, label_maps):
+    """
+    Combines the dependency parses of one window of sentences.
+
+    The first parser with dependency rows for a sentence is its reference: its
+    words, tags and tree are kept. Another parser votes on the sentence only if its
+    dependency rows have the same words in the same order; a head equal to the
+    token's own index (spaCy's root convention) is read as a root attachment.
+
+    Args:
+        corpora (list): Window slice of every parser's corpus.
+        weights (list): Vote weight of every parser.
+        form_maps (list): Per parser, its form ids mapped to ids shared by all parsers.
+        label_maps (list): Per parser, its label ids mapped to shared label ids.
+
+    Returns:
+        dict: Per sentence 'reference' parser (-1 when none parsed it) and token
+              'offsets'; per reference token the chosen 'heads' and 'labels';
+              and 'searched', the sentences that needed the spanning tree search.
+    """
+    n_parsers = len(weights)
+    n_sentences = len(corpora[0])
+    counts = np.array([np.diff(corpus.dep_offsets) for corpus in corpora])
+    reference = np.where((counts > 0).any(axis=0), (counts > 0).argmax(axis=0), -1)
+    lengths = np.where(reference >= 0, counts[np.maximum(reference, 0), np.arange(n_sentences)], 0)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    sentence = np.repeat(np.arange(n_sentences), lengths)
+    tokens = np.arange(offsets[-1])
+    position = tokens - offsets[sentence]
+
+    # Every parser's rows at the reference token positions, in shared form and label ids
+    form, index, head, label = (np.full((n_parsers, offsets[-1]), -1, dtype=np.int64) for _ in range(4))
+    for p, corpus in enumerate(corpora):
+        same_length = counts[p, sentence] == lengths[sentence]
+        rows = (corpus.dep_offsets[sentence] + position)[same_length]
+        form[p, same_length] = form_maps[p][corpus.columns["dep_form"][rows]]
+        index[p, same_length] = corpus.columns["dep_index"][rows]
+        head[p, same_length] = corpus.columns["dep_head"][rows]
+        label[p, same_length] = label_maps[p][corpus.columns["dep_label"][rows]]
+
+    head = np.where(head == index, 0, head)
+    reference_form = form[np.maximum(reference[sentence], 0), tokens]
+    reference_label = label[np.maximum(reference[sentence], 0), tokens]
+    valid = (form == reference_form) & (index == position + 1) & (head >= 0) & (head <= lengths[sentence])
+    # A parser votes on a sentence only if all of its rows there are usable
+    votes = np.array([np.bincount(sentence[~valid[p]], minlength=n_sentences) == 0 for p in range(n_parsers)])
+    voting = votes[:, sentence]
+    token_weights = np.where(voting, np.asarray(weights, dtype=np.float64)[:, None], 0.0)
+    head = np.where(voting, head, -1)
+    label = np.where(voting, label, -1)
+
+    chosen, searched = decode_heads(lengths, offsets, head, token_weights)
+    chosen_labels = vote_labels(chosen, head, label, token_weights)
+    # Sentences nobody could vote on keep the reference labels
+    chosen_labels = np.where(voting.any(axis=0), chosen_labels, reference_label)
+    return {"reference": reference, "offsets": offsets, "heads": chosen, "labels": chosen_labels,
+            "searched": searched}
+
+
+def ensemble(parser_paths, output_path=DEFAULT_OUTPUT, weights=None, window_size=1000, output_format="block",
+             cache_dir=None):
+    """
+    Combines several parser outputs into one dependency parse per sentence.
+
+    Each parser votes for its arcs with its weight; every sentence gets the
+    maximum spanning tree of the summed votes (single root, see `decode_heads`)
+    and the weighted majority label of its arcs. The outputs are read through
+    the columnar cache shared with the evaluators and decoded one window of
+    sentences at a time; the result is written in the block format, so the
+    existing evaluators score it like any parser output.
+
+    Args:
+        parser_paths (dict): Parser name to output file, in tie-breaking order.
+        output_path (str): Ensemble output file.
+        weights (dict): Parser name to vote weight (default: 1 for every parser).
+        window_size (int): Sentences decoded together.
+        output_format (str): 'block' or 'conllu', see `parser_runner.OUTPUT_FORMATS`.
+        cache_dir (str): Corpus cache directory, see `load_corpus`.
+
+    Returns:
+        dict: 'sentences', 'searched' (sentences whose greedy arcs were not a tree)
+              and 'output'.
+    """
+    names = list(parser_paths)
+    weights = [float((weights or {}).get(name, 1.0)) for name in names]
+    formatter = format_conllu_block if output_format == "conllu" else format_block
+    corpora = [load_corpus(parser_paths[name], cache_dir=cache_dir) for name in names]
+    check_aligned(corpora, names)
+
+    # Shared ids, so that words and labels compare across parsers
+    forms, label_ids = {}, {}
+    form_maps = [np.array([forms.setdefault(word, len(forms)) for word in corpus.vocabularies["forms"]] or [0])
+                 for corpus in corpora]
+    label_maps = [np.array([label_ids.setdefault(name, len(label_ids)) for name in corpus.vocabularies["labels"]]
+                           or [0]) for corpus in corpora]
+    label_names = list(label_ids)
+
+    n_sentences = len(corpora[0])
+    searched = 0
+    tmp_path = f"{output_path}.tmp{os.getpid()}"
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for start in range(0, n_sentences, window_size):
+                end = min(start + window_size, n_sentences)
+                with tracer.stage("ensemble_window", start=start) as stage:
+                    window = [corpus.slice(start, end) for corpus in corpora]
+                    combined = combine_window(window, weights, form_maps, label_maps)
+                    searched += combined["searched"]
+
+                    references = {p: _in_memory(window[p]) for p in set(combined["reference"].tolist()) if p >= 0}
+                    offsets = combined["offsets"].tolist()
+                    heads, labels = combined["heads"].tolist(), combined["labels"].tolist()
+                    for s, p in enumerate(combined["reference"].tolist()):
+                        if p < 0:
+                            # No parser parsed this sentence: an empty block keeps its position
+                            f.write(formatter(start + s + 1, "", ([], "()", [])))
+                            continue
+                        record = references[p].record(s)
+                        rows = zip(range(offsets[s], offsets[s + 1]), record["dependency_parse"])
+                        dependencies = [(row[0], row[1], label_names[labels[t]], heads[t]) for t, row in rows]
+                        f.write(formatter(record["number"].rstrip("."), record["text"],
+                                          (record["tokens_tags"], record["constituency_parse"], dependencies)))
+                    stage.count(sentences=end - start, tokens=int(offsets[-1]))
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {"sentences": n_sentences, "searched": searched, "output": output_path}
+
+
+def _weighted_parser(value):
+    # "Name=path" or "Name=path:weight"
+    name, _, path = value.partition("=")
+    path, _, weight = path.rpartition(":") if ":" in path else (path, "", "")
+    if not name or not path:
+        raise argparse.ArgumentTypeError(f"Expected Name=path[:weight], got {value}")
+    return name, path, float(weight) if weight else 1.0
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Combine the dependency parses of several parsers by weighted "
+                                                     "arc votes and maximum spanning tree decoding.")
+    arg_parser.add_argument("--parser", dest="parsers", action="append", type=_weighted_parser,
+                            help="Name=path[:weight]; repeat for every parser, earliest wins ties "
+                                 "(default: Berkeley, CoreNLP and Allen with weight 1)")
+    arg_parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    arg_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="block")
+    arg_parser.add_argument("--window-size", type=int, default=1000, help="Sentences decoded together")
+    arg_parser.add_argument("--cache-dir", default=None, help="Corpus cache directory (default: next to each file)")
+    args = arg_parser.parse_args()
+
+    parsers = args.parsers or [(name, path, 1.0) for name, path in DEFAULT_PARSERS.items()]
+    run = ensemble({name: path for name, path, _ in parsers}, args.output,
+                   {name: weight for name, _, weight in parsers}, args.window_size, args.format, args.cache_dir)
+    print(f"Wrote {run['sentences']} sentences to {run['output']} "
+          f"({run['searched']} needed the spanning tree search)")
@@ -0,0 +1,221 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+# Environment variables that switch tracing on for any script or worker process
+TRACE_ENV = "PARSER_EVAL_TRACE"  # Path of the JSON-lines trace
+PROFILE_ENV = "PARSER_EVAL_PROFILE"  # Comma-separated stage names to run under cProfile, or "*"
+
+
+def peak_rss_bytes(children=False):
+    """
+    Returns the peak resident set size of the current process, or None if unknown.
+
+    Args:
+        children (bool): Report the largest peak among terminated child processes
+            instead, e.g. a worker JVM once it has exited.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _NullStage:
+    # Shared no-op stage returned while tracing is disabled
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def count(self, sentences=None, tokens=None, **fields):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Stage:
+    """
+    A timed region of a traced run.
+
+    Written to the trace as one record when the region exits, with wall and CPU
+    time, the sentence and token counts given to `count`, their throughput and
+    the peak RSS of the process so far.
+    """
+
+    def __init__(self, tracer, name, fields):
+        self.tracer = tracer
+        self.name = name
+        self.fields = fields
+        self.sentences = None
+        self.tokens = None
+        self.profile = None
+
+    def count(self, sentences=None, tokens=None, **fields):
+        """
+        Adds sentence and token counts (and any other fields) to the stage record.
+        """
+        if sentences is not None:
+            self.sentences = (self.sentences or 0) + sentences
+        if tokens is not None:
+            self.tokens = (self.tokens or 0) + tokens
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.path = self.tracer._push(self.name)
+        # Only one profiler can be active, so nested profiled stages share the outer one
+        if self.tracer.profiles(self.name) and not self.tracer._profiling:
+            self.tracer._profiling = True
+            self.profile = self.tracer._profiles.setdefault(self.path, cProfile.Profile())
+            self.profile.enable()
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        if self.profile is not None:
+            self.profile.disable()
+            self.tracer._profiling = False
+            self.tracer.dump_profile(self.path, self.profile)
+        self.tracer._pop()
+
+        record = {"event": "stage", "stage": self.path, "wall_seconds": wall, "cpu_seconds": cpu}
+        if self.sentences is not None:
+            record["sentences"] = self.sentences
+            record["sentences_per_second"] = self.sentences / wall if wall > 0 else None
+        if self.tokens is not None:
+            record["tokens"] = self.tokens
+            record["tokens_per_second"] = self.tokens / wall if wall > 0 else None
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record["peak_rss_bytes"] = peak_rss_bytes()
+        record.update(self.fields)
+        self.tracer.emit(record)
+        return False
+
+
+class Tracer:
+    """
+    Writes stage timings and counters of a run to a JSON-lines trace.
+
+    Disabled unless `enable` is called or PARSER_EVAL_TRACE is set. While disabled,
+    `stage` returns a shared no-op context manager and `counter` returns at once,
+    so instrumented code pays one attribute check per call.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.profile_stages = set()
+        self._file = None
+        self._profiling = False
+        self._profiles = {}  # Stage path to its profile, accumulated over calls
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def enable(self, path, profile_stages=()):
+        """
+        Starts appending trace records to a file.
+
+        Args:
+            path (str): JSON-lines trace file; processes sharing it append whole lines.
+            profile_stages (iterable): Stage names to run under cProfile ("*" for all).
+                Each profiled stage is dumped to "<path>.<stage>.<pid>.prof".
+        """
+        self.disable()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.profile_stages = set(profile_stages)
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+        self.enabled = True
+
+    def disable(self):
+        """
+        Stops tracing and closes the trace file.
+        """
+        self.enabled = False
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stage(self, name, **fields):
+        """
+        Returns a context manager that times a stage.
+
+        Args:
+            name (str): Stage name; nested stages are recorded as "outer/inner".
+            **fields: Extra fields of the stage record (e.g. parser name).
+
+        Returns:
+            Stage: Context manager whose `count` method adds sentence and token counts.
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return Stage(self, name, fields)
+
+    def counter(self, name, value, **fields):
+        """
+        Records a single measurement such as a model load time or a cache hit rate.
+
+        Args:
+            name (str): Counter name.
+            value (float): Measured value.
+            **fields: Extra fields of the record.
+        """
+        if not self.enabled:
+            return
+        self.emit({"event": "counter", "name": name, "value": value, **fields})
+
+    def emit(self, record):
+        # One line per record, tagged with the process for multi-process runs
+        record = {"time": time.time(), "pid": os.getpid(), **record}
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line)
+
+    def profiles(self, name):
+        return "*" in self.profile_stages or name in self.profile_stages
+
+    def dump_profile(self, path, profile):
+        # Rewritten after every call with the totals of all calls so far
+        profile.dump_stats(f"{self.path}.{path.replace('/', '.')}.{os.getpid()}.prof")
+
+    def _push(self, name):
+        # A forked worker starts its own stack instead of nesting under the parent's stages
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._local = threading.local()
+            self._profiles.clear()
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(name)
+        return "/".join(stack)
+
+    def _pop(self):
+        self._local.stack.pop()
+
+
+# Process-wide tracer used by the loaders, parser scripts and evaluators
+tracer = Tracer()
+
+if os.environ.get(TRACE_ENV):
+    tracer.enable(os.environ[TRACE_ENV], [name for name in os.environ.get(PROFILE_ENV, "").split(",") if name])
+
@@ -0,0 +1,130 @@
+import os
+import time
+
+from scripts.instrumentation import tracer
+
+
+# Set to any non-empty value to forbid model downloads, e.g. in CI without network access
+OFFLINE_ENV = "PARSER_EVAL_OFFLINE"
+
+
+def offline():
+    """
+    Returns whether model downloads are disabled through OFFLINE_ENV.
+    """
+    return bool(os.environ.get(OFFLINE_ENV))
+
+
+class ModelRegistry:
+    """
+    Loads models on first use and keeps them resident for the life of the process.
+
+    Parser scripts register a loader per model instead of loading at import time,
+    so a run only pays for the models its requested outputs need (and nothing at
+    all when every sentence comes from the parse cache). A long-lived worker that
+    imports the scripts reuses the loaded models across jobs.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self.load_times = {}
+
+    def register(self, name, loader):
+        """
+        Registers a zero-argument loader under a model name.
+
+        Args:
+            name (str): Model name.
+            loader (callable): Returns the loaded model.
+        """
+        self._loaders[name] = loader
+
+    def get(self, name):
+        """
+        Returns a model, loading it on the first request.
+
+        Args:
+            name (str): Model name.
+
+        Returns:
+            object: The loaded model.
+        """
+        if name not in self._models:
+            start = time.perf_counter()
+            self._models[name] = self._loaders[name]()
+            self.load_times[name] = time.perf_counter() - start
+            tracer.counter("model_load_seconds", self.load_times[name], model=name)
+        return self._models[name]
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def unload(self, name):
+        """
+        Drops a loaded model so that its memory can be reclaimed.
+        """
+        self._models.pop(name, None)
+
+    def close(self):
+        """
+        Drops every loaded model, closing those that run in a process of their own (e.g. the CoreNLP worker).
+        """
+        for name in list(self._models):
+            model = self._models.pop(name)
+            if hasattr(model, "close"):
+                model.close()
+
+
+# Process-wide registry shared by all parser scripts
+registry = ModelRegistry()
+
+
+def load_spacy(name):
+    """
+    Loads an installed spaCy pipeline.
+    """
+    import spacy
+    return spacy.load(name)
+
+
+def spacy_version(name):
+    """
+    Returns the installed version of a spaCy pipeline package without loading it.
+    """
+    import spacy
+    return spacy.util.get_package_version(name) or "unknown"
+
+
+def load_benepar(name):
+    """
+    Loads a Benepar model, downloading it only when no local copy exists.
+    """
+    import benepar
+    try:
+        return benepar.Parser(name)
+    except LookupError:
+        if offline():
+            raise LookupError(f"Benepar model {name} is not installed and downloads are disabled ({OFFLINE_ENV})")
+        benepar.download(name)
+        return benepar.Parser(name)
+
+
+def load_stanza(lang, processors):
+    """
+    Builds a Stanza pipeline with only the given processors.
+
+    Models already on disk are reused without contacting the download server, and
+    nothing is downloaded at all when downloads are disabled (see OFFLINE_ENV).
+    """
+    import stanza
+    download_method = None if offline() else stanza.DownloadMethod.REUSE_RESOURCES
+    return stanza.Pipeline(lang, processors=processors, download_method=download_method)
+
+
+def load_allen_predictor(name):
+    """
+    Loads a pretrained AllenNLP predictor.
+    """
+    from allennlp_models import pretrained
+    return pretrained.load_predictor(name)
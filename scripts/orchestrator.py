@@ -0,0 +1,290 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from scripts.instrumentation import tracer
+from scripts.parser_runner import DEFAULT_INPUT, STREAM, batched, read_input_sentences
+
+
+# Repository root; parser scripts run from here as modules so `scripts.*` imports resolve
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Directory holding one virtual environment per parser, as set up in the README
+DEFAULT_VENV_ROOT = os.path.join(ROOT, "venv_library")
+
+# Parser scripts, their environments and outputs; 'cpus' is the share of the CPU budget
+# a parser holds while it runs, 'name' the name used by the evaluators and 'tag_lines'
+# marks outputs with one line per sentence instead of blank-line separated blocks
+PARSERS = {
+    "allen": {
+        "name": "Allen", "module": "scripts.allen_nlp_parser", "venv": "allen_venv",
+        "output": "data/allen_output.txt", "cpus": 2, "evaluate": True,
+    },
+    "berkeley": {
+        "name": "Berkeley", "module": "scripts.berkeley_neural_parser", "venv": "berkeley_venv",
+        "output": "data/berkeley_neural_output.txt", "cpus": 2, "evaluate": True,
+    },
+    "stanza": {
+        # Tag lines only, nothing to evaluate
+        "name": "Stanza", "module": "scripts.stanza_parser", "venv": "stanza_venv",
+        "output": "data/stanza_output.txt", "cpus": 1, "evaluate": False, "tag_lines": True,
+    },
+    "corenlp": {
+        # The Java worker needs Maven, not a Python environment: the client runs in this interpreter
+        "name": "CoreNLP", "module": "scripts.corenlp_parser", "venv": None,
+        "output": "data/corenlp_output.txt", "cpus": 2, "evaluate": True,
+    },
+}
+
+# Thread-count variables of the numeric libraries, capped at a parser's CPU share
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+class CpuBudget:
+    """
+    Weighted semaphore over a number of CPUs.
+
+    A job acquires its CPU share and waits while the share is not free; a share
+    larger than the whole budget is capped to it, so every job can run eventually.
+    """
+
+    def __init__(self, cpus):
+        self.cpus = max(1, cpus)
+        self.free = self.cpus
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, cpus):
+        cpus = min(max(1, cpus), self.cpus)
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.free >= cpus)
+            self.free -= cpus
+        return cpus
+
+    async def release(self, cpus):
+        async with self._condition:
+            self.free += cpus
+            self._condition.notify_all()
+
+
+def interpreter(spec, venv_root=DEFAULT_VENV_ROOT):
+    """
+    Python interpreter of a parser's virtual environment.
+
+    Args:
+        spec (dict): Parser entry of PARSERS.
+        venv_root (str): Directory holding the environments.
+
+    Returns:
+        str: Path of the interpreter; the current one for parsers without an environment.
+    """
+    if spec["venv"] is None:
+        return sys.executable
+    venv = os.path.join(venv_root, spec["venv"])
+    for candidate in (os.path.join(venv, "bin", "python"), os.path.join(venv, "Scripts", "python.exe")):
+        if os.path.exists(candidate):
+            return candidate
+    raise FileNotFoundError(f"No Python interpreter in {venv}; create it as described in the README")
+
+
+def parser_environment(cpus):
+    # Child environment: imports from the repository root, unbuffered output, capped thread pools
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    env["PYTHONUNBUFFERED"] = "1"
+    env.update({variable: str(cpus) for variable in THREAD_VARIABLES})
+    return env
+
+
+async def _feed(process, shards):
+    # Writes the shared input shards to a parser's stdin, waiting whenever the pipe is full
+    try:
+        for shard in shards:
+            process.stdin.write("".join(f"{sentence}\n" for sentence in shard).encode("utf-8"))
+            await process.stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # The parser exited early; its return code tells why
+    finally:
+        process.stdin.close()
+
+
+async def _collect(stream, output_path, tag_lines=False):
+    # Copies the parser's output to a file as it arrives; returns the sentence count
+    sentences = 0
+    with open(output_path, "wb") as f:
+        while True:
+            line = await stream.readline()
+            if not line:
+                return sentences
+            if tag_lines or not line.strip():
+                sentences += 1
+            f.write(line)
+
+
+async def _relay(stream, name):
+    # Passes the parser's progress messages on to our stderr, prefixed with its name
+    while True:
+        line = await stream.readline()
+        if not line:
+            return
+        sys.stderr.write(f"[{name}] {line.decode('utf-8', 'replace')}")
+
+
+async def run_parser_process(key, spec, shards, budget, venv_root=DEFAULT_VENV_ROOT, extra_args=()):
+    """
+    Runs one parser script in its own interpreter within the CPU budget.
+
+    The script reads the input from stdin and writes its blocks to stdout, which
+    are streamed into a temporary file and moved to the parser's output path once
+    the script succeeds.
+
+    Args:
+        key (str): Parser key in PARSERS.
+        spec (dict): Parser entry of PARSERS.
+        shards (list): Input sentences, in shards.
+        budget (CpuBudget): Shared CPU budget.
+        venv_root (str): Directory holding the environments.
+        extra_args (tuple): Further command-line options for the script.
+
+    Returns:
+        dict: 'parser', 'output', 'sentences' and 'seconds' of the run.
+    """
+    output = os.path.join(ROOT, spec["output"])
+    tmp_output = f"{output}.tmp{os.getpid()}"
+    command = [interpreter(spec, venv_root), "-m", spec["module"], "--input", STREAM, "--output", STREAM,
+               *extra_args]
+
+    cpus = await budget.acquire(spec["cpus"])
+    process, return_code = None, None
+    try:
+        with tracer.stage("orchestrated_parser", parser=key, cpus=cpus) as stage:
+            start = time.perf_counter()
+            process = await asyncio.create_subprocess_exec(
+                *command, cwd=ROOT, env=parser_environment(cpus),
+                stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            )
+            _, sentences, _ = await asyncio.gather(
+                _feed(process, shards),
+                _collect(process.stdout, tmp_output, spec.get("tag_lines", False)),
+                _relay(process.stderr, key),
+            )
+            return_code = await process.wait()
+            seconds = time.perf_counter() - start
+            stage.count(sentences=sentences)
+    except BaseException:
+        # Cancelled or failed while the script runs: never leave the child behind
+        if process is not None and process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    finally:
+        await budget.release(cpus)
+        if return_code != 0 and os.path.exists(tmp_output):
+            os.remove(tmp_output)
+
+    if return_code != 0:
+        raise RuntimeError(f"{key} parser exited with code {return_code}")
+    os.replace(tmp_output, output)
+    return {"parser": key, "output": output, "sentences": sentences, "seconds": seconds}
+
+
+def _evaluate_output(gold_path, name, output, families):
+    # Runs in a pool process: scores one parser output in-process
+    from evaluation.evaluate import evaluate
+    results = evaluate(gold_path, {name: output}, families=families, workers=1)
+    return {family: merged["summary"] for family, merged in results[name].items()}
+
+
+async def orchestrate(parsers, input_file=DEFAULT_INPUT, gold_path="data/gold_standard.txt", cpus=None,
+                      shard_size=256, families=("dependency", "pos_upos"), venv_root=DEFAULT_VENV_ROOT,
+                      extra_args=(), evaluate_outputs=True):
+    """
+    Runs several parser scripts concurrently and evaluates each one as soon as it finishes.
+
+    The input is read once and shared, in shards, with every parser over its stdin.
+    Parsers start as their CPU share of the budget becomes free, and each finished
+    output is handed to a pool process for scoring while the other parsers are still
+    running, so the run takes about as long as the slowest parser plus its evaluation.
+
+    Args:
+        parsers (dict): Parser key to entry, see PARSERS.
+        input_file (str): Input file, one sentence per line.
+        gold_path (str): Gold standard file.
+        cpus (int): CPU budget shared by the parsers and evaluations (default: all cores).
+        shard_size (int): Sentences per write to a parser's stdin.
+        families (tuple): Metric families to compute, see `evaluation.evaluate.METRIC_FAMILIES`.
+        venv_root (str): Directory holding the environments.
+        extra_args (tuple): Further command-line options for every parser script.
+        evaluate_outputs (bool): Whether to score the outputs.
+
+    Returns:
+        dict: Parser key to its run statistics, plus the 'summary' of each metric family
+              for evaluated parsers; a parser whose run or evaluation failed has only
+              'parser' and 'error'.
+    """
+    budget = CpuBudget(cpus or os.cpu_count() or 1)
+    shards = list(batched(read_input_sentences(input_file), shard_size))
+    loop = asyncio.get_running_loop()
+
+    with ProcessPoolExecutor(max_workers=max(1, min(budget.cpus, len(parsers)))) as pool:
+
+        async def run_and_evaluate(key, spec):
+            run = await run_parser_process(key, spec, shards, budget, venv_root, extra_args)
+            if evaluate_outputs and spec["evaluate"]:
+                evaluation_cpus = await budget.acquire(1)
+                try:
+                    with tracer.stage("orchestrated_evaluation", parser=key):
+                        run["summary"] = await loop.run_in_executor(
+                            pool, _evaluate_output, gold_path, spec["name"], run["output"], tuple(families)
+                        )
+                finally:
+                    await budget.release(evaluation_cpus)
+            return key, run
+
+        # A failed parser or evaluation is reported for that parser; the others run to completion
+        outcomes = await asyncio.gather(*(run_and_evaluate(key, spec) for key, spec in parsers.items()),
+                                        return_exceptions=True)
+
+    runs = {}
+    for key, outcome in zip(parsers, outcomes):
+        if isinstance(outcome, BaseException):
+            if not isinstance(outcome, Exception):
+                raise outcome
+            runs[key] = {"parser": key, "error": f"{type(outcome).__name__}: {outcome}"}
+        else:
+            runs[key] = outcome[1]
+    return runs
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Run the parsers concurrently in their own environments "
+                                                     "and evaluate each output as soon as it is written.")
+    arg_parser.add_argument("--parsers", nargs="+", choices=PARSERS, default=list(PARSERS))
+    arg_parser.add_argument("--input", default=DEFAULT_INPUT)
+    arg_parser.add_argument("--gold", default="data/gold_standard.txt")
+    arg_parser.add_argument("--cpus", type=int, default=None, help="CPU budget (default: all cores)")
+    arg_parser.add_argument("--venv-root", default=DEFAULT_VENV_ROOT)
+    arg_parser.add_argument("--shard-size", type=int, default=256, help="Sentences per write to a parser")
+    arg_parser.add_argument("--metrics", nargs="+", default=["dependency", "pos_upos"])
+    arg_parser.add_argument("--no-evaluate", action="store_true")
+    args, parser_args = arg_parser.parse_known_args()
+
+    started = time.perf_counter()
+    runs = asyncio.run(orchestrate(
+        {key: PARSERS[key] for key in args.parsers}, args.input, args.gold, args.cpus, args.shard_size,
+        tuple(args.metrics), args.venv_root, tuple(parser_args), not args.no_evaluate,
+    ))
+
+    for key, run in runs.items():
+        if "error" in run:
+            print(f"\n{PARSERS[key]['name']}: failed: {run['error']}", file=sys.stderr)
+            continue
+        print(f"\n{PARSERS[key]['name']}: {run['sentences']} sentences in {run['seconds']:.1f}s -> {run['output']}")
+        for family, summary in run.get("summary", {}).items():
+            print(f"  {family}:")
+            for metric, value in summary.items():
+                print(f"    {metric}: {value}")
+    print(f"\nTotal: {time.perf_counter() - started:.1f}s")
+    sys.exit(1 if any("error" in run for run in runs.values()) else 0)
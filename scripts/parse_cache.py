@@ -0,0 +1,141 @@
+import hashlib
+import json
+import re
+import sqlite3
+import unicodedata
+
+from scripts.instrumentation import tracer
+
+
+# Default location of the parse cache database
+DEFAULT_CACHE = "data/.parse_cache.sqlite"
+
+# SQLite limits the number of bound parameters per statement
+_QUERY_CHUNK = 500
+
+
+def sentence_key(sentence):
+    """
+    Hashes the normalised text of a sentence (NFC, collapsed whitespace).
+
+    Args:
+        sentence (str): Sentence text.
+
+    Returns:
+        str: Hex SHA-256 digest used as the cache key.
+    """
+    normalised = re.sub(r"\s+", " ", unicodedata.normalize("NFC", sentence)).strip()
+    return hashlib.sha256(normalised.encode("utf-8")).hexdigest()
+
+
+class ParseCache:
+    """
+    Content-addressed store of parse results in a SQLite file.
+
+    Results are keyed by parser name, model identifier and sentence hash, so
+    changing one model only invalidates that model's entries and new sentences
+    never force the rest of the corpus to be parsed again.
+
+    Args:
+        path (str): The path to the SQLite database (created if missing).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS parses ("
+            "parser TEXT NOT NULL, model TEXT NOT NULL, sentence_hash TEXT NOT NULL, result TEXT NOT NULL, "
+            "PRIMARY KEY (parser, model, sentence_hash))"
+        )
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, parser, model, keys):
+        """
+        Looks up several sentence hashes at once.
+
+        Args:
+            parser (str): Parser name.
+            model (str): Model identifier.
+            keys (list): Sentence hashes.
+
+        Returns:
+            dict: Sentence hash to decoded result, for the hashes found.
+        """
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        for start in range(0, len(keys), _QUERY_CHUNK):
+            chunk = keys[start:start + _QUERY_CHUNK]
+            rows = self.connection.execute(
+                f"SELECT sentence_hash, result FROM parses WHERE parser = ? AND model = ? "
+                f"AND sentence_hash IN ({', '.join('?' * len(chunk))})",
+                [parser, model, *chunk],
+            )
+            found.update((key, json.loads(result)) for key, result in rows)
+        return found
+
+    def put_many(self, parser, model, results):
+        """
+        Stores parse results and commits them.
+
+        Args:
+            parser (str): Parser name.
+            model (str): Model identifier.
+            results (dict): Sentence hash to JSON-serialisable result.
+        """
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO parses (parser, model, sentence_hash, result) VALUES (?, ?, ?, ?)",
+            [(parser, model, key, json.dumps(result, ensure_ascii=False)) for key, result in results.items()],
+        )
+        self.connection.commit()
+
+    def hit_rate(self):
+        """
+        Returns the share of sentences served from the cache so far.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def cached_parse_batch(parse_batch, cache, parser, model):
+    """
+    Wraps a batch parser so that only cache misses reach the models.
+
+    Args:
+        parse_batch (callable): Takes a list of sentences and returns one result per sentence.
+        cache (ParseCache): The cache to read from and write to.
+        parser (str): Parser name.
+        model (str): Model identifier; bump it whenever the model changes.
+
+    Returns:
+        callable: Batch parser with the same interface.
+    """
+    def parse(sentences):
+        keys = [sentence_key(sentence) for sentence in sentences]
+        results = cache.get_many(parser, model, keys)
+
+        # Parse each missing sentence once, even if it repeats within the batch
+        missing = {key: sentence for key, sentence in zip(keys, sentences) if key not in results}
+        cache.hits += len(keys) - sum(1 for key in keys if key in missing)
+        cache.misses += sum(1 for key in keys if key in missing)
+
+        if missing:
+            # Only the misses reach the models; traced apart from the cache lookups around it
+            with tracer.stage("model_inference", parser=parser) as stage:
+                parsed = dict(zip(missing, parse_batch(list(missing.values()))))
+                stage.count(sentences=len(missing))
+            cache.put_many(parser, model, parsed)
+            results.update(parsed)
+        return [results[key] for key in keys]
+
+    return parse
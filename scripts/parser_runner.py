@@ -0,0 +1,320 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from scripts.conllu import format_conllu
+from scripts.data_preprocess import CONLLU_EXTENSION
+from scripts.model_registry import registry
+from scripts.instrumentation import peak_rss_bytes, tracer
+from scripts.parse_cache import DEFAULT_CACHE, ParseCache, cached_parse_batch
+
+
+# Input file shared by all parser scripts, one sentence per line
+DEFAULT_INPUT = "data/input_sentences.txt"
+
+# Optional block sections; models behind a skipped section are never loaded
+OUTPUTS = ("constituency", "dependency")
+
+# Output file formats of the parser scripts
+OUTPUT_FORMATS = ("block", "conllu")
+
+# --input / --output value that means stdin / stdout
+STREAM = "-"
+
+# Wall-clock time (time.time()) at which a benchmark driver launched the parser process
+BENCHMARK_STARTED_ENV = "PARSER_BENCHMARK_STARTED"
+
+# Per-sentence latency percentiles reported by `benchmark_parser`
+LATENCY_PERCENTILES = (50, 95, 99)
+
+
+def read_input_sentences(file_path):
+    """
+    Streams the sentences of an input file, one per non-empty line.
+
+    Args:
+        file_path (str): The path to the input file, or "-" for stdin.
+
+    Yields:
+        str: Sentence text.
+    """
+    if file_path == STREAM:
+        yield from (line.strip() for line in sys.stdin if line.strip())
+        return
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            sentence = line.strip()
+            if sentence:
+                yield sentence
+
+
+@contextmanager
+def open_output(file_path):
+    """
+    Opens the output of a parser script; "-" writes to stdout.
+
+    With "-", stdout is reserved for the output: file descriptor 1 is pointed at
+    stderr, so progress messages and anything a library prints cannot end up
+    between the blocks.
+
+    Args:
+        file_path (str): Output file, or "-".
+
+    Yields:
+        file: Text stream to write the output to.
+    """
+    if file_path != STREAM:
+        with open(file_path, "w", encoding="utf-8") as f:
+            yield f
+        return
+
+    sys.stdout.flush()
+    output_fd = os.dup(1)
+    os.dup2(2, 1)
+    with os.fdopen(output_fd, "w", encoding="utf-8") as f:
+        yield f
+
+
+def batched(items, batch_size):
+    """
+    Groups an iterable into lists of at most batch_size items.
+
+    Args:
+        items (iterable): Items to group.
+        batch_size (int): Maximum number of items per batch.
+
+    Yields:
+        list: The next batch.
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def format_block(number, sentence, result):
+    """
+    Formats one parsed sentence in the "N. sentence" block format.
+
+    Args:
+        number (int): Sentence number.
+        sentence (str): Sentence text.
+        result (tuple): Token tag tuples (text, lemma, upos, xpos), the constituency
+            tree string and the dependency rows (index, word, relation, head).
+
+    Returns:
+        str: The formatted block, followed by a blank line.
+    """
+    tokens_tags, tree, dependencies = result
+    formatted_output = f"{number}. {sentence}\n"
+    formatted_output += "\t".join("\\".join(str(field) for field in token) for token in tokens_tags) + "\n"
+    formatted_output += f"{tree}\n"
+    formatted_output += "".join("\t".join(str(field) for field in row) + "\n" for row in dependencies)
+    return formatted_output + "\n"
+
+
+def format_conllu_block(number, sentence, result):
+    """
+    Formats one parsed sentence as CoNLL-U, with the tree in a comment.
+
+    Args:
+        number (int): Sentence number.
+        sentence (str): Sentence text.
+        result (tuple): As for `format_block`.
+
+    Returns:
+        str: The CoNLL-U block, followed by a blank line.
+    """
+    tokens_tags, tree, dependencies = result
+    # A skipped constituency section is written as "()"
+    return format_conllu(number, sentence, tokens_tags, "" if tree == "()" else tree, dependencies)
+
+
+def run_parser(parse_batch, input_file, output_file, batch_size=32, formatter=format_block):
+    """
+    Streams sentences through a batch parser and writes the results incrementally.
+
+    Args:
+        parse_batch (callable): Takes a list of sentences and returns one result per sentence.
+        input_file (str): Input file, one sentence per line ("-" for stdin).
+        output_file (str): Output file ("-" for stdout); each batch is flushed as soon as it is parsed.
+        batch_size (int): Number of sentences sent to the models at once.
+        formatter (callable): Turns (number, sentence, result) into output text.
+
+    Returns:
+        int: Number of sentences parsed.
+    """
+    number = 0
+    with tracer.stage("run_parser", output=output_file, batch_size=batch_size) as run_stage, \
+            open_output(output_file) as f:
+        for batch in batched(read_input_sentences(input_file), batch_size):
+            with tracer.stage("parse_batch") as stage:
+                results = parse_batch(batch)
+                stage.count(sentences=len(batch))
+
+            with tracer.stage("format") as stage:
+                for sentence, result in zip(batch, results):
+                    number += 1
+                    f.write(formatter(number, sentence, result))
+                f.flush()
+                stage.count(sentences=len(batch))
+        run_stage.count(sentences=number)
+    return number
+
+
+def percentile(sorted_values, p):
+    """
+    Nearest-rank percentile of an ascending list (None if it is empty).
+    """
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def benchmark_parser(parse_batch, sentences, batch_sizes, started=None):
+    """
+    Measures the speed and memory use of a batch parser on a list of sentences.
+
+    A first batch is parsed before anything is timed, so that models are loaded;
+    the cold start is the time from `started` (the launch of the process) until that
+    batch is done. Then the whole list is parsed once per batch size. A sentence's
+    latency is the wall time of the batch it was parsed in, since its result is
+    only available when the batch returns. Tokens are the whitespace-separated
+    tokens of the input, so counts are the same for every parser.
+
+    Args:
+        parse_batch (callable): Takes a list of sentences and returns one result per sentence.
+        sentences (list): Sentence strings.
+        batch_sizes (iterable): Batch sizes to measure, in order.
+        started (float): time.time() at process launch (default: the start of this call).
+
+    Returns:
+        list: One record per batch size with 'batch_size', 'sentences', 'tokens', 'seconds',
+              'sentences_per_second', 'tokens_per_second' and 'latency_p50'/'p95'/'p99', plus
+              the process's 'cold_start_seconds', 'model_load_seconds', 'threads',
+              'peak_rss_bytes' and 'child_peak_rss_bytes' (e.g. the CoreNLP JVM).
+    """
+    started = time.time() if started is None else started
+    batch_sizes = list(batch_sizes)
+    tokens = sum(len(sentence.split()) for sentence in sentences)
+
+    with tracer.stage("benchmark_cold_start") as stage:
+        warm_up = sentences[:max(1, batch_sizes[0])]
+        parse_batch(warm_up)
+        cold_start = time.time() - started
+        stage.count(sentences=len(warm_up))
+
+    records = []
+    for batch_size in batch_sizes:
+        latencies = []
+        with tracer.stage("benchmark_pass", batch_size=batch_size) as stage:
+            start = time.perf_counter()
+            for batch in batched(sentences, batch_size):
+                batch_start = time.perf_counter()
+                parse_batch(batch)
+                latencies.extend([time.perf_counter() - batch_start] * len(batch))
+            seconds = time.perf_counter() - start
+            stage.count(sentences=len(sentences), tokens=tokens)
+
+        latencies.sort()
+        records.append({
+            "batch_size": batch_size,
+            "sentences": len(sentences),
+            "tokens": tokens,
+            "seconds": seconds,
+            "sentences_per_second": len(sentences) / seconds if seconds > 0 else None,
+            "tokens_per_second": tokens / seconds if seconds > 0 else None,
+            **{f"latency_p{p}": percentile(latencies, p) for p in LATENCY_PERCENTILES},
+        })
+
+    # Closing worker processes lets their peak memory be read
+    model_load_seconds = dict(registry.load_times)
+    registry.close()
+    process = {
+        "cold_start_seconds": cold_start,
+        "model_load_seconds": model_load_seconds,
+        "threads": os.environ.get("OMP_NUM_THREADS"),
+        "peak_rss_bytes": peak_rss_bytes(),
+        "child_peak_rss_bytes": peak_rss_bytes(children=True),
+    }
+    return [{**record, **process} for record in records]
+
+
+def runner_arguments(description, default_output):
+    """
+    Builds the command-line options shared by the parser scripts.
+
+    Args:
+        description (str): Help text of the script.
+        default_output (str): Default output file.
+
+    Returns:
+        argparse.ArgumentParser: Parser with --input, --output, --batch-size, --outputs and cache options.
+    """
+    arg_parser = argparse.ArgumentParser(description=description)
+    arg_parser.add_argument("--input", default=DEFAULT_INPUT, help="Input file, one sentence per line ('-' for stdin)")
+    arg_parser.add_argument("--output", default=default_output, help="Output file ('-' for stdout)")
+    arg_parser.add_argument("--batch-size", type=int, default=32, help="Sentences per model call")
+    arg_parser.add_argument("--outputs", nargs="+", choices=OUTPUTS, default=list(OUTPUTS),
+                            help="Sections to produce; skipped sections are left empty")
+    arg_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="block",
+                            help="Output format; conllu replaces the output file's extension with .conllu")
+    arg_parser.add_argument("--cache", default=DEFAULT_CACHE, help="Parse cache database")
+    arg_parser.add_argument("--no-cache", action="store_true", help="Parse every sentence, ignoring the cache")
+    arg_parser.add_argument("--benchmark", type=int, nargs="+", default=None, metavar="BATCH_SIZE",
+                            help="Instead of parsing, time the input at these batch sizes and write JSON records")
+    return arg_parser
+
+
+def run_from_arguments(parse_batch, args, parser_name, model_id, formatter=format_block,
+                       conllu_formatter=format_conllu_block):
+    """
+    Runs a parser script with the options of `runner_arguments`, through the parse cache.
+
+    Args:
+        parse_batch (callable): Takes a list of sentences and returns JSON-serialisable results.
+        args (argparse.Namespace): Parsed command-line options.
+        parser_name (str): Parser name used in the cache key.
+        model_id (str): Model identifier used in the cache key.
+        formatter (callable): Turns (number, sentence, result) into output text.
+        conllu_formatter (callable): Formatter used with `--format conllu`.
+
+    Returns:
+        int: Number of sentences written (with --benchmark: benchmark records written).
+    """
+    if args.benchmark:
+        # The cache would measure lookups rather than the parser
+        records = benchmark_parser(parse_batch, list(read_input_sentences(args.input)), args.benchmark,
+                                   float(os.environ.get(BENCHMARK_STARTED_ENV) or time.time()))
+        with open_output(args.output) as f:
+            for record in records:
+                f.write(json.dumps({"parser": parser_name, "model": model_id, **record}) + "\n")
+        return len(records)
+
+    if args.format == "conllu":
+        # The readers pick CoNLL-U by extension
+        formatter = conllu_formatter
+        if args.output != STREAM:
+            args.output = os.path.splitext(args.output)[0] + CONLLU_EXTENSION
+
+    if args.no_cache:
+        number = run_parser(parse_batch, args.input, args.output, args.batch_size, formatter)
+    else:
+        with ParseCache(args.cache) as cache:
+            parse = cached_parse_batch(parse_batch, cache, parser_name, model_id)
+            number = run_parser(parse, args.input, args.output, args.batch_size, formatter)
+            print(f"Parse cache: {cache.hits} hits, {cache.misses} misses ({cache.hit_rate():.1%} hit rate)")
+            tracer.counter("parse_cache_hit_rate", cache.hit_rate(), parser=parser_name, hits=cache.hits, misses=cache.misses)
+
+    # Only the models that were actually needed show up here
+    for name, seconds in registry.load_times.items():
+        print(f"Loaded {name} in {seconds:.2f}s")
+    return number
@@ -1,36 +1,58 @@
-import stanza
-
-# Download and initialize the Stanza pipeline for English
-stanza.download(lang='en')  # Downloads the English language model for Stanza
-nlp = stanza.Pipeline('en')  # Initializes the pipeline for processing English text
-
-# Input list of sentences to be processed
-sentences = [
-    "As she walked past it, the driver's glass started to open.",
-    "With a handkerchief she wiped the sweat from her forehead.",
-    "Prudently, they had diversified into banking and insurance, and as a result their influence was felt at the highest level.",
-    "The arranged marriage would be the social event of the following year.",
-    "When at last she spoke, her words were heavy and disjointed.",
-    "The road to the coast was busy with traffic in both directions.",
-    "The expected date came and went.",
-    "She sighed at the irony of it all, the waste of it all.",
-    "All through August the rain hardly stopped.",
-    "Thank the gods he didn't have to know of this."
-]
-
-# Define the output file name to save the processed results
-output_file = "../data/stanza_output.txt"
-
-# Open the output file for writing
-with open(output_file, "w", encoding="utf-8") as file:
-    # Process each sentence in the input list
-    for sentence in sentences:
-        doc = nlp(sentence)  # Analyze the sentence using Stanza
-        for sent in doc.sentences:  # Iterate through the parsed sentences (should be one per input sentence)
-            for word in sent.words:  # Iterate through the words in the sentence
-                # Write the word's text, lemma, UPOS (universal part of speech), and XPOS (language-specific POS) to the file
-                file.write(f"{word.text}\\{word.lemma}\\{word.upos}\\{word.xpos}\t")
-        file.write("\n")  # Add a newline after each processed sentence
-
-# Print a message indicating that processing is complete and the file has been saved
-print(f"Processing complete. Output saved to {output_file}")
+from scripts.conllu import format_conllu
+from scripts.model_registry import load_stanza, registry
+from scripts.parser_runner import run_from_arguments, runner_arguments
+
+# Only the processors needed for the tag output: no NER, parsing or sentiment
+PROCESSORS = "tokenize,mwt,pos,lemma"
+
+# The Stanza pipeline for English is built on first use
+registry.register("stanza_en", lambda: load_stanza("en", PROCESSORS))
+
+
+def model_id():
+    # Identifies the model in the parse cache; changes with the Stanza version
+    from importlib.metadata import version
+    return f"stanza-{version('stanza')}/en/{PROCESSORS}"
+
+
+def parse_batch(sentences):
+    """
+    Tags a batch of sentences with one multi-document Stanza call.
+
+    Args:
+        sentences (list): Sentence strings.
+
+    Returns:
+        list: One list of (text, lemma, upos, xpos) tuples per input sentence.
+    """
+    import stanza
+    nlp = registry.get("stanza_en")
+
+    # Stanza processes a list of Documents together, batching across them
+    docs = nlp([stanza.Document([], text=sentence) for sentence in sentences])
+    return [
+        # Iterate through the parsed sentences (should be one per input sentence)
+        [(word.text, word.lemma, word.upos, word.xpos) for sent in doc.sentences for word in sent.words]
+        for doc in docs
+    ]
+
+
+def format_tag_line(number, sentence, tokens_tags):
+    # Write the word's text, lemma, UPOS (universal part of speech), and XPOS (language-specific POS) to the file
+    return "".join(f"{text}\\{lemma}\\{upos}\\{xpos}\t" for text, lemma, upos, xpos in tokens_tags) + "\n"
+
+
+def format_conllu_tags(number, sentence, tokens_tags):
+    # CoNLL-U block with one word line per tagged token and no tree or heads
+    return format_conllu(number, sentence, tokens_tags, "", [])
+
+
+if __name__ == "__main__":
+    args = runner_arguments("Tag sentences with Stanza.", "data/stanza_output.txt").parse_args()
+
+    # Process the input sentences in batches and save one tag line per sentence
+    run_from_arguments(parse_batch, args, "stanza", model_id(), formatter=format_tag_line,
+                       conllu_formatter=format_conllu_tags)
+
+    # Print a message indicating that processing is complete and the file has been saved
+    print(f"Processing complete. Output saved to {args.output}")
@@ -0,0 +1,28 @@
+import shutil
+import subprocess
+
+import pytest
+
+from scripts.corenlp_parser import WORKER_DIRECTORY, CoreNLPWorkerClient, parse_block
+
+requires_maven = pytest.mark.skipif(shutil.which("mvn") is None, reason="Maven and a JDK are needed for the worker")
+
+
+@requires_maven
+def test_worker_compiles():
+    subprocess.run(["mvn", "-q", "compile"], cwd=WORKER_DIRECTORY, check=True)
+
+
+@requires_maven
+def test_batch_document_keeps_one_sentence_per_line():
+    # The first line holds two sentences; a batch document is only split at line ends
+    sentences = ["The cat sat . The dog ran .", "Birds fly ."]
+    client = CoreNLPWorkerClient(command="mvn -q compile exec:java -Dexec.mainClass=com.example.CoreNLPWorker "
+                                         "-Dexec.args=2")
+    try:
+        blocks = client.annotate(sentences)
+    finally:
+        client.close()
+
+    assert [block.split("\n")[0] for block in blocks] == ["1. The cat sat . The dog ran .", "2. Birds fly ."]
+    assert [len(parse_block(block)[0]) for block in blocks] == [8, 3]
@@ -0,0 +1,32 @@
+import asyncio
+
+from scripts.orchestrator import orchestrate
+
+
+# Stand-in parser script: copies stdin to stdout as one block per sentence
+ECHO_PARSER = """
+import sys
+
+for line in sys.stdin:
+    sys.stdout.write(line.strip() + "\\n\\n")
+"""
+
+
+def test_failing_parser_is_reported_without_stopping_the_others(tmp_path, monkeypatch):
+    (tmp_path / "echo_parser.py").write_text(ECHO_PARSER, encoding="utf-8")
+    monkeypatch.setenv("PYTHONPATH", str(tmp_path))
+    input_file = tmp_path / "input.txt"
+    input_file.write_text("First sentence .\nSecond sentence .\n", encoding="utf-8")
+    parsers = {
+        "echo": {"name": "Echo", "module": "echo_parser", "venv": None,
+                 "output": str(tmp_path / "echo_output.txt"), "cpus": 1, "evaluate": False},
+        "missing": {"name": "Missing", "module": "missing_parser_module", "venv": None,
+                    "output": str(tmp_path / "missing_output.txt"), "cpus": 1, "evaluate": False},
+    }
+
+    runs = asyncio.run(asyncio.wait_for(orchestrate(parsers, str(input_file), cpus=1), timeout=60))
+
+    assert runs["echo"]["sentences"] == 2
+    assert (tmp_path / "echo_output.txt").read_text(encoding="utf-8") == "First sentence .\n\nSecond sentence .\n\n"
+    assert "exited with code 1" in runs["missing"]["error"]
+    assert not (tmp_path / "missing_output.txt").exists()